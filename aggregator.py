@@ -0,0 +1,137 @@
+import numpy as np
+
+from indicators import macd_engine
+from nearest import resolution_to_seconds, resolution_rank
+from ring_buffer import OHLCBuffer
+
+
+class MultiResolutionAggregator:
+    def __init__(self, resolutions, fast=12, slow=26, signal=9, long=100, assetCode=None):
+        """
+        Derives candles for several resolutions from the candles of the finest one, so that switching between
+        resolutions (zooming in/out) doesn't require any downloads.
+
+        Only candles of the finest resolution are fetched. Every coarser candle is built locally once all of the finer
+        candles it covers have arrived, and the financial figures of every resolution are kept up to date at the same
+        time.
+        :param resolutions: a list of strings that represent the resolutions to maintain, e.g. ['1m', '5m'].
+        :param fast: an integer that represents the number of periods considered when calculating the fast EMA.
+        :param slow: an integer that represents the number of periods considered when calculating the slow EMA.
+        :param signal: an integer that represents the number of periods considered when calculating the EMA for MACD.
+        :param long: an integer that represents the number of periods considered when calculating the long EMA.
+        :param assetCode: a string that represents the ticker symbol of the asset.
+        """
+        self.resolutions = sorted(set(resolutions), key=lambda r: resolution_to_seconds[r])
+        self.finest = self.resolutions[0]
+        self.fast, self.slow, self.signal, self.long = fast, slow, signal, long
+        self.assetCode = assetCode
+        self.data, self.indicators = {}, {}
+        # Coarse candle that is still being built for each resolution: [time, open, high, low, close, volume]
+        self._partial = {}
+
+    def covers(self, resolution):
+        return resolution in self.resolutions
+
+    def seed(self, data):
+        """
+        Builds every resolution from historical candles of the finest resolution.
+        :param data: an OHLCBuffer that holds candles of the finest resolution, e.g. the output of
+            SwyftX.extract_price_data().
+        """
+        t = np.array(data["time"])
+        columns = [np.array(data[field]) for field in ("open", "high", "low", "close", "volume")]
+        step = resolution_to_seconds[self.finest]
+        self.assetCode = data["assetCode"] if self.assetCode is None else self.assetCode
+
+        for resolution in self.resolutions:
+            if resolution == self.finest:
+                bars = [t] + columns
+                partial = None
+            else:
+                bars, partial = self._aggregate(t, columns, resolution_to_seconds[resolution], step)
+            buffer = OHLCBuffer(max(len(bars[0]), self.long, 1), self.assetCode)
+            buffer.extend(bars)
+            engine = macd_engine(self.fast, self.slow, self.signal, self.long, buffer.capacity)
+            engine.seed(buffer)
+            self.data[resolution], self.indicators[resolution] = buffer, engine
+            self._partial[resolution] = partial
+
+    @staticmethod
+    def _aggregate(t, columns, size, step):
+        """
+        Groups finer candles into candles of 'size' seconds.
+        :return: a tuple of the completed candles (as a list of arrays: time, open, high, low, close, volume) and the
+            last candle if it hasn't been completed yet (or None).
+        """
+        if len(t) == 0:
+            return [np.array([]) for _ in range(6)], None
+        o, h, l, c, v = columns
+        bucket = (t // size) * size
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(bucket)) + 1])
+        ends = np.concatenate([starts[1:], [len(t)]])
+        bars = [bucket[starts], o[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts),
+                c[ends - 1], np.add.reduceat(v, starts)]
+
+        keep = np.ones(len(starts), dtype=bool)
+        # The first candle is missing the finer candles before the start of the history.
+        keep[0] = t[0] == bucket[0]
+        partial = None
+        if t[-1] + step < bucket[-1] + size:
+            keep[-1] = False
+            partial = [float(column[-1]) for column in bars]
+        return [column[keep] for column in bars], partial
+
+    def update(self, candle):
+        """
+        Adds a new candle of the finest resolution and updates every resolution that it completes.
+        :param candle: a dictionary in the same format as the output of SwyftX.get_last_completed_data(), i.e. with
+            time in unix milliseconds.
+        :return: a list of resolutions that got a new candle (the finest resolution is always one of them).
+        """
+        t = int(candle["time"]) / 1000
+        o, h, l, c = float(candle["open"]), float(candle["high"]), float(candle["low"]), float(candle["close"])
+        v = float(candle.get("volume", 0))
+        step = resolution_to_seconds[self.finest]
+
+        self._append(self.finest, [t, o, h, l, c, v])
+        completed = [self.finest]
+        for resolution in self.resolutions[1:]:
+            size = resolution_to_seconds[resolution]
+            bucket = (t // size) * size
+            partial = self._partial[resolution]
+            if partial is not None and partial[0] != bucket:
+                # The last finer candle of the previous bucket never arrived, so close it as it is.
+                self._append(resolution, partial)
+                completed.append(resolution)
+                partial = None
+            if partial is None:
+                partial = [bucket, o, h, l, c, v]
+            else:
+                partial = [bucket, partial[1], max(partial[2], h), min(partial[3], l), c, partial[5] + v]
+            if t + step >= bucket + size:
+                self._append(resolution, partial)
+                completed.append(resolution)
+                partial = None
+            self._partial[resolution] = partial
+        return completed
+
+    def _append(self, resolution, bar):
+        self.data[resolution].append(*bar)
+        self.indicators[resolution].update(self.data[resolution].row())
+
+    def last_time(self):
+        """
+        :return: a datetime object that represents the opening time of the newest candle of the finest resolution.
+        """
+        return self.data[self.finest].last_time()
+
+
+def zoom_resolutions(resolution):
+    """
+    Returns the resolutions that Bot.macd_gradient_strategy() can switch between when it starts at 'resolution', i.e.
+    the resolution itself and the one it zooms in to.
+    :param resolution: a string that represents the resolution the strategy starts at.
+    :return: a list of strings, finest first.
+    """
+    i = resolution_rank.index(resolution)
+    return resolution_rank[max(0, i - 1):i + 1]
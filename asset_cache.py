@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+
+from time import time
+
+
+class AssetCache:
+    def __init__(self, path="assets.json", max_age=24 * 60 * 60, max_stale=7 * 24 * 60 * 60):
+        """
+        On-disk copy of the 'markets/info/basic/' response, so SwyftX doesn't have to download the asset table every
+        time it's created.
+
+        A copy younger than max_age is used as it is. A copy between max_age and max_stale old is still used, but
+        SwyftX refreshes it in the background. Anything older (or missing) is downloaded before it's used.
+        :param path: a string that represents the file the asset table is saved in.
+        :param max_age: a number that represents the number of seconds a copy is considered fresh for.
+        :param max_stale: a number that represents the number of seconds after which a copy can't be used anymore.
+        """
+        self.path = path
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+
+    def age(self):
+        """
+        :return: a number that represents the age of the saved copy in seconds, or None if there isn't one.
+        """
+        try:
+            return time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def load(self):
+        """
+        :return: a tuple of the saved asset list (or None if it's missing, unreadable or too old) and a boolean that
+            determines whether it should be refreshed.
+        """
+        age = self.age()
+        if age is None or age > self.max_stale:
+            return None, True
+        try:
+            with open(self.path, "r") as f:
+                assets = json.load(f)
+        except (OSError, ValueError):
+            return None, True
+        return assets, age > self.max_age
+
+    def save(self, assets):
+        """
+        Saves the asset list returned by SwyftX._fetch_asset_info().
+        """
+        with self._lock:
+            # Write to a temporary file first so that an interrupted write can't corrupt the cache.
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(assets, f)
+            os.replace(self.path + ".tmp", self.path)
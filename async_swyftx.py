@@ -0,0 +1,329 @@
+import aiohttp
+import asyncio
+import json
+import os
+
+from datetime import datetime
+from candle_store import CandleStore
+from bar_poller import BarPoller
+from time import time
+from nearest import erase_seconds, resolution_to_seconds, calculate_next_interval
+from swyftx import SwyftX, OldTokenError, EmptyTokenError, endpoints, bars_per_chunk
+
+
+class Response:
+    def __init__(self, status, text):
+        """
+        The parts of requests.Response that are used by callers of SwyftX, so code written for SwyftX's order
+        functions (e.g. r.ok, r.json()) works with the responses of AsyncSwyftX.
+        :param status: an integer that represents the HTTP status code.
+        :param text: a string that represents the body of the response.
+        """
+        self.status_code = status
+        self.text = text
+        self.ok = status < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncSwyftX:
+    def __init__(self, apiKey, mode="demo", blacklist=["USDT", "USDC", "BUSD"], candle_store=None, max_connections=20,
+                 bar_poller=None, base_url=None):
+        """
+        asyncio version of SwyftX. Every function that talks to SwyftX is a coroutine with the same parameters as its
+        SwyftX counterpart, so requests for many pairs can be sent concurrently with asyncio.gather() over one pooled
+        connection.
+
+        Nothing is requested until self.open() is awaited, which is done automatically when used as an async context
+        manager:
+            async with AsyncSwyftX(key) as swyftx:
+                bars = await swyftx.gather_last_completed_data("USD", ["BTC", "ETH"], "ask", "5m")
+        :param apiKey: a string that is the SwyftX API key.
+        :param mode: a string that determines the mode in which this client is running. Same as in SwyftX.
+        :param blacklist: a list of ticker symbols that represents all secondary assets that we're not interested in
+            trading.
+        :param candle_store: a CandleStore, or a string that represents the directory of one. Same as in SwyftX.
+        :param max_connections: an integer that represents the maximum number of connections kept open at once.
+        :param bar_poller: a BarPoller that get_last_completed_data() waits for bars with. If None, a new one is
+            created.
+        :param base_url: a string that represents the URL every request is sent to instead of SwyftX. Same as in
+            SwyftX.
+        """
+        self.base_url = base_url if base_url is None else base_url.rstrip("/") + "/"
+        self.endpoint = endpoints[mode] if base_url is None else self.base_url
+        self.data_endpoint = endpoints["base"] if base_url is None else self.base_url
+        self.is_demo = True if mode == "demo" else False
+        self.key = apiKey
+        self.default_header = {
+            "Content-Type": "application/json"
+        }
+        self.max_connections = max_connections
+        self.session = None
+        self.token, self.authenticate_header = None, None
+        self.asset_info, self._to_id, self._to_code = None, None, None
+        self._blacklist = blacklist
+        self.candle_store = CandleStore(candle_store) if type(candle_store) is str else candle_store
+        self.bar_poller = BarPoller() if bar_poller is None else bar_poller
+
+    # Functions that don't send any requests are shared with SwyftX.
+    _authenticate_header = SwyftX._authenticate_header
+    _reshape_asset_info = SwyftX._reshape_asset_info
+    _create_name_id_dict = SwyftX._create_name_id_dict
+    to_code = SwyftX.to_code
+    to_id = SwyftX.to_id
+    extract_price_data = SwyftX.extract_price_data
+
+    async def open(self):
+        """
+        Opens the connection pool, then fetches the token and the asset information.
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections),
+                                                 headers=self.default_header)
+        self.token = await self._fetch_token()
+        self.authenticate_header = self._authenticate_header()
+        self.asset_info = await self._fetch_asset_info()
+        self._to_id, self._to_code = self._create_name_id_dict(self.asset_info)
+        self.asset_info = self._reshape_asset_info()
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _request(self, method, url, headers=None, data=None):
+        """
+        Sends a request through the shared connection pool.
+        :return: a Response object.
+        """
+        async with self.session.request(method, url, headers=headers, data=data) as r:
+            return Response(r.status, await r.text())
+
+    async def _get_json(self, url, headers=None):
+        return (await self._request("GET", url, headers)).json()
+
+    async def _fetch_token(self):
+        """
+        Same as SwyftX._fetch_token().
+        """
+        if self.base_url is not None:
+            return await self._request_token()
+        try:
+            if datetime.now().timestamp() >= os.path.getmtime("token.txt") + 7 * 24 * 60 * 60:
+                raise OldTokenError
+
+            with open("token.txt", "r") as f:
+                print("token.txt exists")
+                tok = f.readline().strip()
+                if len(tok) < 1:
+                    raise EmptyTokenError
+                return tok
+
+        except (FileNotFoundError, OldTokenError, EmptyTokenError):
+            print("Invalid token.txt \nCreating a new token...")
+            t = await self._request_token()
+            with open("token.txt", "w") as f:
+                f.write(t)
+            print("Token created successfully!")
+            return t
+
+    async def _request_token(self):
+        r = await self._request("POST", self.data_endpoint + "auth/refresh/", data=json.dumps({"apiKey": self.key}))
+        return r.json()["accessToken"]
+
+    async def _fetch_asset_info(self, assetCode=''):
+        return await self._get_json(self.data_endpoint + "markets/info/basic/" + assetCode)
+
+    async def fetch_balance(self):
+        """
+        Same as SwyftX.fetch_balance().
+        """
+        balance = await self._get_json(self.endpoint + "user/balance/", self.authenticate_header)
+        return {self.to_code(str(c["assetId"])): float(c["availableBalance"]) for c in balance}
+
+    async def get_top_n_assets(self, n=20):
+        """
+        Same as SwyftX.get_top_n_assets().
+        """
+        raw_assets = await self._get_json("https://api.swyftx.com.au/markets/info/basic/")
+        cleaned_assets = [x for x in raw_assets if x["rank"] is not None and x["code"] not in self._blacklist]
+        sorted_assets = sorted(cleaned_assets, key=lambda x: x["rank"])
+        return [{"code": a["code"], "name": a["name"], "altName": a["altName"]} for a in sorted_assets[:n]]
+
+    async def _place_order(self, primary, secondary, quantity, assetQuantity, orderType, trigger=None):
+        if assetQuantity is None:
+            assetQuantity = primary
+        payload = {
+            "primary": primary,
+            "secondary": secondary,
+            "quantity": str(quantity),
+            "assetQuantity": assetQuantity,
+            "orderType": orderType
+        }
+        if trigger is not None:
+            payload["trigger"] = 1/float(trigger)
+        return await self._request("POST", self.endpoint + "orders/", self.authenticate_header, json.dumps(payload))
+
+    async def market_buy(self, primary, secondary, quantity, assetQuantity=None):
+        """
+        Same as SwyftX.market_buy().
+        :return: a Response object.
+        """
+        return await self._place_order(primary, secondary, quantity, assetQuantity, 1)
+
+    async def market_sell(self, primary, secondary, quantity, assetQuantity=None):
+        """
+        Same as SwyftX.market_sell().
+        :return: a Response object.
+        """
+        return await self._place_order(primary, secondary, quantity, assetQuantity, 2)
+
+    async def stop_loss(self, primary, secondary, quantity, trigger, assetQuantity=None):
+        """
+        Same as SwyftX.stop_loss().
+        :return: a Response object.
+        """
+        return await self._place_order(primary, secondary, quantity, assetQuantity, 6, trigger)
+
+    async def get_order(self, orderUuid):
+        """
+        Same as SwyftX.get_order().
+        :return: a Response object.
+        """
+        return await self._request("GET", self.endpoint + "orders/byId/" + orderUuid, self.authenticate_header)
+
+    async def get_orders(self, orderUuids):
+        """
+        Fetches many orders concurrently.
+        :param orderUuids: a list of strings that represent order IDs.
+        :return: a list of Response objects in the same order.
+        """
+        return await asyncio.gather(*(self.get_order(o) for o in orderUuids))
+
+    async def delete_order(self, orderUuid):
+        """
+        Same as SwyftX.delete_order().
+        :return: a Response object.
+        """
+        return await self._request("DELETE", self.endpoint + "orders/" + orderUuid + "/", self.authenticate_header)
+
+    async def recent_order(self, assetCode, limit="", page=""):
+        """
+        Same as SwyftX.recent_order().
+        """
+        url = self.endpoint + "orders/" + "?".join([assetCode, limit, page])
+        return (await self._get_json(url, self.authenticate_header))["orders"]
+
+    async def get_asset_data(self, primary, secondary, side, resolution, time_start, time_end, readable_time=True,
+                             chunked=False, max_workers=4):
+        """
+        Same as SwyftX.get_asset_data(). In chunked mode, up to max_workers chunks are requested at the same time.
+        """
+        if type(time_start) is datetime:
+            time_start = str(1000*int(time_start.timestamp()))
+        if type(time_end) is datetime:
+            time_end = str(1000*int(time_end.timestamp()))
+        time_start, time_end = int(float(time_start)), int(float(time_end))
+
+        if self.candle_store is None:
+            d = await self._download_bars(primary, secondary, side, resolution, time_start, time_end, chunked,
+                                          max_workers)
+        else:
+            d = []
+            for gap_start, gap_end in self.candle_store.missing(primary, secondary, side, resolution, time_start,
+                                                                time_end):
+                candles = await self._download_bars(primary, secondary, side, resolution, gap_start, gap_end, chunked,
+                                                    max_workers)
+                d += self.candle_store.merge(primary, secondary, side, resolution, candles, gap_start, gap_end)
+            d = self.candle_store.load(primary, secondary, side, resolution, time_start, time_end) + d
+
+        if readable_time:
+            for i in range(len(d)):
+                d[i]["time"] = datetime.fromtimestamp(int(d[i]["time"])/1000)
+        return {
+            "assetCode": secondary,
+            "data": d
+        }
+
+    async def _get_bars(self, primary, secondary, side, resolution, time_start, time_end):
+        """
+        Same as SwyftX._get_bars().
+        """
+        url = self.data_endpoint + "charts/getBars/" + "/".join([primary, secondary, side, "&".join(
+            ["?resolution=" + resolution, f"timeStart={int(time_start)}", f"timeEnd={int(time_end)}"])])
+        return (await self._get_json(url))["candles"]
+
+    async def _download_bars(self, primary, secondary, side, resolution, time_start, time_end, chunked=False,
+                             max_workers=4):
+        """
+        Same as SwyftX._download_bars().
+        """
+        step = resolution_to_seconds[resolution] * 1000 * bars_per_chunk
+        if not chunked or time_end - time_start < step:
+            return await self._get_bars(primary, secondary, side, resolution, time_start, time_end)
+
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def get_chunk(start):
+            async with semaphore:
+                return await self._get_bars(primary, secondary, side, resolution, start,
+                                            min(start + step - 1, time_end))
+
+        candles = {}
+        for chunk in await asyncio.gather(*(get_chunk(s) for s in range(time_start, time_end + 1, step))):
+            for c in chunk:
+                candles[int(c["time"])] = c
+        return [candles[t] for t in sorted(candles)]
+
+    async def get_asset_timeslot(self, primary, secondary, side, resolution, t):
+        """
+        Same as SwyftX.get_asset_timeslot().
+        """
+        d = await self.get_asset_data(primary, secondary, side, resolution, t,
+                                      int(calculate_next_interval(t.timestamp(), resolution))*1000,
+                                      readable_time=False)
+        return d["data"][-1]
+
+    async def get_last_completed_data(self, primary, secondary, side, resolution):
+        """
+        Same as SwyftX.get_last_completed_data(), except that other tasks keep running while waiting for SwyftX to
+        publish the bar.
+        """
+        end = erase_seconds(time()) * 1000
+        start = end - resolution_to_seconds[resolution]*1000
+        d = await self.bar_poller.apoll(lambda: self._get_bars(primary, secondary, side, resolution, start, end),
+                                        resolution, end / 1000)
+        return d[0]
+
+    async def gather_last_completed_data(self, primary, secondaries, side, resolution):
+        """
+        Gets the last completed bar of many secondary assets concurrently.
+        :param secondaries: a list of strings that represent the ticker symbols of the secondary assets.
+        :return: a dictionary that maps each secondary asset to its bar.
+        """
+        bars = await asyncio.gather(*(self.get_last_completed_data(primary, s, side, resolution) for s in secondaries))
+        return dict(zip(secondaries, bars))
+
+    async def get_latest_asset_data(self, primary, secondary, side, resolution):
+        """
+        Same as SwyftX.get_latest_asset_data() (without streaming).
+        """
+        d = await self._get_json(self.data_endpoint + "charts/getLatestBar/" +
+                                 "/".join([primary, secondary, side, "?resolution=" + resolution]))
+        del d["volume"]
+        return d
+
+    async def get_live_asset_rates(self, primary, secondary):
+        """
+        Same as SwyftX.get_live_asset_rates().
+        """
+        r = await self._get_json(self.data_endpoint + "live-rates/" + self.to_id(primary) + "/")
+        return r[self.to_id(secondary)]
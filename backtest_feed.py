@@ -0,0 +1,186 @@
+import json
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from errors import EndOfDataError
+from nearest import resolution_to_seconds
+
+
+def to_unix_ms(t):
+    """
+    Converts a datetime object, or a string/number that represents unix time in milliseconds, to an integer in unix
+    milliseconds.
+    """
+    if type(t) is datetime:
+        return 1000 * int(t.timestamp())
+    return int(float(t))
+
+
+def backtest_window(resolution, start_time, backtest_end_time, long=100):
+    """
+    Calculates the window that a BacktestFeed has to cover to backtest from start_time to backtest_end_time.
+    Zooming in/out collects 'long' periods before the current bar, so the window starts that much earlier, and the
+    last bar processed can open up to one period after backtest_end_time.
+    :param resolution: a string that represents the resolution the backtest starts at.
+    :param start_time: a datetime object that represents the start time of the backtest.
+    :param backtest_end_time: a datetime object that determines when backtesting stops.
+    :param long: an integer that represents the number of periods considered when calculating the long EMA.
+    :return: a tuple of 2 datetime objects.
+    """
+    period = timedelta(seconds=resolution_to_seconds[resolution])
+    return start_time - period * long, backtest_end_time + period
+
+
+class BacktestFeed:
+    def __init__(self, swyftx=None, primary=None, secondary=None, time_start=None, time_end=None, chunked=True):
+        """
+        In-memory data source for backtesting. The whole ask/bid series for the backtesting window is downloaded once
+        (or loaded from a file with BacktestFeed.load()) and every bar is then served from memory, so no requests are
+        made while the backtest is running.
+
+        It has the same interface as the SwyftX methods that Bot uses to fetch historical data (get_asset_data() and
+        get_asset_timeslot()), so it can be used in place of SwyftX.
+        :param swyftx: a SwyftX object used to download series that haven't been loaded yet. If None, requesting a
+            series that hasn't been loaded raises an EndOfDataError.
+        :param primary: a string that represents the ticker symbol of the primary asset.
+        :param secondary: a string that represents the ticker symbol of the secondary asset.
+        :param time_start: a datetime object or a number in unix milliseconds that determines the start of the window.
+        :param time_end: a datetime object or a number in unix milliseconds that determines the end of the window.
+        :param chunked: a boolean that determines whether to download series in chunked mode.
+        """
+        self.swyftx = swyftx
+        self.primary = primary
+        self.secondary = secondary
+        self.time_start = to_unix_ms(time_start) if time_start is not None else None
+        self.time_end = to_unix_ms(time_end) if time_end is not None else None
+        self.chunked = chunked
+        # (side, resolution) -> {"start", "end", "times", "candles"}
+        self.series = {}
+
+    def preload(self, side, resolution, time_start=None, time_end=None):
+        """
+        Downloads a whole series and keeps it in memory.
+        :param side: a string that can either be 'ask' or 'bid'.
+        :param resolution: a string that represents the time span that the candles will cover.
+        :param time_start: a number in unix milliseconds. Defaults to self.time_start.
+        :param time_end: a number in unix milliseconds. Defaults to self.time_end.
+        """
+        if self.swyftx is None:
+            raise EndOfDataError(f"No {side} data has been loaded for '{resolution}'.")
+        if self.time_start is not None:
+            time_start = self.time_start if time_start is None else min(time_start, self.time_start)
+        if self.time_end is not None:
+            time_end = self.time_end if time_end is None else max(time_end, self.time_end)
+        candles = self.swyftx.get_asset_data(self.primary, self.secondary, side, resolution, time_start, time_end,
+                                             readable_time=False, chunked=self.chunked)["data"]
+        self.add_series(side, resolution, candles, time_start, time_end)
+
+    def add_series(self, side, resolution, candles, time_start=None, time_end=None):
+        """
+        Adds a series of raw candles (with time in unix milliseconds) to the feed.
+        :param time_start: a number in unix milliseconds that represents the start of the range the candles cover.
+            Defaults to the time of the first candle.
+        :param time_end: a number in unix milliseconds that represents the end of the range the candles cover.
+            Defaults to the time of the last candle.
+        """
+        candles = sorted(candles, key=lambda c: int(c["time"]))
+        times = [int(c["time"]) for c in candles]
+        self.series[(side, resolution)] = {
+            "start": time_start if time_start is not None else (times[0] if times else 0),
+            "end": time_end if time_end is not None else (times[-1] if times else 0),
+            "times": times,
+            "candles": candles
+        }
+
+    def _get_series(self, side, resolution, time_start, time_end):
+        series = self.series.get((side, resolution))
+        if series is None:
+            self.preload(side, resolution, time_start, time_end)
+            return self.series[(side, resolution)]
+        if (time_start < series["start"] or time_end > series["end"]) and self.swyftx is not None:
+            # Only the part outside of the loaded window is downloaded. Without swyftx, nothing more can be loaded, so
+            # whatever we have is served.
+            self._extend(side, resolution, series, time_start, time_end)
+        return series
+
+    def _extend(self, side, resolution, series, time_start, time_end):
+        """
+        Downloads the candles of [time_start, time_end] that are outside of a loaded series, and adds them to it.
+        """
+        missing = []
+        if time_start < series["start"]:
+            missing.append((time_start, series["start"] - 1))
+        if time_end > series["end"]:
+            missing.append((series["end"] + 1, time_end))
+        candles = {t: c for t, c in zip(series["times"], series["candles"])}
+        for start, end in missing:
+            for c in self.swyftx.get_asset_data(self.primary, self.secondary, side, resolution, start, end,
+                                                readable_time=False, chunked=self.chunked)["data"]:
+                candles[int(c["time"])] = c
+        self.add_series(side, resolution, list(candles.values()), min(time_start, series["start"]),
+                        max(time_end, series["end"]))
+        series.update(self.series[(side, resolution)])
+
+    def get_asset_data(self, primary, secondary, side, resolution, time_start, time_end, readable_time=True, **kwargs):
+        """
+        Same as SwyftX.get_asset_data(), except that the candles are served from memory.
+        """
+        time_start, time_end = to_unix_ms(time_start), to_unix_ms(time_end)
+        series = self._get_series(side, resolution, time_start, time_end)
+        lo = bisect_left(series["times"], time_start)
+        hi = bisect_right(series["times"], time_end)
+        d = [dict(c) for c in series["candles"][lo:hi]]
+        if readable_time:
+            for c in d:
+                c["time"] = datetime.fromtimestamp(int(c["time"]) / 1000)
+        return {
+            "assetCode": secondary,
+            "data": d
+        }
+
+    def get_asset_timeslot(self, primary, secondary, side, resolution, t):
+        """
+        Same as SwyftX.get_asset_timeslot(), except that the candle is served from memory.
+        :param t: datetime object that indicates the timeslot we're interested.
+        :return: the first candle that opened at or after t. Raises an EndOfDataError if there isn't one.
+        """
+        t = to_unix_ms(t)
+        series = self._get_series(side, resolution, t, t)
+        i = bisect_left(series["times"], t)
+        if i == len(series["times"]):
+            raise EndOfDataError()
+        return dict(series["candles"][i])
+
+    def save(self, path):
+        """
+        Saves every loaded series to a JSON file, so the same backtest can be run again without any downloads.
+        :param path: a string that represents the path of the file.
+        """
+        with open(path, "w") as f:
+            json.dump({
+                "primary": self.primary,
+                "secondary": self.secondary,
+                "time_start": self.time_start,
+                "time_end": self.time_end,
+                "series": [
+                    {"side": side, "resolution": resolution, "start": s["start"], "end": s["end"],
+                     "candles": s["candles"]}
+                    for (side, resolution), s in self.series.items()
+                ]
+            }, f)
+
+    @classmethod
+    def load(cls, path, swyftx=None):
+        """
+        Loads a feed saved with BacktestFeed.save().
+        :param path: a string that represents the path of the file.
+        :param swyftx: a SwyftX object used to download series that aren't in the file. If None, the feed never
+            touches the network.
+        :return: a BacktestFeed object.
+        """
+        with open(path, "r") as f:
+            raw = json.load(f)
+        feed = cls(swyftx, raw["primary"], raw["secondary"], raw["time_start"], raw["time_end"])
+        for s in raw["series"]:
+            feed.add_series(s["side"], s["resolution"], s["candles"], s["start"], s["end"])
+        return feed
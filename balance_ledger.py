@@ -0,0 +1,184 @@
+import threading
+
+from contextlib import contextmanager
+from threaded_timer import scheduler
+
+# Order types that buy the secondary asset with the primary one. Every other type sells it.
+buy_types = (1, 3, 5)  # market buy, limit buy, stop buy
+
+
+class BalanceLedger(dict):
+    def __init__(self, swyftx, interval=60, tolerance=1e-8, applied_history=1000):
+        """
+        In-memory view of the balance, shared by every bot using the same SwyftX object. It maps ticker symbols to
+        amounts like the output of SwyftX.fetch_balance(), so it can be used wherever that is.
+
+        Fills are applied straight from the order responses (amount, total and fees), so nothing is requested after a
+        trade. While at least one bot is running, the ledger is reconciled against 'user/balance' every interval
+        seconds in the background: SwyftX's figures replace the local ones, and any difference is reported as drift.
+
+        A fill must never be counted twice, by SwyftX's figures and by being applied. Orders filled by SwyftX on their
+        own (e.g. stop losses) are found by refreshing the open orders of the SwyftX object's order tracker, which
+        applies their fills, right before and right after the balance is fetched. A reconciliation is dropped if an
+        order was placed (see self.placing()) or applied in between, so the fetched balance always includes exactly the
+        fills that have been applied. Only the order of the requests matters, not the clocks of SwyftX and this
+        machine.
+        :param swyftx: a SwyftX object.
+        :param interval: a number that represents the number of seconds between reconciliations.
+        :param tolerance: a number that represents the largest difference (relative to the balance) that isn't
+            reported as drift.
+        :param applied_history: an integer that represents the number of applied orders remembered, so that an order
+            reported more than once (e.g. by its response and by the order tracker) is only applied once.
+        """
+        super().__init__()
+        self.swyftx = swyftx
+        self.interval = interval
+        self.tolerance = tolerance
+        self.synced = False
+        self.drift = {}
+        self.applied_history = applied_history
+        # orderUuid -> None, oldest first, used as a bounded ordered set.
+        self._applied = {}
+        self._users = 0
+        self._placing = 0
+        self._generation = 0
+        self._job = None
+        self._lock = threading.RLock()
+        self._stats = {"fills": 0, "reconciliations": 0, "dropped": 0, "drifts": 0, "drift_max": 0.0}
+
+    def sync(self):
+        """
+        Reconciles the ledger if it has never been, e.g. when the first bot starts.
+        :return: self.
+        """
+        with self._lock:
+            if not self.synced:
+                self.reconcile()
+        return self
+
+    def apply(self, order):
+        """
+        Applies a filled order to the ledger. Orders that have already been applied are ignored.
+        :param order: a dictionary returned by SwyftX.get_order(), or by the order functions (where the order is under
+            'order').
+        :return: a boolean that is True if the order was applied.
+        """
+        uuid = order.get("orderUuid")
+        o = order["order"] if "order" in order else order
+        if int(o["status"]) != 4:
+            return False
+        primary = self.swyftx.to_code(str(o["primary_asset"]))
+        secondary = self.swyftx.to_code(str(o["secondary_asset"]))
+        amount, total = float(o["amount"]), float(o["total"])
+        sign = 1 if int(o["order_type"]) in buy_types else -1
+        with self._lock:
+            if uuid is not None:
+                if uuid in self._applied:
+                    return False
+                self._applied[uuid] = None
+                if len(self._applied) > self.applied_history:
+                    del self._applied[next(iter(self._applied))]
+            self._generation += 1
+            self[primary] = self.get(primary, 0.0) - sign * total
+            self[secondary] = self.get(secondary, 0.0) + sign * amount
+            if o.get("feeAmount") and o.get("feeAsset"):
+                fee_asset = self.swyftx.to_code(str(o["feeAsset"]))
+                self[fee_asset] = self.get(fee_asset, 0.0) - float(o["feeAmount"])
+            self._stats["fills"] += 1
+        return True
+
+    def reconcile(self):
+        """
+        Replaces the ledger with the balance fetched from SwyftX, and records the difference between the two.
+        :return: a dictionary that maps each ticker symbol whose balance drifted to SwyftX's balance minus the local
+            one.
+        """
+        while True:
+            # Fills that happened before the balance is fetched are applied first, and fills that happen while it's
+            # being fetched are noticed afterwards.
+            self.swyftx.order_tracker.poll()
+            with self._lock:
+                generation, placing = self._generation, self._placing
+            fetched = self.swyftx.fetch_balance()
+            self.swyftx.order_tracker.poll()
+            with self._lock:
+                if placing or self._placing or generation != self._generation:
+                    # It's unclear whether the fetched balance includes the order, so wait for the next
+                    # reconciliation.
+                    self._stats["dropped"] += 1
+                    if self.synced:
+                        return {}
+                    continue
+                drift = {}
+                if self.synced:
+                    for code in set(self) | set(fetched):
+                        local, remote = self.get(code, 0.0), fetched.get(code, 0.0)
+                        if abs(remote - local) > self.tolerance * max(1.0, abs(remote)):
+                            drift[code] = remote - local
+                self.clear()
+                self.update(fetched)
+                self.synced = True
+                self.drift = drift
+                self._stats["reconciliations"] += 1
+                if drift:
+                    self._stats["drifts"] += 1
+                    self._stats["drift_max"] = max([self._stats["drift_max"]] + [abs(d) for d in drift.values()])
+                break
+        if drift:
+            print(f"Balance drifted from SwyftX: {drift}")
+        return drift
+
+    @contextmanager
+    def placing(self):
+        """
+        Wraps the placement of an order, so that the ledger isn't reconciled with a balance that may or may not include
+        it. The ledger is synced first if it hasn't been.
+        """
+        self.sync()
+        with self._lock:
+            self._placing += 1
+            self._generation += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._placing -= 1
+                self._generation += 1
+
+    def start(self):
+        """
+        Starts reconciling in the background. Called by every bot that starts running, and stopped once they all
+        called self.stop().
+        """
+        with self._lock:
+            self._users += 1
+            if self._job is None:
+                self._job = scheduler.every(self.interval, self._reconcile, overrun="skip")
+
+    def stop(self):
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if not self._users and self._job is not None:
+                scheduler.cancel(self._job)
+                self._job = None
+
+    def _reconcile(self):
+        try:
+            self.reconcile()
+        except (KeyError, ValueError) as e:
+            print(f"Failed to reconcile the balance: {e!r}")
+
+    def stats(self):
+        """
+        :return: a dictionary with the following structure:
+            {
+                fills: number of orders applied,
+                reconciliations,
+                dropped: number of reconciliations dropped because an order was placed or applied at the same time,
+                drifts: number of reconciliations that found a difference,
+                drift_max: largest difference found,
+                drift: the differences found by the last reconciliation
+            }
+        """
+        with self._lock:
+            return dict(self._stats, drift=dict(self.drift))
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import numpy as np
+
+from collections import deque
+from time import time, sleep
+from errors import BarTimeoutError
+
+
+class BarPoller:
+    def __init__(self, backoff=(0.05, 0.1, 0.2, 0.4, 0.8, 1.6), deadline=30, history=50, quantile=0.5, shrink=0.8):
+        """
+        Waits for SwyftX to publish a bar after it closes, replacing the loop that requested it back-to-back.
+
+        Requests are spaced out by the backoff schedule (the last step repeats until the deadline). The delay between
+        a bar closing and it being published is recorded for every resolution, and the first request for the next bar
+        is sent once that much time has passed, so it usually lands right after the bar appears.
+
+        The delay recorded is the time the successful request was sent, not the time it returned, so the round trip and
+        the wait before the first request don't add up from bar to bar. If the first request succeeds, the bar may have
+        been published well before it was sent, so the recorded delay is shrunk instead, which lets the estimate come
+        back down when SwyftX publishes faster.
+        :param backoff: a tuple of numbers that represent the seconds to wait after each unsuccessful request.
+        :param deadline: a number that represents the maximum number of seconds after the bar closes to keep trying.
+        :param history: an integer that represents the number of publication delays kept for each resolution.
+        :param quantile: a float between 0 and 1. The first request is sent this far into the recorded delays, e.g.
+            0.5 waits for the median delay.
+        :param shrink: a number between 0 and 1 that the expected delay is multiplied by when the first request
+            succeeds, to record a delay below it.
+        """
+        self.backoff = backoff
+        self.deadline = deadline
+        self.history = history
+        self.quantile = quantile
+        self.shrink = shrink
+        self._lags, self._attempts, self._timeouts = {}, {}, {}
+        self._lock = threading.Lock()
+
+    def expected_lag(self, resolution):
+        """
+        :return: a number that represents the number of seconds after a bar of resolution closes that it's expected
+            to be published. 0 if nothing has been recorded yet.
+        """
+        with self._lock:
+            lags = self._lags.get(resolution)
+            return float(np.quantile(lags, self.quantile)) if lags else 0
+
+    def _wait(self, resolution, close_time, attempt):
+        """
+        :return: the number of seconds to wait before the next request, or None if the deadline has passed.
+        """
+        now = time()
+        # The first request is always sent, even if it's already past the deadline (e.g. a tick that ran late).
+        if attempt == 0:
+            return max(0, close_time + self.expected_lag(resolution) - now)
+        if now > close_time + self.deadline:
+            return None
+        return min(self.backoff[min(attempt - 1, len(self.backoff) - 1)], close_time + self.deadline - now)
+
+    def _record(self, resolution, close_time, attempts, sent):
+        """
+        :param sent: a number that represents the time the successful request was sent in unix seconds.
+        """
+        lag = max(0, sent - close_time)
+        if attempts == 1:
+            lag = min(lag, self.expected_lag(resolution) * self.shrink)
+        with self._lock:
+            self._lags.setdefault(resolution, deque(maxlen=self.history)).append(lag)
+            self._attempts.setdefault(resolution, deque(maxlen=self.history)).append(attempts)
+
+    def _timeout(self, resolution, close_time):
+        with self._lock:
+            self._timeouts[resolution] = self._timeouts.get(resolution, 0) + 1
+        raise BarTimeoutError(f"The '{resolution}' bar closing at {close_time} was not published within "
+                              f"{self.deadline} seconds.")
+
+    def poll(self, fetch, resolution, close_time):
+        """
+        Calls fetch until it returns at least one bar.
+        :param fetch: a function without parameters that returns a list of bars.
+        :param resolution: a string that represents the resolution of the bar.
+        :param close_time: a number that represents the time at which the bar closes in unix seconds.
+        :return: the list returned by fetch.
+        """
+        attempt = 0
+        while True:
+            wait = self._wait(resolution, close_time, attempt)
+            if wait is None:
+                self._timeout(resolution, close_time)
+            sleep(wait)
+            attempt += 1
+            sent = time()
+            d = fetch()
+            if len(d) > 0:
+                self._record(resolution, close_time, attempt, sent)
+                return d
+
+    async def apoll(self, fetch, resolution, close_time):
+        """
+        Same as self.poll(), except fetch is a coroutine function and other tasks keep running while waiting.
+        """
+        attempt = 0
+        while True:
+            wait = self._wait(resolution, close_time, attempt)
+            if wait is None:
+                self._timeout(resolution, close_time)
+            await asyncio.sleep(wait)
+            attempt += 1
+            sent = time()
+            d = await fetch()
+            if len(d) > 0:
+                self._record(resolution, close_time, attempt, sent)
+                return d
+
+    def stats(self):
+        """
+        :return: a dictionary that maps each resolution to statistics about its recent bars:
+            {
+                expected_lag: seconds waited before the first request,
+                lag_median, lag_p90, lag_max: seconds between bars closing and the successful request being sent,
+                attempts_mean: average number of requests per bar,
+                timeouts: number of bars that weren't published before the deadline
+            }
+        """
+        out = {}
+        with self._lock:
+            resolutions = set(self._lags) | set(self._timeouts)
+        for resolution in resolutions:
+            with self._lock:
+                lags = list(self._lags.get(resolution, []))
+                attempts = list(self._attempts.get(resolution, []))
+                timeouts = self._timeouts.get(resolution, 0)
+            out[resolution] = {
+                "expected_lag": self.expected_lag(resolution),
+                "lag_median": float(np.median(lags)) if lags else None,
+                "lag_p90": float(np.quantile(lags, 0.9)) if lags else None,
+                "lag_max": max(lags) if lags else None,
+                "attempts_mean": float(np.mean(attempts)) if attempts else None,
+                "timeouts": timeouts
+            }
+        return out
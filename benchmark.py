@@ -0,0 +1,324 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+
+from datetime import datetime, timedelta
+from time import perf_counter, time
+from backtest_feed import BacktestFeed, backtest_window
+from bot import Bot
+from fake_swyftx import FakeSwyftXServer
+from nearest import check_rank, erase_seconds, resolution_to_seconds
+from swyftx import SwyftX
+from vector_backtest import VectorBacktest
+
+# Benchmarks of the bot's hot paths, run against a local FakeSwyftXServer so nothing goes over the network. Results
+# are printed (or saved) as JSON, and two result files can be compared with --compare:
+#   python benchmark.py --output before.json
+#   python benchmark.py --output after.json --compare before.json
+
+
+def _summary(seconds, unit=1000):
+    """
+    :param seconds: a list of durations in seconds.
+    :param unit: a number the durations are multiplied by, e.g. 1000 for milliseconds.
+    :return: a dictionary with the count, mean, p50, p99 and max of the durations.
+    """
+    s = sorted(seconds)
+    if not s:
+        return {"count": 0}
+    return {
+        "count": len(s),
+        "mean": unit * sum(s) / len(s),
+        "p50": unit * s[len(s) // 2],
+        "p99": unit * s[min(len(s) - 1, int(len(s) * 0.99))],
+        "max": unit * s[-1]
+    }
+
+
+class _NoClock:
+    """
+    Stands in for Runtime when bots are driven by the benchmark, so zooming in/out doesn't start real clocks.
+    """
+    def schedule(self, bot, resolution):
+        pass
+
+    def unschedule(self, bot):
+        pass
+
+
+class Benchmark:
+    def __init__(self, server, primary="USD", secondary="BTC", resolution="5m", ticks=200, days=7, pairs=10):
+        """
+        :param server: a FakeSwyftXServer that has been started.
+        :param ticks: an integer that represents the number of live ticks replayed by update_all.
+        :param days: a number that represents the length of the backtest in days.
+        :param pairs: an integer that represents the number of pairs used to measure memory per pair.
+        """
+        self.server = server
+        self.primary, self.secondary, self.resolution = primary, secondary, resolution
+        self.ticks, self.days, self.pairs = ticks, days, pairs
+        self.swyftx = None
+
+    def _swyftx(self):
+        return SwyftX("benchmark", base_url=self.server.url)
+
+    def _bot(self, **kwargs):
+        return Bot("benchmark", swyftx=self.swyftx, balance={self.primary: 10000}, runtime=_NoClock(), **kwargs)
+
+    def startup(self):
+        """
+        Time until a SwyftX object has its token and asset table, and until a Bot has its balance.
+        """
+        start = perf_counter()
+        self.swyftx = self._swyftx()
+        self.swyftx.to_id(self.secondary)
+        self.swyftx.authenticate_header
+        swyftx_ready = perf_counter() - start
+        start = perf_counter()
+        bot = Bot("benchmark", swyftx=self.swyftx)
+        bot.balance
+        return {"swyftx_ready_s": swyftx_ready, "bot_ready_s": perf_counter() - start}
+
+    def get_asset_data(self):
+        """
+        Downloading and parsing candles (getBars responses, then extract_price_data) with get_asset_data.
+        """
+        end = erase_seconds(time()) - resolution_to_seconds[self.resolution]
+        start = end - self.days * 86400
+        t = perf_counter()
+        raw = self.swyftx.get_asset_data(self.primary, self.secondary, "ask", self.resolution, start * 1000, end * 1000,
+                                         chunked=True)
+        download = perf_counter() - t
+        t = perf_counter()
+        data = self.swyftx.extract_price_data(raw)
+        parse = perf_counter() - t
+        return {"candles": len(data["close"]), "get_asset_data_s": download, "extract_price_data_s": parse,
+                "candles_per_s": len(data["close"]) / parse if parse else None}
+
+    def collect_and_process_live_data(self):
+        """
+        Seeding a bot (download, parsing and indicators) as done when it starts or zooms in/out.
+        """
+        times = []
+        for _ in range(5):
+            bot = self._bot()
+            start = perf_counter()
+            bot.collect_and_process_live_data(self.primary, self.secondary, self.resolution)
+            times.append(perf_counter() - start)
+        return _summary(times)
+
+    def update_financial_figures(self):
+        """
+        Indicator updates for one new bar, without any request.
+        """
+        bot = self._bot()
+        bot.collect_and_process_live_data(self.primary, self.secondary, self.resolution)
+        data = bot.data[check_rank(self.resolution)]
+        row = data.row()
+        times = []
+        for i in range(2000):
+            data.append(row["time"] + (i + 1) * resolution_to_seconds[self.resolution], row["open"], row["high"],
+                        row["low"], row["close"], row["volume"])
+            start = perf_counter()
+            bot.update_financial_figures()
+            times.append(perf_counter() - start)
+        return _summary(times, unit=1e6)
+
+    def update_all(self):
+        """
+        Per-tick latency of update_all, replaying the last self.ticks completed candles. Ticks that placed an order
+        are also reported separately (tick-to-order latency).
+        """
+        length = resolution_to_seconds[self.resolution]
+        last = erase_seconds(time()) // length * length - length
+        first = last - (self.ticks - 1) * length
+        bot = self._bot()
+        bot.collect_and_process_live_data(self.primary, self.secondary, self.resolution, end_time=first,
+                                          whole_resolution=False)
+        bot.fast, bot.slow, bot.signal, bot.long, bot.buy_rate = 12, 26, 9, 100, 0.2
+        bot.running = True
+        candles = self.swyftx.get_completed_data_since(self.primary, self.secondary, "ask", self.resolution,
+                                                       bot.data[check_rank(self.resolution)]["time"][-1])
+        times, order_times = [], []
+        for c in candles:
+            if bot.resolution != self.resolution:
+                # Zoomed in or out, so the next candle of this resolution doesn't apply any more.
+                break
+            orders = len(bot.history)
+            start = perf_counter()
+            bot.update_all(new_data=c)
+            times.append(perf_counter() - start)
+            if len(bot.history) > orders:
+                order_times.append(times[-1])
+        return {"ticks": _summary(times), "ticks_with_orders": _summary(order_times)}
+
+    def backtest(self):
+        """
+        Bars per second processed by Bot.quick_start(backtest=True) and by VectorBacktest on the same feed.
+        """
+        backtest_end = datetime.fromtimestamp(erase_seconds(time())) - timedelta(hours=1)
+        start_time = backtest_end - timedelta(days=self.days)
+        end_time = start_time + timedelta(days=1)
+        feed = BacktestFeed(self.swyftx, self.primary, self.secondary,
+                            *backtest_window(self.resolution, start_time, backtest_end))
+        t = perf_counter()
+        feed.preload("ask", self.resolution)
+        feed.preload("bid", self.resolution)
+        preload = perf_counter() - t
+        bars = int((backtest_end - end_time).total_seconds() / resolution_to_seconds[self.resolution])
+
+        bot = Bot("benchmark", backtest=True, swyftx=self.swyftx, balance={self.primary: 10000})
+        t = perf_counter()
+        bot.quick_start(self.primary, self.secondary, self.resolution, start_time=start_time, end_time=end_time,
+                        backtest=True, backtest_end_time=backtest_end, feed=feed)
+        loop = perf_counter() - t
+
+        vector = VectorBacktest(feed, self.primary, self.secondary)
+        t = perf_counter()
+        vector.run(self.resolution, start_time, end_time, backtest_end)
+        vectorised = perf_counter() - t
+        return {"bars": bars, "preload_s": preload, "bot_s": loop, "bot_bars_per_s": bars / loop,
+                "vector_s": vectorised, "vector_bars_per_s": bars / vectorised, "trades": len(bot.history)}
+
+    def memory_per_pair(self):
+        """
+        Memory held by each additional seeded bot sharing one SwyftX object.
+        """
+        codes = [c for c, a in self.server.assets.items() if a["rank"] is not None and c != self.primary]
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        bots = []
+        for i in range(self.pairs):
+            bot = self._bot()
+            bot.collect_and_process_live_data(self.primary, codes[i % len(codes)], self.resolution)
+            bots.append(bot)
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"pairs": self.pairs, "bytes_per_pair": (after - before) / self.pairs, "peak_bytes": peak - before}
+
+    def update_graph(self):
+        """
+        Rebuilding the figure shown by the live graph (requires plotly).
+        """
+        try:
+            from visualisation import figure
+        except ImportError as e:
+            return {"skipped": f"{e}"}
+        bot = self._bot()
+        bot.collect_and_process_live_data(self.primary, self.secondary, self.resolution)
+        times = []
+        for _ in range(20):
+            start = perf_counter()
+            figure(bot, last=60, vertical_spacing=0.2)
+            times.append(perf_counter() - start)
+        return _summary(times)
+
+    def run(self, names=None):
+        """
+        :param names: a list of benchmark names (methods of this class). If None, every benchmark is run.
+        :return: a dictionary that maps each benchmark to its results.
+        """
+        names = names or benchmarks
+        results = {}
+        # Bot prints a lot at every step, which would otherwise dominate the timings.
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Every other benchmark needs self.swyftx.
+            results["startup"] = self.startup()
+            for name in names:
+                if name != "startup":
+                    results[name] = getattr(self, name)()
+        return results
+
+
+benchmarks = ["startup", "get_asset_data", "collect_and_process_live_data", "update_financial_figures", "update_all",
+              "backtest", "memory_per_pair", "update_graph"]
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, prefix + k + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[prefix + k] = v
+    return out
+
+
+def compare(before, after):
+    """
+    Prints every number in the results of after next to the same number in before, with the relative change.
+    :param before: a dictionary loaded from a file written by this script.
+    :param after: same as before.
+    """
+    old, new = _flatten(before["results"]), _flatten(after["results"])
+    print(f"{'metric':<60}{'before':>14}{'after':>14}{'change':>10}")
+    for k, v in new.items():
+        if k in old:
+            change = f"{100 * (v / old[k] - 1):+.1f}%" if old[k] else ""
+            print(f"{k:<60}{old[k]:>14.4g}{v:>14.4g}{change:>10}")
+
+
+def run(names=None, latency=0, ticks=200, days=7, pairs=10, resolution="5m"):
+    """
+    Starts a FakeSwyftXServer and runs the benchmarks against it, from a temporary directory so nothing is written
+    next to the code (history, token.txt).
+    :return: a dictionary with the results and what they were measured on.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory, FakeSwyftXServer(latency=latency) as server:
+        os.chdir(directory)
+        try:
+            results = Benchmark(server, resolution=resolution, ticks=ticks, days=days, pairs=pairs).run(names)
+        finally:
+            os.chdir(cwd)
+    return {
+        "commit": _commit(),
+        "time": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"latency": latency, "ticks": ticks, "days": days, "pairs": pairs, "resolution": resolution},
+        "results": results
+    }
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(description="Benchmarks the bot's hot paths against a local fake SwyftX.")
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run: {', '.join(benchmarks)} (default: all).")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds the fake server delays every response by.")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--pairs", type=int, default=10)
+    parser.add_argument("--resolution", default="5m")
+    parser.add_argument("--output", help="File to save the results to as JSON. Printed if not given.")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with.")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in benchmarks:
+            parser.error(f"Unknown benchmark '{name}'. Please choose from: {', '.join(benchmarks)}")
+
+    out = run(args.benchmarks, args.latency, args.ticks, args.days, args.pairs, args.resolution)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(out, f, indent=2)
+    else:
+        print(json.dumps(out, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), out)
@@ -1,33 +1,27 @@
-import numpy as np
-import dash
-import plotly.graph_objects as go
-import dash_core_components as dcc
-import dash_html_components as html
-import webbrowser
-import pandas as pd
 import os
 
-from collections import deque
-from plotly.subplots import make_subplots
+from concurrent.futures import ThreadPoolExecutor
 from swyftx import SwyftX
+from backtest_feed import BacktestFeed, backtest_window
+from aggregator import MultiResolutionAggregator, zoom_resolutions
 from tools import Id_Generator
+from trade_journal import TradeJournal, columns as journal_columns
+from indicators import macd_engine
 from datetime import datetime, timedelta
-from talib import EMA
 from time import time, sleep
 from random import uniform
-from dash.dependencies import Output, Input
 from nearest import erase_seconds, next_interval, resolution_to_seconds, check_rank, rank_up, rank_down, \
     no_of_resolutions, calculate_next_interval
-from threading import Timer
 from errors import *
 
-port = 5000
-app = dash.Dash(__name__)
+# dash/plotly (visualisation.py) and pandas are only imported when plotting or graphing, so headless bots don't pay for
+# them.
 
 
 class Bot:
 
-    def __init__(self, key, mode="demo", backtest=False):
+    def __init__(self, key, mode="demo", backtest=False, candle_store=None, swyftx=None, balance=None, runtime=None,
+                 asset_cache=None):
         """
         Initialising Bot.
         :param key: a string that is the SwyftX API key. Instructions to creating your own is here:
@@ -36,28 +30,58 @@ class Bot:
             'demo': if you want to use SwyftX' demo mode where you have $10k USD to trade.
             'base': if you want to trade for real.
         :param backtest: a boolean that determines whether to initiate the bot in backtest mode.
+        :param candle_store: a CandleStore, or a string that represents the directory of one. Historical candles will
+            be read from it instead of being downloaded again every time we zoom in/out or restart.
+        :param swyftx: a SwyftX object to share with other bots. If None, a new one is created.
+        :param balance: a dictionary returned by SwyftX.fetch_balance() to share with other bots. If None, the balance
+            ledger of the SwyftX object (see BalanceLedger) is used, or a copy of the balance when backtesting.
+        :param runtime: a Runtime that schedules this bot's updates together with other bots instead of it running its
+            own clock.
+        :param asset_cache: an AssetCache, or a string that represents the file of one. Same as in SwyftX.
+
+        The balance is fetched in the background, so creating a Bot doesn't wait for SwyftX. Reading self.balance
+        waits for it if it hasn't arrived yet.
         """
         self.key = key
-        self.swyftx = SwyftX(key, mode)
-        self.ema_fast, self.ema_slow, self.macd, self.ema_hundred, self.macdsignal, self.data = [None for _ in range(
-            no_of_resolutions)], [None for _ in range(no_of_resolutions)], [None for _ in range(no_of_resolutions)], [
-                                                                                                    None for _ in range(
-                no_of_resolutions)], [None for _ in range(no_of_resolutions)], [None for _ in range(no_of_resolutions)]
+        self._balance, self._balance_future = None, None
+        self.swyftx = SwyftX(key, mode, candle_store=candle_store, asset_cache=asset_cache) if swyftx is None else swyftx
+        self.runtime = runtime
+        # self.indicators holds an IndicatorEngine (ema_fast, ema_slow, macd, macdsignal, ema_hundred) per resolution.
+        self.indicators, self.data = [None for _ in range(no_of_resolutions)], [None for _ in range(no_of_resolutions)]
         self.backtest = backtest
         self.primary, self.secondary, self.balance, self.resolution, self.swing_low, self.last_macd, self.last_signal, self.cross, self.macd_gradient, self.signal_gradient, self.buy_signal, self.bull, self.app, self.buy_rate, self.buy_price, self.stop_loss_id = None, None, None, None, None, None, None, None, None, None, None, None, None, None, None, None
         self.fast, self.slow, self.signal, self.long = None, None, None, None
         self.start_time, self.id_gen, self.backtest_stop_loss_order, self.backtest_ctime, self.periods = None, None, None, None, None
         self.history = []
         self.zoomed, self.bought, self.running = False, False, False
-        self.history_directory = None
-        self.tolerance, self.temp_tolerance = 0, 0
-        self.balance = self.swyftx.fetch_balance()
+        # Orders are appended to self.journal as they're made (see self.record_order()).
+        self.journal = None
+        self.feed = None
+        self.aggregator = None
+        self.tolerance, self.temp_tolerance, self.swing_period = 0, 0, 60
+        if balance is None:
+            startup = ThreadPoolExecutor(max_workers=1)
+            self._balance_future = startup.submit(self.swyftx.fetch_balance if backtest else self.swyftx.ledger.sync)
+            startup.shutdown(wait=False)
+        else:
+            self.balance = balance
         print("-" * 110)
         print("Bot created. Please call 'collect_and_process_live_data' to start trading a particular cryptocurrency.")
         print("-" * 110)
 
+    @property
+    def balance(self):
+        if self._balance_future is not None:
+            self._balance, self._balance_future = self._balance_future.result(), None
+        return self._balance
+
+    @balance.setter
+    def balance(self, value):
+        self._balance, self._balance_future = value, None
+
     def quick_start(self, primary, secondary, resolution="5m", fast=12, slow=26, signal=9, long=100,
-                    whole_resolution=True, start_time=None, end_time=None, buy_rate=0.2, graph=False, backtest=False, backtest_end_time = datetime.now()):
+                    whole_resolution=True, start_time=None, end_time=None, buy_rate=0.2, graph=False, backtest=False, backtest_end_time = datetime.now(),
+                    feed=None, swing_period=60, tolerance=2, aggregate=False):
         """
         Allows you to start trading quickly by initialising other parts of Bot for it to function properly.
         This function is usually called immediately after the initialisation of Bot.
@@ -80,6 +104,16 @@ class Bot:
         :param backtest: a boolean that determines whether to backtest the current strategy. If so, start_time
             will have to be manually specified. end_time can be left as None because it will be assumed to be the most
             recent timeslot at the time of execution.
+        :param backtest_end_time: a datetime object that determines when backtesting stops.
+        :param feed: a BacktestFeed that the backtest is run on. If None, a new one will be created which downloads the
+            ask/bid series for the whole backtesting window once, so no requests are made for each bar.
+        :param swing_period: an integer that determines the number of periods up till now to consider when determining
+            the minimum swing low.
+        :param tolerance: an integer that is used to determine how many times the MACD gradient can go negative before
+            the bot executes a sell order.
+        :param aggregate: a boolean that determines whether to only fetch candles of the finest resolution the strategy
+            uses and build the coarser ones locally (see MultiResolutionAggregator), so zooming in/out doesn't
+            download anything.
 
         """
 
@@ -92,8 +126,18 @@ class Bot:
         if start_time is None:
             start_time = end_time - timedelta(seconds=resolution_to_seconds[resolution] * long)
 
+        if backtest:
+            if feed is None:
+                feed = BacktestFeed(self.swyftx, primary, secondary,
+                                    *backtest_window(resolution, start_time, backtest_end_time, long))
+            self.feed = feed
+        else:
+            self.feed = None
+        self.aggregator = None
+
         self.collect_and_process_live_data(primary, secondary, resolution, fast, slow, signal, long,
-                                           start_time=start_time, end_time=end_time, whole_resolution=whole_resolution)
+                                           swing_period=swing_period, tolerance=tolerance, start_time=start_time,
+                                           end_time=end_time, whole_resolution=whole_resolution, aggregate=aggregate)
         self.fast, self.slow, self.signal, self.long = fast, slow, signal, long
         self.buy_rate = buy_rate
         self.backtest = backtest
@@ -106,20 +150,13 @@ class Bot:
             # print("Anticipated execution time: ", datetime.fromtimestamp(execution_time))
             # sleep(execution_time-now)
 
-            app.layout = html.Div(
-                [
-                    dcc.Graph(id="live-graph", animate=False, style={'height': '100vh'}),
-                    dcc.Interval(id='graph-update',
-                                 interval=1000 * resolution_to_seconds[resolution])
-                ]
-            )
+            from visualisation import run_app
             now = time()
             execution_time = next_interval[self.resolution](now)
             print("Execution time: ", datetime.fromtimestamp(now))
             print("Anticipated execution time: ", datetime.fromtimestamp(execution_time))
             sleep(execution_time - now)
-            Timer(0.1, open_browser).start()
-            app.run_server(debug=False, port=port)
+            run_app(self, resolution)
         # There are 2 possibilities after this point.
         # 1. The next interval has already started (very rare, only realistically happens when interval="1m")
         # 2. There are still time until we reach the next interval.
@@ -138,20 +175,28 @@ class Bot:
                 # Calculates the number of resolutions between start_time and end_time. This value will be
                 # used to set
 
+                # Backtested orders mustn't touch the balance ledger, which is shared with live bots.
+                if self.balance is self.swyftx.ledger:
+                    self.balance = dict(self.balance)
                 # Set the targeted asset to 0
                 self.balance[self.secondary] = 0
 
                 i = 0
-                while self.data[check_rank(self.resolution)]["time"][-1] < backtest_end_time:
+                while self.data[check_rank(self.resolution)].last_time() < backtest_end_time:
                     i += 1
                     print(i)
-                    self.update_all(fast, slow, signal, long)
-                self.history_directory = None
+                    try:
+                        self.update_all(fast, slow, signal, long)
+                    except EndOfDataError:
+                        break
+                # The next backtest is journaled in a new file.
+                if self.journal is not None:
+                    self.journal.close()
                 print("Backtesting complete!")
 
     def collect_and_process_live_data(self, primary, secondary, resolution="1m", fast=12, slow=26, signal=9, long=100,
                                       swing_period=60, tolerance=2, whole_resolution=True, start_time=None, end_time=None,
-                                      ):
+                                      aggregate=False):
         """
         Gathers and calculates initial data and financial figures. This function needs to be called for the bot to work.
         :param primary: a string that represents the ticker symbol of the asset that we'll use to evaluate the value of
@@ -172,6 +217,9 @@ class Bot:
             historical data relating to the secondary asset.
         :param end_time: a number or datetime object that determines the end time when we initially gather
             historical data relating to the secondary asset.
+        :param aggregate: a boolean that determines whether to build this resolution (and the one below it) from
+            candles of the finest resolution. Once the bot is aggregating, every resolution it covers is switched to
+            without downloading anything.
         """
         now = end_time
         if end_time is None:
@@ -198,32 +246,49 @@ class Bot:
         self.primary = primary
         self.secondary = secondary
         self.resolution = resolution
-        self.tolerance, self.temp_tolerance = tolerance, tolerance
+        self.tolerance, self.temp_tolerance, self.swing_period = tolerance, tolerance, swing_period
+
+        if aggregate or self.aggregating():
+            if not self.aggregating():
+                levels = zoom_resolutions(resolution)
+                data = self.swyftx.extract_price_data(self.data_source().get_asset_data(
+                    primary, secondary, "ask", levels[0], start_time * 1000, now * 1000, True))
+                self.aggregator = MultiResolutionAggregator(levels, fast, slow, signal, long)
+                self.aggregator.seed(data)
+            self.data[check_rank(resolution)] = self.aggregator.data[resolution]
+            self.indicators[check_rank(resolution)] = self.aggregator.indicators[resolution]
+            self.swing_low = self.data[check_rank(resolution)].last("low", swing_period).min()
+            return
 
         data = self.swyftx.extract_price_data(
-            self.swyftx.get_asset_data(primary, secondary, "ask", resolution, start_time * 1000, now * 1000, True))
+            self.data_source().get_asset_data(primary, secondary, "ask", resolution, start_time * 1000, now * 1000, True))
         # data_bid = self.extract_price_data(self.get_asset_data(primary, secondary, "bid", "1m", start_time, now, True))
         #print("data:",data)
 
         max_length = len(data["close"])
-        ema_fast = EMA(np.array(data["close"]), fast)
-        ema_slow = EMA(np.array(data["close"]), slow)
-        macd = ema_fast - ema_slow
-        #print("macd:",macd)
-        #print("signal:",signal)
-        self.macdsignal[check_rank(self.resolution)] = deque(EMA(macd, signal)[len(data["time"]) * (-1):])
-        self.ema_fast[check_rank(self.resolution)] = deque(ema_fast, max_length)
-        self.ema_slow[check_rank(self.resolution)] = deque(ema_slow, max_length)
-        self.macd[check_rank(self.resolution)] = deque(macd, max_length)
-        self.ema_hundred[check_rank(self.resolution)] = deque(EMA(np.array(data["close"]), long), max_length)
+        self.indicators[check_rank(self.resolution)] = macd_engine(fast, slow, signal, long, max(1, max_length))
+        self.indicators[check_rank(self.resolution)].seed(data)
         #t = data["time"][data["low"].index(min(list(data["low"])[swing_period * (-1):]))]
         #print("Swing Low time: ", t)
         #self.swing_low = self.swyftx.get_asset_timeslot(self.primary,self.secondary, "bid", self.resolution,t)["low"]
-        self.swing_low = min(list(data["low"])[swing_period * (-1):])
+        self.swing_low = data.last("low", swing_period).min()
             #min(
             #list(data["low"])[swing_period * (-1):])  # Could be subjected to change. Also considering 'close'.
         self.data[check_rank(self.resolution)] = data
 
+    def data_source(self):
+        """
+        Returns the object that historical data is fetched from. When backtesting, this is self.feed (which serves data
+        from memory), otherwise it's self.swyftx.
+        """
+        return self.feed if self.feed is not None else self.swyftx
+
+    def aggregating(self):
+        """
+        Checks whether the candles of the current resolution are built by self.aggregator.
+        """
+        return self.aggregator is not None and self.aggregator.covers(self.resolution)
+
     def step(self):
         self.update_all()
 
@@ -238,7 +303,14 @@ class Bot:
         else:
             print("Starting clock...")
             self.running = True
-            self.swyftx.livestream(function=self.update_all, **kwargs)
+            if self.aggregating():
+                # Only candles of the finest resolution are fetched, so the clock has to tick at that resolution.
+                kwargs["resolution"] = self.aggregator.finest
+            self.swyftx.ledger.start()
+            if self.runtime is not None:
+                self.runtime.schedule(self, kwargs["resolution"])
+            else:
+                self.swyftx.livestream(function=self.update_all, overrun="catch_up", catch_up=self.catch_up, **kwargs)
 
     def stop_clock(self):
         """
@@ -247,28 +319,46 @@ class Bot:
         if self.backtest:
             self.running = False
         else:
-            self.swyftx.stop_stream()
+            if self.runtime is not None:
+                self.runtime.unschedule(self)
+            else:
+                self.swyftx.stop_stream()
+            self.swyftx.ledger.stop()
             self.running = False
             print("Clock stopped.")
-        if len(self.history) > 0:
-            self.history_to_csv()
+        if self.journal is not None:
+            self.journal.flush()
 
-    def update_all(self, fast=12, slow=26, signal=9, long=100):
+    def update_all(self, fast=12, slow=26, signal=9, long=100, new_data=None, tick=None):
         """
-        Function to be called at each step. It retrieves new data from Swyftx, adds it to the deque, calculates new
-        values based on new data before adding them to their respective deques.
+        Function to be called at each step. It retrieves new data from Swyftx, adds it to self.data, and updates the
+        financial figures in self.indicators based on new data.
         :param fast: an integer that represents the number of periods considered when calculating the fast EMA.
         :param slow: an integer that represents the number of periods considered when calculating the slow EMA.
         :param signal: an integer that represents the number of periods considered when calculating the EMA for MACD.
         :param long: an integer that represents the number of periods considered when calculating the long EMA.
-        """
+        :param new_data: a dictionary returned by self.swyftx.get_last_completed_data() that has already been fetched
+            (e.g. by a Runtime). If None, it's fetched here.
+        :param tick: a dictionary returned by self.swyftx.get_tick() that has already been fetched. If both new_data and
+            tick are None, the tick is fetched here, with the bid bar fetched alongside the ask bar.
+        """
+        if new_data is None and tick is None and not self.backtest:
+            tick = self.swyftx.get_tick(self.primary, self.secondary,
+                                        self.aggregator.finest if self.aggregating() else self.resolution,
+                                        bid=not self.aggregating())
+        if tick is not None:
+            new_data = tick["ask"]
+        if self.aggregating():
+            self.update_aggregated(new_data)
+            return
         #print("Balance: ", self.balance)
         print(f"Last close: {self.data[check_rank(self.resolution)]['close'][-1]}")
-        print(f"Last time: {self.data[check_rank(self.resolution)]['time'][-1]}")
-        new_data = self.swyftx.get_last_completed_data(self.primary, self.secondary, "ask", self.resolution) if not self.backtest else self.swyftx.get_asset_timeslot(self.primary, self.secondary, "ask", self.resolution, datetime.fromtimestamp(calculate_next_interval(self.data[check_rank(self.resolution)]["time"][-1].timestamp(), interval=self.resolution)))
-        self.update_data(new_data)
+        print(f"Last time: {self.data[check_rank(self.resolution)].last_time()}")
+        if new_data is None:
+            new_data = self.data_source().get_asset_timeslot(self.primary, self.secondary, "ask", self.resolution, datetime.fromtimestamp(calculate_next_interval(self.data[check_rank(self.resolution)]["time"][-1], interval=self.resolution)))
+        self.update_data(new_data, tick)
         print(f"Updated close: {self.data[check_rank(self.resolution)]['close'][-1]}")
-        print(f"Update time: {self.data[check_rank(self.resolution)]['time'][-1]}")
+        print(f"Update time: {self.data[check_rank(self.resolution)].last_time()}")
         print('-' * 110)
         self.update_financial_figures(fast, slow, signal, long)
         #print("MACD crossed Signal: ", self.cross)
@@ -278,6 +368,49 @@ class Bot:
         self.macd_gradient_strategy()
         #print("History:",self.history)
 
+    def catch_up(self, missed=1):
+        """
+        Called by the clock when ticks were missed because a previous self.update_all() overran. Every candle that has
+        completed since the last one stored is fetched in one request, and processed in order as if its tick had run
+        on time.
+        :param missed: an integer that represents the number of ticks that were missed.
+        """
+        resolution = self.aggregator.finest if self.aggregating() else self.resolution
+        data = self.aggregator.data[resolution] if self.aggregating() else self.data[check_rank(resolution)]
+        candles = self.swyftx.get_completed_data_since(self.primary, self.secondary, "ask", resolution,
+                                                       data["time"][-1])
+        print(f"Catching up on {len(candles)} candle(s) after {missed} missed tick(s).")
+        for c in candles:
+            # The strategy may have stopped the clock or zoomed to another resolution along the way.
+            if not self.running or resolution != (self.aggregator.finest if self.aggregating() else self.resolution):
+                break
+            self.update_all(new_data=c)
+
+    def update_aggregated(self, new_data=None):
+        """
+        Same as self.update_all(), except it's used when self.aggregator builds the current resolution. A candle of the
+        finest resolution is fetched at each step, and the strategy only runs once it completes a candle of the current
+        resolution.
+        :param new_data: a dictionary returned by self.swyftx.get_last_completed_data() for the finest resolution that
+            has already been fetched. If None, it's fetched here.
+        """
+        finest = self.aggregator.finest
+        if new_data is None and self.backtest:
+            t = datetime.fromtimestamp(calculate_next_interval(self.aggregator.data[finest]["time"][-1], interval=finest))
+            new_data = self.data_source().get_asset_timeslot(self.primary, self.secondary, "ask", finest, t)
+        elif new_data is None:
+            new_data = self.swyftx.get_last_completed_data(self.primary, self.secondary, "ask", finest)
+        if self.resolution not in self.aggregator.update(new_data):
+            return
+        print(f"Updated close: {self.data[check_rank(self.resolution)]['close'][-1]}")
+        print(f"Update time: {self.data[check_rank(self.resolution)].last_time()}")
+        print('-' * 110)
+        p = self.data_source().get_asset_timeslot(self.primary, self.secondary, side="bid", resolution=self.resolution,
+                                                  t=self.data[check_rank(self.resolution)].last_time())
+        self.update_swing_low(float(p["low"]))
+        self.read_financial_figures()
+        self.macd_gradient_strategy()
+
     def macd_gradient_strategy(self):
         if not self.bought:
             if self.check_macro_buy_signal():
@@ -294,7 +427,7 @@ class Bot:
                     self.zoomed = True
                     # if backtesting, it'll be the last time appended to self.data[rank]['time'], else it is
                     # the current time.
-                    end = datetime.now() if not self.backtest else self.data[check_rank(self.resolution)]['time'][-1]
+                    end = datetime.now() if not self.backtest else self.data[check_rank(self.resolution)].last_time()
                     rank = rank_down(self.resolution)
                     #start = ... # end subtracted by the time self.periods * the numerical value of rank
                     self.collect_and_process_live_data(primary=self.primary,
@@ -304,6 +437,8 @@ class Bot:
                                                        slow=self.slow,
                                                        signal=self.signal,
                                                        long=self.long,
+                                                       swing_period=self.swing_period,
+                                                       tolerance=self.tolerance,
                                                        #start_time=start,
                                                        end_time=end)
 
@@ -324,17 +459,18 @@ class Bot:
         :param long: an integer that represents the number of periods considered when calculating the long EMA.
         """
         d = self.swyftx.get_latest_asset_data(self.primary, self.secondary, "ask", self.resolution)
-        if datetime.fromtimestamp(d["time"] / 1000) != self.data[check_rank(self.resolution)]["time"][-1]:
+        if d["time"] / 1000 != self.data[check_rank(self.resolution)]["time"][-1]:
             print(f"Last close: {self.data[check_rank(self.resolution)]['close'][-1]}")
-            print(f"Last time: {self.data[check_rank(self.resolution)]['time'][-1]}")
+            print(f"Last time: {self.data[check_rank(self.resolution)].last_time()}")
             self.update_data(d)
             print(f"Updated close: {self.data[check_rank(self.resolution)]['close'][-1]}")
-            print(f"Update time: {self.data[check_rank(self.resolution)]['time'][-1]}")
+            print(f"Update time: {self.data[check_rank(self.resolution)].last_time()}")
             self.update_financial_figures(fast, slow, signal, long)
 
     def update_financial_figures(self, fast=12, slow=26, signal=9, long=100):
         """
-        Calculates and updates all EMA figures. This includes: self.ema_fast, self.ema_slow, and self.ema_hundred.
+        Calculates and updates all financial figures in self.indicators (fast/slow/long EMA, MACD and MACD signal), in
+        O(1) per bar. The periods are the ones the indicators were seeded with in collect_and_process_live_data().
         *** This assumes that self.data["close"] is 1 period ahead of the aforementioned values.
         :param fast: an integer that represents the number of periods considered when calculating the fast EMA.
         :param slow: an integer that represents the number of periods considered when calculating the slow EMA.
@@ -344,49 +480,46 @@ class Bot:
         if self.data[check_rank(self.resolution)] is None:
             print("self.data is not defined. Please call 'collect_and_process_live_data'")
         else:
-            self.ema_fast[check_rank(self.resolution)].append(
-                self.calculate_latest_ema(self.data[check_rank(self.resolution)]["close"][-1],
-                                          self.ema_fast[check_rank(self.resolution)][-1], fast))
-            self.ema_slow[check_rank(self.resolution)].append(
-                self.calculate_latest_ema(self.data[check_rank(self.resolution)]["close"][-1],
-                                          self.ema_slow[check_rank(self.resolution)][-1], slow))
-            self.ema_hundred.append(self.calculate_latest_ema(self.data[check_rank(self.resolution)]["close"][-1],
-                                                              self.ema_hundred[check_rank(self.resolution)][-1], long))
-            self.last_macd = self.calculate_latest_macd()
-            self.macd[check_rank(self.resolution)].append(self.last_macd)
-            self.last_signal = self.calculate_latest_macd_signal(signal)
-            self.macdsignal[check_rank(self.resolution)].append(self.last_signal)
-            self.macd_gradient, self.signal_gradient = self.calculate_latest_gradients()
-            self.cross = self.macd_cross()
-
-    def update_data(self, d):
+            self.indicators[check_rank(self.resolution)].update(self.data[check_rank(self.resolution)].row())
+            self.read_financial_figures()
+
+    def read_financial_figures(self):
+        """
+        Sets the latest MACD, signal, gradients and cross from self.indicators, which have to be updated already.
+        """
+        self.last_macd = self.calculate_latest_macd()
+        self.last_signal = self.calculate_latest_macd_signal(self.signal)
+        self.macd_gradient, self.signal_gradient = self.calculate_latest_gradients()
+        self.cross = self.macd_cross()
+
+    def update_data(self, d, tick=None):
         """
         Called after calling self.swyftx.get_latest_asset_data() where it updates self.data with the data returned by
         the function.
         :param d: data dictionary returned by self.swyftx.get_latest_asset_data()
+        :param tick: a dictionary returned by self.swyftx.get_tick(). Its bid bar is used instead of fetching it here.
         """
         t = datetime.fromtimestamp(d["time"] / 1000)
-        self.data[check_rank(self.resolution)]["time"].append(t)
-        self.data[check_rank(self.resolution)]["open"].append(float(d["open"]))
-        self.data[check_rank(self.resolution)]["close"].append(float(d["close"]))
-        self.data[check_rank(self.resolution)]["low"].append(float(d["low"]))
-        self.data[check_rank(self.resolution)]["high"].append(float(d["high"]))
-        p = self.swyftx.get_asset_timeslot(self.primary, self.secondary, side="bid", resolution=self.resolution, t=t)
-        self.update_swing_low(p["low"])
+        self.data[check_rank(self.resolution)].append(d["time"] / 1000, float(d["open"]), float(d["high"]),
+                                                      float(d["low"]), float(d["close"]), float(d.get("volume", 0)))
+        if tick is not None and tick["bid"] is not None:
+            p = tick["bid"]
+        else:
+            p = self.data_source().get_asset_timeslot(self.primary, self.secondary, side="bid",
+                                                      resolution=self.resolution, t=t)
+        self.update_swing_low(float(p["low"]))
 
     def undo_all_data(self):
-        self.data["time"].pop()
-        self.data["open"].pop()
-        self.data["close"].pop()
-        self.data["low"].pop()
-        self.data["high"].pop()
+        """
+        Removes the newest candle of the current resolution.
+        """
+        self.data[check_rank(self.resolution)].pop()
 
     def undo_all_ema(self):
-        self.ema_fast.pop()
-        self.ema_slow.pop()
-        self.ema_hundred.pop()
-        self.macd.pop()
-        self.macdsignal.pop()
+        """
+        Rolls every financial figure of the current resolution back by one bar.
+        """
+        self.indicators[check_rank(self.resolution)].rollback()
 
     def calculate_latest_ema(self, latest_close, latest_ema, period):
         """
@@ -402,67 +535,78 @@ class Bot:
     def calculate_latest_macd(self):
         """
         Calculates the latest MACD value.
-        *** Assumes that self.ema_fast and self.ema_slow are already updated.
+        *** Assumes that self.indicators is already updated.
         :return: the latest MACD value.
         """
-        return self.ema_fast[check_rank(self.resolution)][-1] - self.ema_slow[check_rank(self.resolution)][-1]
+        return self.indicators[check_rank(self.resolution)].value("macd")
 
     def calculate_latest_macd_signal(self, signal=9):
         """
         Calculates the latest MACD signal value.
-        *** Assumes that self.macd is already updated.
+        *** Assumes that self.indicators is already updated.
         :param signal: an integer that represents the period in which we're interested in calculating the EMA (signal)
             of the latest MACD value.
         :return: the latest MACD signal value.
         """
-        return self.calculate_latest_ema(self.macd[check_rank(self.resolution)][-1],
-                                         self.macdsignal[check_rank(self.resolution)][-1], signal)
+        return self.indicators[check_rank(self.resolution)].value("macdsignal")
 
     def update_swing_low(self, value):
         """
         Checks to see if the newest value is less than the current swing low or not. If so, set self.swing_low to the
         latest value.
-        """
-        if self.swing_low >= value:
-            # If we see a value equal to or lower than the old swing-low, then we'll have to zoom out 1 level
-            # because it implies that the previous stop loss order has been filled, and therefore we'll have to zoom out
-            # to look at the overall trend once again.
-            # Since the stop loss order has been filled, self.bought will become False because we're now looking for a
-            # new opportunity to re-enter the market.
-            if not self.backtest: # Stop loss check is disabled during backtesting
-                if self.stop_loss_id: # This check is necessary because it's possible that a swing-low was reached, but a
-                    # stop sell was never placed.
-                    r = self.swyftx.get_order(self.stop_loss_id)
-
-                    if r.ok:
-                        if r.json()["status"] == 4: # This means that the order is filled.
-                            self.zoomed = False
-                            self.bought = False
-                            self.record_stop_loss()
-                            # Record stop loss transaction to history.
-                            self.stop_clock()
-
-                            self.collect_and_process_live_data(primary=self.primary, secondary=self.secondary,
-                                                               resolution=rank_up(self.resolution))
-
-                            self.run_clock(resolution=self.resolution)
+
+        The state of the stop loss is read from self.swyftx.order_tracker, which refreshes it in the background, so
+        a fill is noticed at the next tick even if the swing low hasn't been reached.
+        """
+        breached = self.swing_low >= value
+        if not self.backtest and self.stop_loss_id: # Stop loss check is disabled during backtesting
+            # Lets the tracker refresh the stop loss more often while the price is close to it.
+            self.swyftx.order_tracker.update_price(self.primary, self.secondary, value)
+            # If we see a value equal to or lower than the old swing-low, the stop loss has most likely been filled,
+            # so don't wait for the next refresh.
+            order = self.swyftx.order_tracker.get(self.stop_loss_id)
+            if breached and (order is None or order["status"] != 4):
+                order = self.swyftx.order_tracker.refresh(self.stop_loss_id)
+
+            if order is not None and order["status"] == 4: # This means that the order is filled.
+                # Since the stop loss order has been filled, self.bought will become False because we're now looking
+                # for a new opportunity to re-enter the market, and we zoom out to look at the overall trend again.
+                self.zoomed = False
+                self.bought = False
+                self.update_balance(order)
+                self.record_stop_loss(order)
+                # Record stop loss transaction to history.
+                self.swyftx.order_tracker.forget(self.stop_loss_id)
+                self.stop_loss_id = None
+                self.stop_clock()
+
+                self.collect_and_process_live_data(primary=self.primary, secondary=self.secondary,
+                                                   resolution=rank_up(self.resolution), fast=self.fast,
+                                                   slow=self.slow, signal=self.signal, long=self.long,
+                                                   swing_period=self.swing_period,
+                                                   tolerance=self.tolerance)
+
+                self.run_clock(resolution=self.resolution)
+        if breached:
             self.swing_low = value
 
 
 
-    def record_stop_loss(self):
+    def record_stop_loss(self, order=None):
         """
         Records stop loss details to self.history.
         Responsible for:
             - checking if we're in backtesting mode
             - checking if the order is valid or not
+        :param order: the state of the stop loss returned by self.swyftx.order_tracker. If None, it's fetched here.
         """
         if self.backtest:
             order = self.backtest_stop_loss_order
         else:
-            order = self.order_to_list(self.swyftx.get_order(self.stop_loss_id).json())
+            order = self.order_to_list(order if order is not None else
+                                       self.swyftx.order_tracker.refresh(self.stop_loss_id))
         print("Stop loss order:",order)
-        self.history.append(order)
+        self.record_order(order)
 
 
     def calculate_latest_gradients(self):
@@ -470,8 +614,9 @@ class Bot:
         Calculates the change in terms of financial figures.
         :return: gradients for MACD and MACD signal respectively.
         """
-        return self.macd[check_rank(self.resolution)][-1] - self.macd[check_rank(self.resolution)][-2], \
-               self.macdsignal[check_rank(self.resolution)][-1] - self.macdsignal[check_rank(self.resolution)][-2]
+        macd = self.indicators[check_rank(self.resolution)]["macd"]
+        macdsignal = self.indicators[check_rank(self.resolution)]["macdsignal"]
+        return macd[-1] - macd[-2], macdsignal[-1] - macdsignal[-2]
 
     def macd_cross(self):
         """
@@ -486,8 +631,9 @@ class Bot:
 
         # print("Current MACD: ", self.macd[-1])
         # print("Current signal: ", self.macdsignal[-1])
-        return self.macd[check_rank(self.resolution)][-2] < self.macdsignal[check_rank(self.resolution)][-2] and \
-               self.macd[check_rank(self.resolution)][-1] > self.macdsignal[check_rank(self.resolution)][-1]
+        macd = self.indicators[check_rank(self.resolution)]["macd"]
+        macdsignal = self.indicators[check_rank(self.resolution)]["macdsignal"]
+        return macd[-2] < macdsignal[-2] and macd[-1] > macdsignal[-1]
 
     def check_macro_buy_signal(self):
         """
@@ -495,8 +641,8 @@ class Bot:
         and that MACD has crossed signal.
         :return: a boolean
         """
-        return self.ema_hundred[check_rank(self.resolution)][-1] <= self.data[check_rank(self.resolution)]["low"][
-            -1] and self.cross
+        return self.indicators[check_rank(self.resolution)].value("ema_hundred") <= \
+               self.data[check_rank(self.resolution)]["low"][-1] and self.cross
 
     def order_to_list(self, d):
         """
@@ -518,8 +664,8 @@ class Bot:
         if self.backtest:
             r = self.backtest_buy(amount, assetQuantity)
         else:
-            r = self.swyftx.market_buy(self.primary, self.secondary, amount,
-                                   assetQuantity).json()
+            with self.swyftx.ledger.placing():
+                r = self.swyftx.market_buy(self.primary, self.secondary, amount, assetQuantity).json()
 
         if r["order"]["status"] == 4:  # If purchase is successful, set self.bought to true, and create
             # stop loss
@@ -533,7 +679,7 @@ class Bot:
             # Record and save
             order = self.order_to_list(r)
             print("Buy order:",order)
-            self.history.append(order)
+            self.record_order(order)
 
 
         return r
@@ -574,29 +720,35 @@ class Bot:
         if self.backtest:
             r = self.backtest_sell(amount, assetQuantity, backtest_mode)
         else:
-            r = self.swyftx.market_sell(self.primary, self.secondary, amount,
-                                        assetQuantity).json()
+            with self.swyftx.ledger.placing():
+                r = self.swyftx.market_sell(self.primary, self.secondary, amount, assetQuantity).json()
         if r["order"]["status"] == 4: # If market sell is successful.
             self.update_balance(r)
             # Apparently, we don't get charged any fees in the demo mode.
             if self.stop_loss_id:
                 self.swyftx.delete_order(self.stop_loss_id)
+                self.swyftx.order_tracker.forget(self.stop_loss_id)
                 self.stop_loss_id = None
             self.bought = False
             self.zoomed = False
             order = self.order_to_list(r)
             print("Sell order:",order)
-            self.history.append(order)
+            self.record_order(order)
 
             # Used for timer related stuff:
             if self.running:
                 self.stop_clock()
                 if self.backtest:
                     self.collect_and_process_live_data(primary=self.primary, secondary=self.secondary,
-                                                       resolution=rank_up(self.resolution), end_time=self.data[check_rank(self.resolution)]["time"][-1])
+                                                       resolution=rank_up(self.resolution), fast=self.fast,
+                                                       slow=self.slow, signal=self.signal, long=self.long,
+                                                       swing_period=self.swing_period, tolerance=self.tolerance,
+                                                       end_time=self.data[check_rank(self.resolution)].last_time())
                 else:
                     self.collect_and_process_live_data(primary=self.primary, secondary=self.secondary,
-                                                       resolution=rank_up(self.resolution))
+                                                       resolution=rank_up(self.resolution), fast=self.fast,
+                                                       slow=self.slow, signal=self.signal, long=self.long,
+                                                       swing_period=self.swing_period, tolerance=self.tolerance)
                 self.run_clock(resolution=self.resolution)
 
     def backtest_sell(self, amount, assetQuantity, mode="close"):
@@ -638,9 +790,19 @@ class Bot:
             out = self.swyftx.stop_loss(self.primary, self.secondary, amount,
                                   self.swing_low, assetQuantity=assetQuantity).json()["orderUuid"]
             self.stop_loss_id = out
+            self.swyftx.order_tracker.track(out, self.on_order_closed, self.primary, self.secondary, self.swing_low)
 
         return out
 
+    def on_order_closed(self, order):
+        """
+        Called by self.swyftx.order_tracker (from its own thread) when an order placed by this bot is filled or closed.
+        The fill is applied to the balance straight away, and the bot acts on it at its next tick.
+        """
+        if order["status"] == 4:
+            self.update_balance(order)
+        print(f"{self.primary}/{self.secondary}: order {order['orderUuid']} closed with status {order['status']}.")
+
     def update_balance(self, order=None):
         if self.backtest:
             print("Balance before: ", self.balance)
@@ -654,7 +816,11 @@ class Bot:
                 raise InvalidTypeError
             print("Balance after: ", self.balance)
         else:
-            self.balance = self.swyftx.fetch_balance()
+            # The fill is applied locally instead of fetching the balance, and the ledger is reconciled with SwyftX in
+            # the background. Orders are only applied once, however many times they're reported.
+            self.swyftx.ledger.apply(order)
+            if self.balance is not self.swyftx.ledger:
+                self.balance.update(self.swyftx.ledger)
 
     def primary_balance(self):
         return float(self.balance[self.primary])
@@ -667,125 +833,46 @@ class Bot:
                  "quantity": amount,
                  "trigger": None,
                  "status": 4,
-                 "created_time": self.data[check_rank(self.resolution)]["time"][-1],
-                 "updated_time": self.data[check_rank(self.resolution)]["time"][-1],
+                 "created_time": self.data[check_rank(self.resolution)].last_time(),
+                 "updated_time": self.data[check_rank(self.resolution)].last_time(),
                  "amount": None,
                  "total": amount,
                  "rate": None,
                  "userCountryValue": amount,
                  }
 
-    def history_to_csv(self):
-        d = pd.DataFrame(self.history, columns=["orderUuid", "order_type", "primary_asset", "secondary_asset", "quantity_asset", "quantity", "trigger", "status", "created_time", "updated_time", "amount", "total", "rate","userCountryValue"])
-        if self.history_directory:
-            pass
-        else:
-            path = os.path.join("history", self.secondary)
-            filename = str(1+len(os.listdir(path)))+".csv"
-            self.history_directory = os.path.join(path, filename)
-        d.to_csv(self.history_directory, index=False)
+    def record_order(self, order):
+        """
+        Adds an order to self.history and appends it to this bot's trade journal, which is opened the first time an
+        order is recorded: history/<secondary>/<primary>.csv when trading, and a new file for each backtest.
+        :param order: a list returned by self.order_to_list(), or the dummy stop loss order of a backtest.
+        """
+        self.history.append(order)
+        if self.journal is None or self.journal.closed:
+            # Backtests that start at the same time (e.g. in parallel workers) mustn't share a file.
+            name = f"backtest_{self.primary}_{int(time() * 1000)}_{os.getpid()}_{id(self):x}.csv" if self.backtest \
+                else f"{self.primary}.csv"
+            self.journal = TradeJournal(os.path.join("history", self.secondary, name))
+        if type(order) is dict:
+            order = [order.get(c) for c in journal_columns]
+        self.journal.append(order)
+
+    def export_history(self, path):
+        """
+        Saves the trade journal in a compact columnar form (see TradeJournal.export()).
+        :param path: a string that represents the path of the archive.
+        :return: a dictionary that maps each column to its array, or None if no order has been recorded yet.
+        """
+        if self.journal is None:
+            return None
+        return self.journal.export(path)
 
     def plot(self, resolution=None, last=None):
         """
         Plots the data that is currently stored inside Bot.
         """
-        if last is None:
-            last = 0
-        if resolution is None:
-            idx = check_rank(self.resolution)
-        else:
-            idx = check_rank(resolution)
-        code = self.data[idx]["assetCode"]
-        time = list(self.data[idx]["time"])[last * -1:]
-        open_ = list(self.data[idx]["open"])[last * -1:]
-        high = list(self.data[idx]["high"])[last * -1:]
-        low = list(self.data[idx]["low"])[last * -1:]
-        close = list(self.data[idx]["close"])[last * -1:]
-        fig = make_subplots(rows=2, cols=1, shared_xaxes=True)
-        candle = go.Candlestick(x=time, open=open_, high=high, low=low, close=close, name="Candle")
-
-        ema_g = go.Scatter(x=time, y=list(self.ema_hundred[idx])[last * -1:], marker={'color': "orange"},
-                           name="Long EMA")
-
-        fig.add_trace(candle, row=1, col=1)
-        fig.add_trace(ema_g, row=1, col=1)
-
-        macdeez = go.Scatter(x=time, y=list(self.macd[idx])[last * -1:], marker={'color': 'blue'}, name="MACD")
-        macdeezsignal = go.Scatter(x=time, y=list(self.macdsignal[idx])[last * -1:], marker={"color": "red"},
-                                   name="Signal")
-
-        fig.add_trace(macdeez, row=2, col=1)
-        fig.add_trace(macdeezsignal, row=2, col=1)
-
-        fig.update_layout(title={
-            "text": code,
-            "x": 0.5,
-            "xanchor": "center",
-            "yanchor": "top"
-        })
-
-        fig.show()
-
-
-@app.callback(Output("live-graph", "figure"), [Input("graph-update", "n_intervals")])
-def update_graph(n):
-    """
-    Called each step to update the graph based on data and financial figures stored inside Bot.
-    :param n: an integer that represents the number of steps since the beginning.
-    """
-    # Live data resources:
-    # https://dash.plotly.com/live-updates
-    # https://realpython.com/python-dash/
-    # https://pythonprogramming.net/live-graphs-data-visualization-application-dash-python-tutorial/
-
-    # print("Callback executed")
-    # print("Graph time: ", datetime.now())
-    bot.safe_update_all()
-    # bot.update_all()
-    code = bot.data[check_rank(bot.resolution)]["assetCode"]
-    # print("Execution time: ", datetime.now())
-    # print("Last time: ", bot.data["time"][-1])
-    time = list(bot.data[check_rank(bot.resolution)]["time"])[-60:]
-    open_ = list(bot.data[check_rank(bot.resolution)]["open"])[-60:]
-    high = list(bot.data[check_rank(bot.resolution)]["high"])[-60:]
-    low = list(bot.data[check_rank(bot.resolution)]["low"])[-60:]
-    close = list(bot.data[check_rank(bot.resolution)]["close"])[-60:]
-    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.2)
-
-    candle = go.Candlestick(x=time, open=open_, high=high, low=low, close=close, name="Candle")
-    fig.add_trace(candle, row=1, col=1)
-    ema_g = go.Scatter(x=time, y=list(bot.ema_hundred[check_rank(bot.resolution)])[-60:], marker={'color': "orange"},
-                       name="Long EMA")
-
-    fig.add_trace(ema_g, row=1, col=1)
-    # fig.add_trace(candle, row=1, col=1)
-    # fig.add_trace(ema_g, row=1, col=1)
-
-    macdeez = go.Scatter(x=time, y=list(bot.macd[check_rank(bot.resolution)])[-60:], marker={'color': 'blue'},
-                         name="MACD")
-    macdeezsignal = go.Scatter(x=time, y=list(bot.macdsignal[check_rank(bot.resolution)])[-60:],
-                               marker={"color": "red"}, name="Signal")
-
-    fig.add_trace(macdeez, row=2, col=1)
-    fig.add_trace(macdeezsignal, row=2, col=1)
-
-    fig.update_layout(title={
-        "text": code,
-        "x": 0.5,
-        "xanchor": "center",
-        "yanchor": "top"
-    })
-
-    # fig.update_xaxes(rangeslider_visible=False)
-
-    return fig  # {"data":[candle], "layout": go.Layout(xaxis=dict(range=[min(time), max(time)+timedelta(minutes=1)]), )}
-
-
-def open_browser():
-    """
-    Opens the browser for data visualisation.
-    """
-    webbrowser.open_new("http://localhost:{}".format(port))
+        from visualisation import plot
+        plot(self, resolution, last)
 
 
 if '__main__' == __name__:
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+
+from time import time
+from nearest import resolution_to_seconds
+
+
+class CandleStore:
+    def __init__(self, directory="candles", publish_lag=60):
+        """
+        Local on-disk store for candles downloaded through SwyftX.get_asset_data(). Closed candles never change, so
+        once a time range has been downloaded it never has to be requested again.
+
+        Each (primary, secondary, side, resolution) combination is saved in its own JSON file, which holds the candles
+        themselves and the time ranges that have already been covered by a request. The covered ranges are what allow
+        us to tell the difference between a range that has no candles (e.g. no trades happened) and a range that we
+        simply haven't downloaded yet.
+        :param directory: a string that represents the directory in which the candle files will be saved.
+        :param publish_lag: a number that represents the number of seconds after a candle closes that SwyftX may still
+            not have published it. A request that returns no candles at all only covers the candles older than that.
+        """
+        self.directory = directory
+        self.publish_lag = publish_lag
+        self._series = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, "_".join(key) + ".json")
+
+    def _get_series(self, key):
+        """
+        Returns the in-memory copy of a series, loading it from disk the first time it's requested.
+        :param key: a tuple in the form of (primary, secondary, side, resolution).
+        :return: a dictionary with the following structure:
+            {
+                covered: a sorted list of disjoint [start, end] pairs in unix milliseconds,
+                candles: a dictionary of candles keyed by their time in unix milliseconds
+            }
+        """
+        if key not in self._series:
+            try:
+                with open(self._path(key), "r") as f:
+                    raw = json.load(f)
+                self._series[key] = {
+                    "covered": raw["covered"],
+                    "candles": {int(c["time"]): c for c in raw["candles"]}
+                }
+            except (FileNotFoundError, ValueError, KeyError):
+                self._series[key] = {"covered": [], "candles": {}}
+        return self._series[key]
+
+    def _save(self, key):
+        series = self._series[key]
+        path = self._path(key)
+        # Write to a temporary file first so that an interrupted write can't corrupt the store.
+        with open(path + ".tmp", "w") as f:
+            json.dump({
+                "covered": series["covered"],
+                "candles": [series["candles"][t] for t in sorted(series["candles"])]
+            }, f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def last_closed_time(resolution, now=None):
+        """
+        Calculates the opening time of the most recent candle that has already closed.
+        :param resolution: a string that represents the time span that the candles cover.
+        :param now: a number that represents the current unix time in seconds. Defaults to time().
+        :return: an integer that represents the opening time of the last closed candle in unix milliseconds.
+        """
+        if now is None:
+            now = time()
+        step = resolution_to_seconds[resolution]
+        return int((now // step - 1) * step * 1000)
+
+    def missing(self, primary, secondary, side, resolution, time_start, time_end):
+        """
+        Determines which parts of [time_start, time_end] have not been downloaded yet.
+        :param time_start: an integer that represents the start of the range in unix milliseconds.
+        :param time_end: an integer that represents the end of the range in unix milliseconds.
+        :return: a list of [start, end] pairs in unix milliseconds that still need to be requested from SwyftX.
+        """
+        step = resolution_to_seconds[resolution] * 1000
+        with self._lock:
+            covered = list(self._get_series((primary, secondary, side, resolution))["covered"])
+
+        gaps = []
+        cursor = time_start
+        for start, end in covered:
+            if end < cursor:
+                continue
+            if start > time_end:
+                break
+            if start > cursor:
+                gaps.append([cursor, start - 1])
+            cursor = max(cursor, end + 1)
+        if cursor <= time_end:
+            gaps.append([cursor, time_end])
+
+        # A gap that doesn't contain the opening time of any candle can't hold any data, so there's no need to fetch it.
+        return [[s, e] for s, e in gaps if -(-s // step) * step <= e]
+
+    def merge(self, primary, secondary, side, resolution, candles, time_start, time_end):
+        """
+        Adds freshly downloaded candles to the store and marks the range from time_start up to the newest closed
+        candle received as covered. Candles that haven't closed yet are not stored because their values can still
+        change. Nothing after the newest candle is covered, since candles that have closed but haven't been published
+        yet, or that were cut off from the response, would otherwise never be requested again. A range without any
+        candles (e.g. before the asset was listed) is covered up to the last candle that must have been published by
+        now, so it isn't requested again and again.
+
+        The file is only rewritten if a candle or the covered ranges changed.
+        :param candles: a list of raw candles returned by SwyftX for [time_start, time_end].
+        :param time_start: an integer that represents the start of the requested range in unix milliseconds.
+        :param time_end: an integer that represents the end of the requested range in unix milliseconds.
+        :return: a list of candles that were not stored because they're still open.
+        """
+        closed = self.last_closed_time(resolution)
+        key = (primary, secondary, side, resolution)
+        still_open = [c for c in candles if int(c["time"]) > closed]
+        received = [int(c["time"]) for c in candles if int(c["time"]) <= closed]
+        if received:
+            time_end = min(time_end, max(received))
+        else:
+            time_end = min(time_end, self.last_closed_time(resolution, time() - self.publish_lag))
+
+        with self._lock:
+            series = self._get_series(key)
+            changed = False
+            for c in candles:
+                if int(c["time"]) <= closed and series["candles"].get(int(c["time"])) != c:
+                    series["candles"][int(c["time"])] = c
+                    changed = True
+
+            if time_start <= time_end:
+                intervals = sorted(series["covered"] + [[time_start, time_end]])
+                covered = [intervals[0]]
+                for start, end in intervals[1:]:
+                    if start <= covered[-1][1] + 1:
+                        covered[-1][1] = max(covered[-1][1], end)
+                    else:
+                        covered.append([start, end])
+                if covered != series["covered"]:
+                    series["covered"] = covered
+                    changed = True
+            if changed:
+                self._save(key)
+
+        return still_open
+
+    def load(self, primary, secondary, side, resolution, time_start, time_end):
+        """
+        Returns all stored candles between time_start and time_end (inclusive), ordered by time.
+        :return: a list of candles in the same format SwyftX returns them. The dictionaries are copies, so it's safe to
+            modify them.
+        """
+        with self._lock:
+            candles = self._get_series((primary, secondary, side, resolution))["candles"]
+            return [dict(candles[t]) for t in sorted(candles) if time_start <= t <= time_end]
+
+    def clear(self, primary, secondary, side, resolution):
+        """
+        Deletes everything stored for a particular series.
+        """
+        key = (primary, secondary, side, resolution)
+        with self._lock:
+            self._series.pop(key, None)
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
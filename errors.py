@@ -18,4 +18,17 @@ class OmniError(Exception):
         self.message = message
         super().__init__(self.message)
 
+class EndOfDataError(Exception):
+    def __init__(self, message="There is no more data to backtest on."):
+        self.message = message
+        super().__init__(self.message)
 
+class BarTimeoutError(Exception):
+    def __init__(self, message="The bar was not published before the deadline."):
+        self.message = message
+        super().__init__(self.message)
+
+class RollbackError(Exception):
+    def __init__(self, message="There is no update to roll back. Only the last update can be rolled back, once."):
+        self.message = message
+        super().__init__(self.message)
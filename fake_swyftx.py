@@ -0,0 +1,398 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import time, sleep
+from urllib.parse import urlparse, parse_qs
+from instrumentation import endpoint_name
+from nearest import resolution_to_seconds
+
+# code, name, id, rank, price in USD. AUD and USD have the same ids as on SwyftX.
+default_assets = [
+    ("AUD", "Australian Dollar", 1, None, 0.67),
+    ("USD", "US Dollar", 36, None, 1),
+    ("BTC", "Bitcoin", 3, 1, 50000),
+    ("ETH", "Ethereum", 5, 2, 4000),
+    ("USDT", "Tether", 4, 3, 1),
+    ("BNB", "Binance Coin", 53, 4, 550),
+    ("SOL", "Solana", 130, 5, 180),
+    ("ADA", "Cardano", 12, 6, 1.3),
+    ("XRP", "XRP", 6, 7, 0.8),
+    ("DOT", "Polkadot", 98, 8, 30),
+    ("DOGE", "Dogecoin", 73, 9, 0.17),
+    ("AVAX", "Avalanche", 185, 10, 90),
+    ("LTC", "Litecoin", 7, 11, 160),
+    ("LINK", "Chainlink", 65, 12, 20),
+]
+
+# Order types and statuses, as used by SwyftX.
+market_buy, market_sell, stop_sell = 1, 2, 6
+order_open, order_filled, order_cancelled = 1, 4, 5
+
+
+class FakeSwyftXServer:
+    def __init__(self, port=0, latency=0, jitter=0, error_rate=0, publish_lag=0, fee=0.006, spread=0.002,
+                 balance=None, assets=None, candle_store=None, seed=0):
+        """
+        Local stand-in for the SwyftX API, so bots can be run and benchmarked end to end without the real service.
+        Point SwyftX (or Runtime) at it with base_url=server.url.
+
+        It implements the endpoints the bots use: auth/refresh, markets/info/basic, charts/getBars,
+        charts/getLatestBar, live-rates, orders (market buys/sells that fill straight away, and stop sells that fill
+        once the bid falls to their trigger), orders/byId and user/balance.
+
+        Candles are served from candle_store when it has them (e.g. recorded with SwyftX(candle_store=...)), and are
+        otherwise synthetic: a deterministic price curve per asset, so every request sees the same history.
+        :param port: an integer that represents the port to listen on. If 0, a free port is picked (see self.url).
+        :param latency: a number that represents the number of seconds every response is delayed by, or a dictionary
+            that maps endpoints (see instrumentation.known_endpoints) to it.
+        :param jitter: a number that represents the maximum number of seconds randomly added to latency.
+        :param error_rate: a number between 0 and 1 that represents the probability of a request failing with a 500
+            response, or a dictionary that maps endpoints to it.
+        :param publish_lag: a number that represents the number of seconds after a candle closes before it's served,
+            like SwyftX's publication delay.
+        :param fee: a number that represents the fee charged on each fill, as a fraction of the value of the order.
+        :param spread: a number that represents the difference between the ask and bid prices, as a fraction.
+        :param balance: a dictionary that maps ticker symbols to the starting balance. Defaults to 10k USD, like demo
+            mode.
+        :param assets: a list of (code, name, id, rank, price in USD) tuples. Defaults to default_assets.
+        :param candle_store: a CandleStore to serve recorded candles from.
+        :param seed: an integer that determines the synthetic prices, and which requests fail.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.publish_lag = publish_lag
+        self.fee = fee
+        self.spread = spread
+        self.candle_store = candle_store
+        self.seed = seed
+        self.assets = {a[0]: {"code": a[0], "name": a[1], "id": a[2], "rank": a[3], "price": a[4]}
+                       for a in (assets or default_assets)}
+        self._by_id = {str(a["id"]): a for a in self.assets.values()}
+        self.balance = dict(balance or {"USD": 10000})
+        self.orders = {}
+        self.requests = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/"
+
+    def start(self):
+        """
+        Serves requests in a background thread.
+        :return: self.
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-swyftx", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """
+        Serves requests in the current thread until self.stop() is called from another one.
+        """
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """
+        :return: a dictionary that maps each endpoint to the number of requests it has received.
+        """
+        with self._lock:
+            return dict(self.requests)
+
+    # Prices
+
+    def _noise(self, *key):
+        """
+        :return: a number between -1 and 1 that is always the same for the same key.
+        """
+        h = hashlib.blake2b(repr((self.seed,) + key).encode(), digest_size=8).digest()
+        return int.from_bytes(h, "big") / 2 ** 63 - 1
+
+    def price(self, primary, secondary, t, side="ask"):
+        """
+        :param t: a number that represents the time in unix seconds.
+        :return: the synthetic price of secondary in terms of primary at t.
+        """
+        a = self.assets[secondary]
+        # A few slow waves with a phase per asset, plus noise that changes every minute.
+        phase = 10 * (self._noise(secondary) + 1)
+        drift = 0.03 * math.sin(t / 21600 + phase) + 0.01 * math.sin(t / 2700 + 2 * phase)
+        usd = a["price"] * (1 + drift + 0.002 * self._noise(secondary, int(t // 60)))
+        p = usd / self.assets[primary]["price"]
+        return p * (1 - self.spread / 2) if side == "bid" else p * (1 + self.spread / 2)
+
+    def candle(self, primary, secondary, side, resolution, start):
+        """
+        :param start: a number that represents the opening time of the candle in unix seconds.
+        :return: a candle in the same format as SwyftX, with time in unix milliseconds.
+        """
+        length = resolution_to_seconds[resolution]
+        step = max(60, length // 12)
+        prices = [self.price(primary, secondary, t, side) for t in range(int(start), int(start + length), step)]
+        prices.append(self.price(primary, secondary, start + length - 1, side))
+        return {
+            "time": int(start * 1000),
+            "open": str(prices[0]),
+            "close": str(prices[-1]),
+            "low": str(min(prices)),
+            "high": str(max(prices)),
+            "volume": str(1000 * (self._noise(secondary, resolution, int(start)) + 1.5))
+        }
+
+    def candles(self, primary, secondary, side, resolution, time_start, time_end):
+        """
+        :return: every candle that opened between time_start and time_end (unix milliseconds) and has been published.
+        """
+        length = resolution_to_seconds[resolution]
+        published = time() - self.publish_lag
+        if self.candle_store is not None:
+            stored = self.candle_store.load(primary, secondary, side, resolution, time_start, time_end)
+            if stored:
+                return [c for c in stored if int(c["time"]) / 1000 + length <= published]
+        first = math.ceil(time_start / 1000 / length) * length
+        return [self.candle(primary, secondary, side, resolution, t)
+                for t in range(int(first), int(time_end / 1000) + 1, length) if t + length <= published]
+
+    # Orders
+
+    def _fill(self, order, rate):
+        """
+        Fills order at rate (primary per secondary), updating the balance. The order is cancelled if the balance
+        isn't enough.
+        """
+        primary, secondary = self._by_id[order["primary_asset"]]["code"], self._by_id[order["secondary_asset"]]["code"]
+        quantity = float(order["quantity"])
+        if order["quantity_asset"] == order["primary_asset"]:
+            total, amount = quantity, quantity / rate
+        else:
+            total, amount = quantity * rate, quantity
+        fee = total * self.fee
+        if order["order_type"] == market_buy:
+            if self.balance.get(primary, 0) < total + fee:
+                order["status"] = order_cancelled
+                return
+            self.balance[primary] -= total + fee
+            self.balance[secondary] = self.balance.get(secondary, 0) + amount
+        else:
+            if self.balance.get(secondary, 0) < amount:
+                order["status"] = order_cancelled
+                return
+            self.balance[secondary] -= amount
+            self.balance[primary] = self.balance.get(primary, 0) + total - fee
+        order.update({"status": order_filled, "updated_time": int(time() * 1000), "amount": amount, "total": total,
+                      "rate": rate, "userCountryValue": total, "feeAmount": fee, "feeAsset": order["primary_asset"]})
+
+    def _trigger_stops(self):
+        """
+        Fills every open stop sell whose trigger has been reached, at the bid. Called before anything that reads orders
+        or the balance, instead of watching the prices in the background.
+        """
+        now = time()
+        for order in self.orders.values():
+            if order["status"] == order_open and order["order_type"] == stop_sell:
+                primary = self._by_id[order["primary_asset"]]["code"]
+                secondary = self._by_id[order["secondary_asset"]]["code"]
+                bid = self.price(primary, secondary, now, "bid")
+                if bid <= order["trigger"]:
+                    self._fill(order, bid)
+
+    def place_order(self, payload):
+        """
+        :param payload: a dictionary sent by SwyftX.market_buy(), market_sell() or stop_loss().
+        :return: a dictionary in the same form as the response of SwyftX.
+        """
+        primary, secondary = self.assets[payload["primary"]], self.assets[payload["secondary"]]
+        now = int(time() * 1000)
+        order = {
+            "orderUuid": "ord_" + uuid.uuid4().hex,
+            "order_type": int(payload["orderType"]),
+            "primary_asset": str(primary["id"]),
+            "secondary_asset": str(secondary["id"]),
+            "quantity_asset": str(self.assets[payload["assetQuantity"]]["id"]),
+            "quantity": float(payload["quantity"]),
+            # SwyftX.stop_loss() sends the trigger as secondary per primary.
+            "trigger": 1 / float(payload["trigger"]) if payload.get("trigger") else None,
+            "status": order_open,
+            "created_time": now,
+            "updated_time": now,
+            "amount": None,
+            "total": None,
+            "rate": None,
+            "userCountryValue": None,
+            "feeAmount": 0,
+            "feeAsset": str(primary["id"])
+        }
+        with self._lock:
+            if order["order_type"] in (market_buy, market_sell):
+                side = "ask" if order["order_type"] == market_buy else "bid"
+                self._fill(order, self.price(primary["code"], secondary["code"], time(), side))
+            self.orders[order["orderUuid"]] = order
+            return {"orderUuid": order["orderUuid"], "order": dict(order), "processed": True}
+
+    def get_order(self, order_uuid):
+        with self._lock:
+            self._trigger_stops()
+            order = self.orders.get(order_uuid)
+            return None if order is None else dict(order)
+
+    def cancel_order(self, order_uuid):
+        with self._lock:
+            order = self.orders.get(order_uuid)
+            if order is None or order["status"] != order_open:
+                return None
+            order.update({"status": order_cancelled, "updated_time": int(time() * 1000)})
+            return {"orderUuid": order_uuid, "updated_time": order["updated_time"], "status": order_cancelled,
+                    "message": "Order cancelled"}
+
+    def recent_orders(self, asset_code=""):
+        with self._lock:
+            self._trigger_stops()
+            asset_id = str(self.assets[asset_code]["id"]) if asset_code in self.assets else None
+            return [dict(o) for o in self.orders.values() if asset_id is None or o["secondary_asset"] == asset_id]
+
+    def get_balance(self):
+        with self._lock:
+            self._trigger_stops()
+            return [{"assetId": self.assets[code]["id"], "availableBalance": str(amount)}
+                    for code, amount in self.balance.items()]
+
+    # Requests
+
+    def _pick(self, setting, endpoint):
+        return setting.get(endpoint, 0) if isinstance(setting, dict) else setting
+
+    def handle(self, method, path, query, body, authorized):
+        """
+        :return: the HTTP status and the body of the response, for a request that has already been delayed.
+        """
+        endpoint = endpoint_name(path)
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            fail = self._random.random() < self._pick(self.error_rate, endpoint)
+        if fail:
+            return 500, {"error": {"error": "InternalError", "message": "Injected error"}}
+        parts = [p for p in path.strip("/").split("/") if p]
+        if endpoint in ("orders", "orders/byId", "user/balance") and not authorized:
+            return 401, {"error": {"error": "Unauthorized", "message": "Missing token"}}
+
+        if endpoint == "auth/refresh" and method == "POST":
+            return 200, {"accessToken": "fake." + uuid.uuid4().hex, "scope": "app.account.balance app.orders"}
+        if endpoint == "markets/info/basic":
+            now = time()
+            return 200, [{"name": a["name"], "altName": a["name"], "code": a["code"], "id": a["id"],
+                          "rank": a["rank"], "buy": str(self.price("USD", a["code"], now)),
+                          "sell": str(self.price("USD", a["code"], now, "bid")), "spread": str(self.spread * 100),
+                          "volume24H": 1e6, "marketCap": 1e9}
+                         for a in self.assets.values() if len(parts) < 4 or a["code"] == parts[3]]
+        if endpoint == "charts/getBars":
+            primary, secondary, side = parts[2:5]
+            return 200, {"candles": self.candles(primary, secondary, side, query["resolution"],
+                                                 int(query["timeStart"]), int(query["timeEnd"]))}
+        if endpoint == "charts/getLatestBar":
+            primary, secondary, side = parts[2:5]
+            length = resolution_to_seconds[query["resolution"]]
+            return 200, self.candle(primary, secondary, side, query["resolution"], time() // length * length)
+        if endpoint == "live-rates":
+            primary, now = self._by_id[parts[1]]["code"], time()
+            out = {}
+            for a in self.assets.values():
+                ask, bid = self.price(primary, a["code"], now), self.price(primary, a["code"], now, "bid")
+                out[str(a["id"])] = {"askPrice": str(ask), "bidPrice": str(bid), "midPrice": str((ask + bid) / 2),
+                                     "dailyPriceChange": "0"}
+            return 200, out
+        if endpoint == "user/balance":
+            return 200, self.get_balance()
+        if endpoint == "orders/byId":
+            order = self.get_order(parts[2])
+            return (200, order) if order else (404, {"error": {"error": "NotFound", "message": "Order not found"}})
+        if endpoint == "orders" and method == "POST":
+            try:
+                return 200, self.place_order(json.loads(body))
+            except (KeyError, ValueError) as e:
+                return 400, {"error": {"error": "BadRequest", "message": repr(e)}}
+        if endpoint == "orders" and method == "DELETE":
+            r = self.cancel_order(parts[1])
+            return (200, r) if r else (404, {"error": {"error": "NotFound", "message": "Order not found"}})
+        if endpoint == "orders":
+            return 200, {"orders": self.recent_orders(parts[1] if len(parts) > 1 else "")}
+        return 404, {"error": {"error": "NotFound", "message": f"{method} {path} isn't implemented"}}
+
+    def delay(self, path):
+        endpoint = endpoint_name(path)
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0
+        wait = self._pick(self.latency, endpoint) + extra
+        if wait > 0:
+            sleep(wait)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keeps connections alive, so Transport's connection pool is exercised like with the real API.
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which would otherwise wait for delayed ACKs (~40ms per response).
+    disable_nagle_algorithm = True
+
+    def _serve(self, method):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        # SwyftX puts the query string after a trailing slash, e.g. 'charts/getBars/USD/BTC/ask/?resolution=1m'.
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        fake.delay(url.path)
+        status, out = fake.handle(method, url.path, query, body, self.headers.get("Authorization") is not None)
+        data = json.dumps(out).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_POST(self):
+        self._serve("POST")
+
+    def do_DELETE(self):
+        self._serve("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+
+if '__main__' == __name__:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Runs a local stand-in for the SwyftX API.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--publish-lag", type=float, default=0)
+    args = parser.parse_args()
+
+    server = FakeSwyftXServer(args.port, args.latency, args.jitter, args.error_rate, args.publish_lag)
+    print(f"Serving a fake SwyftX API at {server.url}")
+    server.serve_forever()
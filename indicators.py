@@ -0,0 +1,414 @@
+import numpy as np
+
+from abc import ABC, abstractmethod
+from collections import deque
+from math import log
+from numpy.lib.stride_tricks import sliding_window_view
+from ring_buffer import RingBuffer
+from errors import RollbackError
+
+# Blocks used by _recurrence() are kept short enough that beta^-L stays below this value, which keeps the closed form
+# numerically stable.
+_max_block_growth = 1e12
+
+
+def _recurrence(values, alpha, initial):
+    """
+    Evaluates y[t] = alpha * values[t] + (1 - alpha) * y[t - 1] for a whole array with NumPy, where y[-1] = initial.
+
+    The recurrence is solved in closed form one block at a time:
+        y[j] = beta^(j+1) * y[-1] + alpha * beta^j * cumsum(values * beta^-i)[j],   beta = 1 - alpha
+    :param values: a 1D NumPy array of floats.
+    :param alpha: a float that represents the smoothing factor.
+    :param initial: a float that represents the value preceding values[0].
+    :return: a NumPy array with the same length as values.
+    """
+    values = np.asarray(values, dtype=float)
+    beta = 1 - alpha
+    if beta <= 0:
+        return values.copy()
+
+    block = max(1, min(len(values), int(log(_max_block_growth) / -log(beta))))
+    powers = beta ** np.arange(block)
+    out = np.empty(len(values))
+    prev = initial
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        p = powers[:len(chunk)]
+        out[start:start + len(chunk)] = p * (beta * prev) + alpha * p * np.cumsum(chunk / p)
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def ema(values, period, initial=None):
+    """
+    Calculates the exponential moving average of a whole series at once.
+
+    With initial=None, the result is the same as talib.EMA(): leading NaNs are skipped, the first value is the simple
+    average of the first 'period' values and everything before it is NaN. Otherwise, the EMA is continued from
+    initial, which is the EMA value of the period right before values[0].
+    :param values: an array-like of floats.
+    :param period: an integer that represents the number of periods considered when calculating the EMA.
+    :param initial: a float that represents the last known EMA value.
+    :return: a NumPy array with the same length as values.
+    """
+    values = np.asarray(values, dtype=float)
+    alpha = 2 / (1 + period)
+    if initial is not None:
+        return _recurrence(values, alpha, initial)
+
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0 or len(values) - valid[0] < period:
+        return out
+    begin = valid[0] + period - 1
+    out[begin] = values[valid[0]:begin + 1].mean()
+    out[begin + 1:] = _recurrence(values[begin + 1:], alpha, out[begin])
+    return out
+
+
+def gradient(values):
+    """
+    Calculates the change between consecutive values. The first value is NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.empty(len(values))
+    out[:1] = np.nan
+    out[1:] = values[1:] - values[:-1]
+    return out
+
+
+def crossed_above(a, b):
+    """
+    Checks where a has crossed b from below, i.e. a[t - 1] < b[t - 1] and a[t] > b[t].
+    :return: a NumPy array of booleans. The first value is always False.
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    out = np.zeros(len(a), dtype=bool)
+    out[1:] = (a[:-1] < b[:-1]) & (a[1:] > b[1:])
+    return out
+
+
+class Indicator(ABC):
+    """
+    Base class for indicators used by IndicatorEngine.
+
+    An indicator is seeded with whole arrays at once and then updated with one value per bar. Its state has to be
+    small and constant in size, so that updating it is O(1), and it has to remember enough to undo the last update.
+    """
+    def __init__(self, source="close"):
+        """
+        :param source: a string that represents the candle field (e.g. 'close') or the name of another indicator in
+            the same engine that this indicator is calculated from.
+        """
+        self.source = source
+
+    @abstractmethod
+    def seed(self, inputs):
+        """
+        Calculates the indicator for a whole series and keeps the state needed to continue it.
+        :param inputs: a dictionary of NumPy arrays that holds every candle field and the values of the indicators
+            added to the engine before this one.
+        :return: a NumPy array of values.
+        """
+
+    @abstractmethod
+    def update(self, inputs):
+        """
+        Calculates the indicator for a new bar.
+        :param inputs: a dictionary of floats with the same keys as in self.seed().
+        :return: a float.
+        """
+
+    @abstractmethod
+    def can_rollback(self):
+        """
+        :return: a boolean that is True if there is an update that self.rollback() can undo.
+        """
+
+    @abstractmethod
+    def rollback(self):
+        """
+        Undoes the last call to self.update(). Raises RollbackError if there is nothing to undo, i.e. right after
+        self.seed() or another rollback.
+        """
+
+
+class EMA(Indicator):
+    def __init__(self, period, source="close"):
+        """
+        Exponential moving average. Same as talib.EMA(), i.e. the first value is the simple average of the first
+        'period' values (leading NaNs are skipped).
+        :param period: an integer that represents the number of periods considered when calculating the EMA.
+        """
+        super().__init__(source)
+        self.period = period
+        self.alpha = 2 / (1 + period)
+        # (number of values seen, their sum while warming up, latest EMA value)
+        self.state, self._previous = (0, 0.0, np.nan), None
+
+    def seed(self, inputs):
+        values = np.asarray(inputs[self.source], dtype=float)
+        out = ema(values, self.period)
+        valid = np.flatnonzero(~np.isnan(values))
+        count = len(values) - valid[0] if len(valid) else 0
+        total = float(np.sum(values[valid[0]:])) if 0 < count < self.period else 0.0
+        self.state, self._previous = (count, total, out[-1] if len(out) else np.nan), None
+        return out
+
+    def update(self, inputs):
+        x = inputs[self.source]
+        count, total, value = self.state
+        self._previous = self.state
+        if count == 0 and np.isnan(x):
+            pass
+        elif count + 1 < self.period:
+            count, total = count + 1, total + x
+        elif count + 1 == self.period:
+            count, value = count + 1, (total + x) / self.period
+        else:
+            count, value = count + 1, x * self.alpha + value * (1 - self.alpha)
+        self.state = (count, total, value)
+        return value
+
+    def can_rollback(self):
+        return self._previous is not None
+
+    def rollback(self):
+        if self._previous is None:
+            raise RollbackError()
+        self.state, self._previous = self._previous, None
+
+
+class MACD(Indicator):
+    def __init__(self, fast="ema_fast", slow="ema_slow"):
+        """
+        Moving average convergence divergence, i.e. the difference between a fast and a slow EMA.
+        :param fast: a string that represents the name of the fast EMA in the engine.
+        :param slow: a string that represents the name of the slow EMA in the engine.
+        """
+        super().__init__(fast)
+        self.slow = slow
+
+    def seed(self, inputs):
+        return np.asarray(inputs[self.source], dtype=float) - np.asarray(inputs[self.slow], dtype=float)
+
+    def update(self, inputs):
+        return inputs[self.source] - inputs[self.slow]
+
+    def can_rollback(self):
+        # Stateless, so there's never anything to undo.
+        return True
+
+    def rollback(self):
+        pass
+
+
+class _RollingExtreme(Indicator):
+    def __init__(self, period, source, better):
+        super().__init__(source)
+        self.period = period
+        self._better = better
+        # Monotonic deque of (index, value) pairs. The extreme of the window is always at the front.
+        self._window = deque()
+        self._count = 0
+        self._undo = None
+
+    def seed(self, inputs):
+        values = np.asarray(inputs[self.source], dtype=float)
+        out = np.full(len(values), np.nan)
+        if len(values) >= self.period:
+            windows = sliding_window_view(values, self.period)
+            out[self.period - 1:] = windows.min(axis=1) if self._better(0, 1) else windows.max(axis=1)
+        self._window.clear()
+        self._count = len(values) - min(len(values), self.period)
+        for x in values[self._count:]:
+            self.update({self.source: x})
+        self._undo = None
+        return out
+
+    def update(self, inputs):
+        x = inputs[self.source]
+        popped = []
+        while self._window and not self._better(self._window[-1][1], x):
+            popped.append(self._window.pop())
+        self._window.append((self._count, x))
+        expired = self._window.popleft() if self._window[0][0] <= self._count - self.period else None
+        self._count += 1
+        self._undo = (popped, expired)
+        return self._window[0][1] if self._count >= self.period else np.nan
+
+    def can_rollback(self):
+        return self._undo is not None
+
+    def rollback(self):
+        if self._undo is None:
+            raise RollbackError()
+        popped, expired = self._undo
+        self._count -= 1
+        self._window.pop()
+        if expired is not None:
+            self._window.appendleft(expired)
+        self._window.extend(reversed(popped))
+        self._undo = None
+
+
+class RollingMin(_RollingExtreme):
+    def __init__(self, period, source="low"):
+        """
+        Lowest value of the last 'period' bars. Same as talib.MIN().
+        """
+        super().__init__(period, source, lambda a, b: a < b)
+
+
+class RollingMax(_RollingExtreme):
+    def __init__(self, period, source="high"):
+        """
+        Highest value of the last 'period' bars. Same as talib.MAX().
+        """
+        super().__init__(period, source, lambda a, b: a > b)
+
+
+class ATR(Indicator):
+    def __init__(self, period=14):
+        """
+        Average true range with Wilder's smoothing. Same as talib.ATR(): the first value is the simple average of the
+        first 'period' true ranges, and the first bar has no true range because it has no previous close.
+        :param period: an integer that represents the number of periods considered when calculating the ATR.
+        """
+        super().__init__("close")
+        self.period = period
+        # (number of true ranges seen, their sum while warming up, latest ATR value, previous close)
+        self.state, self._previous = (0, 0.0, np.nan, np.nan), None
+
+    def seed(self, inputs):
+        high, low = np.asarray(inputs["high"], dtype=float), np.asarray(inputs["low"], dtype=float)
+        close = np.asarray(inputs["close"], dtype=float)
+        out = np.full(len(close), np.nan)
+        true_range = np.maximum(high[1:] - low[1:],
+                                np.maximum(np.abs(high[1:] - close[:-1]), np.abs(low[1:] - close[:-1])))
+        count = len(true_range)
+        if count >= self.period:
+            out[self.period] = true_range[:self.period].mean()
+            out[self.period + 1:] = _recurrence(true_range[self.period:], 1 / self.period, out[self.period])
+        total = float(true_range.sum()) if count < self.period else 0.0
+        self.state = (count, total, out[-1] if len(out) else np.nan, close[-1] if len(close) else np.nan)
+        self._previous = None
+        return out
+
+    def update(self, inputs):
+        count, total, value, previous_close = self.state
+        self._previous = self.state
+        high, low, close = inputs["high"], inputs["low"], inputs["close"]
+        if not np.isnan(previous_close):
+            true_range = max(high - low, abs(high - previous_close), abs(low - previous_close))
+            count += 1
+            if count < self.period:
+                total += true_range
+            elif count == self.period:
+                value = (total + true_range) / self.period
+            else:
+                value = (value * (self.period - 1) + true_range) / self.period
+        self.state = (count, total, value, close)
+        return value
+
+    def can_rollback(self):
+        return self._previous is not None
+
+    def rollback(self):
+        if self._previous is None:
+            raise RollbackError()
+        self.state, self._previous = self._previous, None
+
+
+class IndicatorEngine:
+    def __init__(self, capacity):
+        """
+        Keeps a set of indicators for one series of candles. The indicators are seeded from history in bulk with
+        self.seed(), and are then updated in O(1) for every new candle with self.update().
+
+        Indicators are evaluated in the order they were added, so an indicator can be calculated from any indicator
+        added before it (e.g. a MACD signal is the EMA of the 'macd' indicator).
+        :param capacity: an integer that represents the number of past values kept for each indicator.
+        """
+        self.capacity = capacity
+        self.indicators = {}
+        self.history = None
+        # Whether the last call was self.update(), i.e. whether there is a bar to roll back.
+        self._pending = False
+
+    def add(self, name, indicator):
+        """
+        :param name: a string that the indicator's values can be accessed by, e.g. engine["macd"].
+        :param indicator: an Indicator object.
+        :return: the engine itself, so that calls can be chained.
+        """
+        self.indicators[name] = indicator
+        return self
+
+    def seed(self, data):
+        """
+        Calculates every indicator for a whole series of candles.
+        :param data: an OHLCBuffer, or a dictionary of arrays with the keys 'open', 'high', 'low' and 'close'.
+        """
+        inputs = {field: np.asarray(data[field], dtype=float) for field in ("open", "high", "low", "close")}
+        for name, indicator in self.indicators.items():
+            inputs[name] = indicator.seed(inputs)
+        self.history = RingBuffer(self.capacity, len(self.indicators))
+        self.history.extend([inputs[name] for name in self.indicators])
+        self._pending = False
+
+    def update(self, candle):
+        """
+        Updates every indicator with a new candle.
+        :param candle: a dictionary with the keys 'open', 'high', 'low' and 'close'.
+        :return: a dictionary of the latest value of each indicator.
+        """
+        inputs = {field: float(candle[field]) for field in ("open", "high", "low", "close")}
+        for name, indicator in self.indicators.items():
+            inputs[name] = indicator.update(inputs)
+        self.history.append(*[inputs[name] for name in self.indicators])
+        self._pending = True
+        return {name: inputs[name] for name in self.indicators}
+
+    def rollback(self):
+        """
+        Undoes the last call to self.update(). Only one bar can be rolled back at a time: rolling back again, or right
+        after self.seed(), raises RollbackError without changing anything.
+        """
+        if not self._pending or not all(indicator.can_rollback() for indicator in self.indicators.values()):
+            raise RollbackError()
+        self._pending = False
+        for indicator in reversed(list(self.indicators.values())):
+            indicator.rollback()
+        self.history.pop()
+
+    def __getitem__(self, name):
+        """
+        :return: a zero-copy NumPy view of the past values of an indicator, oldest first.
+        """
+        return self.history.view(list(self.indicators).index(name))
+
+    def value(self, name):
+        """
+        :return: the latest value of an indicator.
+        """
+        return self[name][-1]
+
+
+def macd_engine(fast=12, slow=26, signal=9, long=100, capacity=100):
+    """
+    Creates the IndicatorEngine used by Bot.macd_gradient_strategy().
+    :param fast: an integer that represents the number of periods considered when calculating the fast EMA.
+    :param slow: an integer that represents the number of periods considered when calculating the slow EMA.
+    :param signal: an integer that represents the number of periods considered when calculating the EMA for MACD.
+    :param long: an integer that represents the number of periods considered when calculating the long EMA.
+    :param capacity: an integer that represents the number of past values kept for each indicator.
+    :return: an IndicatorEngine with 'ema_fast', 'ema_slow', 'macd', 'macdsignal' and 'ema_hundred'.
+    """
+    return IndicatorEngine(capacity) \
+        .add("ema_fast", EMA(fast)) \
+        .add("ema_slow", EMA(slow)) \
+        .add("macd", MACD("ema_fast", "ema_slow")) \
+        .add("macdsignal", EMA(signal, source="macd")) \
+        .add("ema_hundred", EMA(long))
@@ -0,0 +1,157 @@
+import threading
+
+from bisect import bisect_left
+from urllib.parse import urlparse
+
+# Upper bounds (in milliseconds) of the latency histogram buckets. Anything slower goes into a final overflow bucket.
+latency_buckets = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Endpoints that requests are grouped by, most specific first. Anything after them in the path (ids, assets) is
+# ignored so that e.g. every 'live-rates/<primary>/' request counts towards 'live-rates'.
+known_endpoints = ("charts/getBars", "charts/getLatestBar", "orders/byId", "orders", "user/balance", "live-rates",
+                   "markets/info/basic", "auth/refresh")
+
+
+def endpoint_name(url):
+    """
+    :param url: a string that represents the URL of a request.
+    :return: a string that represents the endpoint the request was sent to, e.g. 'charts/getBars'.
+    """
+    path = urlparse(url).path.strip("/")
+    for endpoint in known_endpoints:
+        if path == endpoint or path.startswith(endpoint + "/"):
+            return endpoint
+    return path.split("/")[0]
+
+
+class Instrumentation:
+    def __init__(self):
+        """
+        Collects latency, throughput and error figures for every endpoint that SwyftX sends requests to.
+
+        Every request is recorded as an event. Hooks added with self.add_hook() are called with each event (e.g. to
+        export them elsewhere), and self.snapshot() summarises everything recorded so far.
+        """
+        self._endpoints = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """
+        :param hook: a function that takes a dictionary with the following structure, called after every request:
+            {
+                endpoint, method,
+                status: the HTTP status code, or None if no response was received,
+                seconds: time spent waiting for the response,
+                bytes_sent, bytes_received,
+                error: None, or a string that describes what went wrong
+            }
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def record(self, endpoint, method, status, seconds, bytes_sent=0, bytes_received=0, error=None):
+        """
+        Records a request. Called by Transport.
+        """
+        event = {
+            "endpoint": endpoint,
+            "method": method,
+            "status": status,
+            "seconds": seconds,
+            "bytes_sent": bytes_sent,
+            "bytes_received": bytes_received,
+            "error": error
+        }
+        with self._lock:
+            e = self._endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "errors": {},
+                "seconds_total": 0.0,
+                "seconds_max": 0.0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "payload_max": 0,
+                "histogram": [0] * (len(latency_buckets) + 1)
+            })
+            e["requests"] += 1
+            e["seconds_total"] += seconds
+            e["seconds_max"] = max(e["seconds_max"], seconds)
+            e["bytes_sent"] += bytes_sent
+            e["bytes_received"] += bytes_received
+            e["payload_max"] = max(e["payload_max"], bytes_received)
+            e["histogram"][bisect_left(latency_buckets, seconds * 1000)] += 1
+            if error is not None:
+                e["errors"][error] = e["errors"].get(error, 0) + 1
+        self._call_hooks(event)
+
+    def error(self, endpoint, error):
+        """
+        Records a problem found after a response was received (e.g. a body that couldn't be parsed), without counting
+        another request.
+        """
+        with self._lock:
+            if endpoint in self._endpoints:
+                errors = self._endpoints[endpoint]["errors"]
+                errors[error] = errors.get(error, 0) + 1
+        self._call_hooks({"endpoint": endpoint, "method": None, "status": None, "seconds": 0, "bytes_sent": 0,
+                          "bytes_received": 0, "error": error})
+
+    def _call_hooks(self, event):
+        for hook in list(self._hooks):
+            try:
+                hook(event)
+            except Exception as e:
+                # A broken hook shouldn't break the request that triggered it.
+                print(f"Instrumentation hook {hook!r} failed: {e!r}")
+
+    def _percentile(self, histogram, q):
+        """
+        Estimates a latency percentile from a histogram.
+        :return: the upper bound (in milliseconds) of the bucket the percentile falls in, or None if it's the
+            overflow bucket.
+        """
+        target, seen = q * sum(histogram), 0
+        for i, count in enumerate(histogram):
+            seen += count
+            if seen >= target and count:
+                return latency_buckets[i] if i < len(latency_buckets) else None
+        return None
+
+    def snapshot(self):
+        """
+        :return: a dictionary that maps each endpoint to:
+            {
+                requests, errors: a dictionary of error counts by type,
+                latency_mean_ms, latency_max_ms, latency_p50_ms, latency_p99_ms (bucket upper bounds),
+                bytes_sent, bytes_received, payload_mean, payload_max,
+                histogram: a dictionary that maps each bucket's upper bound in milliseconds ('inf' for the overflow
+                    bucket) to the number of requests in it
+            }
+        """
+        with self._lock:
+            endpoints = {k: dict(v, errors=dict(v["errors"]), histogram=list(v["histogram"]))
+                         for k, v in self._endpoints.items()}
+        out = {}
+        for endpoint, e in endpoints.items():
+            n = e["requests"]
+            out[endpoint] = {
+                "requests": n,
+                "errors": e["errors"],
+                "latency_mean_ms": 1000 * e["seconds_total"] / n if n else 0,
+                "latency_max_ms": 1000 * e["seconds_max"],
+                "latency_p50_ms": self._percentile(e["histogram"], 0.5),
+                "latency_p99_ms": self._percentile(e["histogram"], 0.99),
+                "bytes_sent": e["bytes_sent"],
+                "bytes_received": e["bytes_received"],
+                "payload_mean": e["bytes_received"] / n if n else 0,
+                "payload_max": e["payload_max"],
+                "histogram": dict(zip([str(b) for b in latency_buckets] + ["inf"], e["histogram"]))
+            }
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
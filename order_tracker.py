@@ -0,0 +1,208 @@
+import json
+import threading
+
+from threaded_timer import scheduler
+
+# Order statuses as returned by SwyftX. Orders in any of the closed statuses never change again, so they stop being
+# polled.
+filled = 4
+closed_statuses = (4, 5, 6, 7)  # filled, cancelled by the user, cancelled by SwyftX, failed
+
+
+class OrderTracker:
+    def __init__(self, swyftx, interval=10, fast_interval=1, near=0.005):
+        """
+        Keeps the state of open orders (e.g. stop losses) up to date in the background, so bots can read it at every
+        tick without sending a request.
+
+        Every tracked order is refreshed together with one request for the recent orders (see SwyftX.recent_order()),
+        every interval seconds. When the latest price of a stop order's pair (reported by the bots at every tick with
+        self.update_price(), so it costs no request) comes within 'near' of its trigger, the orders are refreshed every
+        fast_interval seconds instead. Orders that are too old to be in the recent orders are fetched one by one.
+        Fills are applied to the balance ledger of the SwyftX object (see BalanceLedger), and listeners are called
+        whenever an order is filled or closed.
+
+        The background job only runs while there are open orders.
+        :param swyftx: a SwyftX object.
+        :param interval: a number that represents the number of seconds between refreshes.
+        :param fast_interval: a number that represents the number of seconds between refreshes near a trigger.
+        :param near: a number that represents how close (as a fraction of the trigger) the bid has to be for a stop
+            order to be refreshed every fast_interval seconds.
+        """
+        self.swyftx = swyftx
+        self.interval = interval
+        self.fast_interval = fast_interval
+        self.near = near
+        # orderUuid -> {order, listeners, primary, secondary, trigger}
+        self._orders = {}
+        self._lock = threading.RLock()
+        self._job, self._fast = None, False
+        # (primary, secondary) -> latest price reported by self.update_price()
+        self._prices = {}
+        self._stats = {"polls": 0, "batched": 0, "single": 0, "events": 0}
+
+    def track(self, order_uuid, listener=None, primary=None, secondary=None, trigger=None):
+        """
+        Starts refreshing an order.
+        :param order_uuid: a string that represents the ID of the order.
+        :param listener: a function that takes the order (a dictionary in the same form as SwyftX.get_order()) and is
+            called from the background thread once the order is filled or closed.
+        :param primary: a string that represents the ticker symbol of the primary asset. Needed with trigger.
+        :param secondary: a string that represents the ticker symbol of the secondary asset. Needed with trigger.
+        :param trigger: a number that represents the price the order is triggered at, in terms of primary. If given,
+            the order is refreshed more often while the bid is close to it.
+        """
+        with self._lock:
+            self._orders[order_uuid] = {"order": None, "listeners": [listener] if listener else [], "primary": primary,
+                                        "secondary": secondary, "trigger": trigger}
+            self._schedule()
+
+    def forget(self, order_uuid):
+        """
+        Stops tracking an order and removes its state.
+        """
+        with self._lock:
+            self._orders.pop(order_uuid, None)
+            self._stop_if_idle()
+
+    def get(self, order_uuid):
+        """
+        :return: the last known state of an order (a dictionary in the same form as SwyftX.get_order()), or None if it
+            hasn't been fetched yet.
+        """
+        with self._lock:
+            tracked = self._orders.get(order_uuid)
+            return dict(tracked["order"]) if tracked is not None and tracked["order"] is not None else None
+
+    def refresh(self, order_uuid):
+        """
+        Fetches an order straight away instead of waiting for the next refresh.
+        :return: same as self.get().
+        """
+        r = self.swyftx.get_order(order_uuid)
+        if r.ok:
+            with self._lock:
+                self._stats["single"] += 1
+            self._update([json.loads(r.text)])
+        return self.get(order_uuid)
+
+    def update_price(self, primary, secondary, price):
+        """
+        Reports the latest price of a pair (e.g. the low of the bid bar of the last tick). Open stop orders of the pair
+        are refreshed every fast_interval seconds while it's within self.near of their trigger.
+        :param price: a number that represents the price of secondary in terms of primary.
+        """
+        with self._lock:
+            self._prices[(primary, secondary)] = float(price)
+            if self._job is not None:
+                self._schedule()
+
+    def stop(self):
+        """
+        Stops refreshing orders. Tracking another order starts again.
+        """
+        with self._lock:
+            if self._job is not None:
+                scheduler.cancel(self._job)
+                self._job = None
+
+    def _schedule(self):
+        """
+        Starts the background job, or restarts it if it should switch between interval and fast_interval.
+        """
+        fast = self._near_trigger()
+        if self._job is not None and fast == self._fast:
+            return
+        self.stop()
+        self._fast = fast
+        self._job = scheduler.every(self.fast_interval if fast else self.interval, self.poll, overrun="skip")
+
+    def stats(self):
+        """
+        :return: a dictionary with the following structure:
+            {
+                tracked: number of orders that are still open,
+                polls: number of refreshes,
+                batched: number of requests for the recent orders,
+                single: number of requests for a single order,
+                events: number of times listeners were called
+            }
+        """
+        with self._lock:
+            return dict(self._stats, tracked=len(self._open()))
+
+    def _open(self):
+        return [u for u, t in self._orders.items() if t["order"] is None or t["order"]["status"] not in closed_statuses]
+
+    def _stop_if_idle(self):
+        """
+        Stops the background job once there are no open orders left, and otherwise makes sure it runs at the right
+        interval for the orders that are.
+        """
+        if not self._open():
+            self.stop()
+        elif self._job is not None:
+            self._schedule()
+
+    def _near_trigger(self):
+        """
+        Checks whether the latest price of any open stop order is within self.near of its trigger.
+        """
+        for u in self._open():
+            t = self._orders[u]
+            price = self._prices.get((t["primary"], t["secondary"]))
+            if t["trigger"] is not None and price is not None and price <= t["trigger"] * (1 + self.near):
+                return True
+        return False
+
+    def poll(self):
+        """
+        Refreshes every open order: one request for the recent orders, then one request for each open order that
+        wasn't in it.
+        """
+        with self._lock:
+            self._stats["polls"] += 1
+            pending = set(self._open())
+        if not pending:
+            self._stop_if_idle()
+            return
+        try:
+            orders = self.swyftx.recent_order("")
+            with self._lock:
+                self._stats["batched"] += 1
+        except (KeyError, ValueError) as e:
+            print(f"Failed to fetch recent orders: {e!r}")
+            orders = []
+        found = [o for o in orders if o.get("orderUuid") in pending]
+        self._update(found)
+        for order_uuid in pending - {o["orderUuid"] for o in found}:
+            self.refresh(order_uuid)
+        with self._lock:
+            self._stop_if_idle()
+
+    def _update(self, orders):
+        """
+        Stores the latest state of orders, applies the ones that have just been filled to the balance ledger, and calls
+        the listeners of the ones that have just been filled or closed.
+        """
+        events, filled_orders = [], []
+        with self._lock:
+            for order in orders:
+                tracked = self._orders.get(order.get("orderUuid"))
+                if tracked is None:
+                    continue
+                order = dict(order, status=int(order["status"]))
+                was_open = tracked["order"] is None or tracked["order"]["status"] not in closed_statuses
+                tracked["order"] = order
+                if was_open and order["status"] == filled:
+                    filled_orders.append(dict(order))
+                if was_open and order["status"] in closed_statuses:
+                    events += [(listener, dict(order)) for listener in tracked["listeners"]]
+            self._stats["events"] += len(events)
+        for order in filled_orders:
+            self.swyftx.ledger.apply(order)
+        for listener, order in events:
+            try:
+                listener(order)
+            except Exception as e:
+                print(f"Order listener {listener!r} failed: {e!r}")
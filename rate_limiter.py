@@ -0,0 +1,83 @@
+import threading
+
+from time import monotonic
+
+# Priority lanes, highest first. Orders are latency-critical, bars feed the strategy at every tick, and bulk covers
+# metadata and historical backfills.
+lanes = ("orders", "bars", "bulk")
+
+
+class RateLimiter:
+    def __init__(self, rate=10, burst=None):
+        """
+        Token bucket shared by every request sent through a Transport. Tokens are added at 'rate' per second, up to
+        'burst', and each request takes one.
+
+        Requests wait in one of the lanes above. A request only takes a token when no request in a higher-priority lane
+        is waiting, so a large backfill can't delay order placement, while lower lanes keep flowing whenever the
+        higher ones are idle.
+        :param rate: a number that represents the sustained number of requests per second.
+        :param burst: a number that represents the maximum number of requests sent back-to-back after being idle.
+            Defaults to rate.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+        self._tokens = self.burst
+        self._updated = monotonic()
+        self._condition = threading.Condition()
+        self._waiting = {lane: 0 for lane in lanes}
+        self._stats = {lane: {"requests": 0, "wait_total": 0.0, "wait_max": 0.0, "depth_max": 0} for lane in lanes}
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, lane="bulk"):
+        """
+        Waits until a request in lane can be sent.
+        :param lane: a string, one of rate_limiter.lanes.
+        :return: a number that represents the number of seconds waited.
+        """
+        start = monotonic()
+        higher = lanes[:lanes.index(lane)]
+        with self._condition:
+            self._waiting[lane] += 1
+            stats = self._stats[lane]
+            stats["depth_max"] = max(stats["depth_max"], self._waiting[lane])
+            try:
+                while True:
+                    self._refill()
+                    blocked = any(self._waiting[h] for h in higher)
+                    if not blocked and self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    # Wait for the next token, or until a higher-priority request has gone through.
+                    self._condition.wait(None if blocked else (1 - self._tokens) / self.rate)
+            finally:
+                self._waiting[lane] -= 1
+                self._condition.notify_all()
+            waited = monotonic() - start
+            stats["requests"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+        return waited
+
+    def stats(self):
+        """
+        :return: a dictionary that maps each lane to:
+            {
+                requests: number of requests sent,
+                waiting: number of requests currently waiting,
+                depth_max: highest number of requests that were waiting at the same time,
+                wait_mean, wait_max: seconds spent waiting for a token
+            }
+        """
+        with self._condition:
+            return {lane: {
+                "requests": s["requests"],
+                "waiting": self._waiting[lane],
+                "depth_max": s["depth_max"],
+                "wait_mean": s["wait_total"] / s["requests"] if s["requests"] else 0,
+                "wait_max": s["wait_max"]
+            } for lane, s in self._stats.items()}
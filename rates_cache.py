@@ -0,0 +1,61 @@
+import threading
+
+from time import monotonic
+
+
+class LiveRatesCache:
+    def __init__(self, fetch, ttl=2):
+        """
+        Keeps the latest 'live-rates' response of each primary asset for ttl seconds, so the rates of every secondary
+        asset are served from one download.
+
+        Refreshes are single-flight: when many threads ask for the same expired primary at once, one of them downloads
+        it and the others wait for (and share) its result.
+        :param fetch: a function that takes the id of a primary asset and returns its 'live-rates' response, i.e. a
+            dictionary that maps the id of each secondary asset to its rates.
+        :param ttl: a number that represents the number of seconds a response is served for.
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.hits, self.misses = 0, 0
+        self._rates = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, primary):
+        entry = self._rates.get(primary)
+        if entry is not None and monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def get(self, primary):
+        """
+        :param primary: a string that represents the id of the primary asset.
+        :return: the cached 'live-rates' response of primary, downloading it first if it has expired.
+        """
+        rates = self._fresh(primary)
+        if rates is not None:
+            self.hits += 1
+            return rates
+        with self._lock:
+            lock = self._locks.setdefault(primary, threading.Lock())
+        with lock:
+            # Another thread may have refreshed it while we were waiting.
+            rates = self._fresh(primary)
+            if rates is not None:
+                self.hits += 1
+                return rates
+            self.misses += 1
+            rates = self.fetch(primary)
+            self._rates[primary] = (monotonic(), rates)
+            return rates
+
+    def invalidate(self, primary=None):
+        """
+        Forces the next self.get() to download the rates again.
+        :param primary: a string that represents the id of the primary asset. If None, every primary is invalidated.
+        """
+        if primary is None:
+            self._rates.clear()
+        else:
+            self._rates.pop(primary, None)
@@ -0,0 +1,140 @@
+import numpy as np
+
+from datetime import datetime
+
+
+class RingBuffer:
+    def __init__(self, capacity, columns=1, dtype=float):
+        """
+        Fixed-capacity buffer backed by a NumPy array. Appending is O(1), and once the buffer is full, every append
+        overwrites the oldest row.
+
+        Every row is written twice, at i and i + capacity, so the rows currently held are always stored contiguously
+        in memory. This means that self.view() never has to copy anything.
+        :param capacity: an integer that represents the maximum number of rows held at the same time.
+        :param columns: an integer that represents the number of values in each row.
+        :param dtype: the NumPy data type of the values.
+        """
+        if capacity < 1:
+            raise ValueError("capacity has to be at least 1.")
+        self.capacity = capacity
+        self._array = np.zeros((columns, 2 * capacity), dtype=dtype)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, *values):
+        """
+        Adds a row to the end of the buffer.
+        :param values: one value for each column.
+        """
+        i = (self._start + self._size) % self.capacity
+        self._array[:, i] = values
+        self._array[:, i + self.capacity] = values
+        if self._size == self.capacity:
+            self._start = (self._start + 1) % self.capacity
+        else:
+            self._size += 1
+
+    def extend(self, values):
+        """
+        Adds many rows at once. Only the last self.capacity rows are kept if there are more than that.
+        :param values: an array-like with one row of values for each column, i.e. of shape (columns, n).
+        """
+        values = np.asarray(values, dtype=self._array.dtype).reshape(self._array.shape[0], -1)
+        n = values.shape[1]
+        if n == 0:
+            return
+        if n >= self.capacity:
+            values = values[:, n - self.capacity:]
+            self._array[:, :self.capacity] = values
+            self._array[:, self.capacity:] = values
+            self._start, self._size = 0, self.capacity
+            return
+        positions = (self._start + self._size + np.arange(n)) % self.capacity
+        self._array[:, positions] = values
+        self._array[:, positions + self.capacity] = values
+        overflow = max(0, self._size + n - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self._size = min(self.capacity, self._size + n)
+
+    def pop(self):
+        """
+        Removes the newest row.
+        :return: a NumPy array that holds the values of the removed row.
+        """
+        if self._size == 0:
+            raise IndexError("pop from an empty buffer")
+        self._size -= 1
+        return self._array[:, self._start + self._size].copy()
+
+    def clear(self):
+        self._start, self._size = 0, 0
+
+    def view(self, column=0, n=None):
+        """
+        Returns the last n values of a column, oldest first, without copying them.
+        The view is only guaranteed to be valid until the next time the buffer is modified.
+        :param column: an integer that represents the index of the column.
+        :param n: an integer that represents the number of values. If None, every value is returned.
+        :return: a 1D NumPy array.
+        """
+        n = self._size if n is None else min(n, self._size)
+        end = self._start + self._size
+        return self._array[column, end - n:end]
+
+
+class OHLCBuffer(RingBuffer):
+    fields = ("time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, capacity, assetCode=None):
+        """
+        Ring buffer that holds candles, replacing the dictionary of deques previously returned by
+        SwyftX.extract_price_data(). Time is stored as unix time in seconds.
+
+        Columns can be accessed like the old dictionary, e.g. buffer["close"][-1] or EMA(buffer["close"], 12), except
+        that each of them is a zero-copy NumPy view.
+        :param capacity: an integer that represents the maximum number of candles held at the same time.
+        :param assetCode: a string that represents the ticker symbol of the asset the candles belong to.
+        """
+        super().__init__(capacity, len(self.fields))
+        self.assetCode = assetCode
+
+    def __getitem__(self, field):
+        if field == "assetCode":
+            return self.assetCode
+        return self.view(self.fields.index(field))
+
+    def append(self, time, open, high, low, close, volume=0.0):
+        """
+        Adds a candle to the buffer.
+        :param time: a number that represents the opening time of the candle in unix seconds.
+        """
+        super().append(time, open, high, low, close, volume)
+
+    def row(self, i=-1):
+        """
+        :param i: an integer that represents the index of the candle. Defaults to the newest one.
+        :return: a dictionary that maps every field to the value of the candle.
+        """
+        return {field: self.view(column)[i] for column, field in enumerate(self.fields)}
+
+    def last(self, field, n=None):
+        """
+        Returns the last n values of a field without copying them.
+        """
+        return self.view(self.fields.index(field), n)
+
+    def last_time(self):
+        """
+        :return: a datetime object that represents the opening time of the newest candle.
+        """
+        return datetime.fromtimestamp(self.view(0)[-1])
+
+    def times(self, n=None):
+        """
+        :return: a list of datetime objects that represent the opening times of the last n candles.
+        """
+        return [datetime.fromtimestamp(t) for t in self.view(0, n)]
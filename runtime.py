@@ -0,0 +1,150 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from bot import Bot
+from errors import BarTimeoutError
+from swyftx import SwyftX
+from threaded_timer import NearestTimer
+
+
+class Runtime:
+    def __init__(self, key, mode="demo", candle_store=None, max_workers=8, delay=0, rate_limit=None,
+                 base_url=None):
+        """
+        Hosts many bots (one for each pair) in a single process. Every bot shares the same SwyftX object, asset
+        metadata and balance ledger (see BalanceLedger), and instead of each bot running its own clock, there is one
+        clock per resolution that is in use. At every tick, the candles of every bot on that resolution are fetched
+        concurrently in one batch, and each bot is then updated with its candle.
+        :param key: a string that is the SwyftX API key.
+        :param mode: a string that determines the mode in which the bots are running. Same as in Bot.
+        :param candle_store: a CandleStore, or a string that represents the directory of one. Same as in Bot.
+        :param max_workers: an integer that represents the maximum number of candles fetched at the same time.
+        :param delay: a number that represents the number of seconds to wait after each interval before fetching. The
+            SwyftX object's BarPoller already waits for the candles to be published, so this is usually 0.
+        :param rate_limit: a number that represents the maximum number of requests per second sent by every bot
+            together. Same as in SwyftX.
+        :param base_url: a string that represents the URL requests are sent to instead of SwyftX. Same as in SwyftX.
+        """
+        self.key = key
+        self.swyftx = SwyftX(key, mode, candle_store=candle_store, pool_size=max(16, max_workers),
+                             rate_limit=rate_limit, base_url=base_url)
+        self.balance = self.swyftx.ledger.sync()
+        self.max_workers = max_workers
+        self.delay = delay
+        self.bots = []
+        # Maps each resolution to the bots that are updated at that resolution, and to the clock that ticks at it.
+        self._scheduled, self._timers = {}, {}
+        # Fetches and updates the bots of a tick. Kept for the lifetime of the runtime, so ticks don't start threads.
+        # It's separate from self.swyftx.executor, which SwyftX.get_tick() uses from these threads.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="runtime")
+        self._lock = threading.RLock()
+
+    def add(self, primary, secondary, **kwargs):
+        """
+        Creates a bot for a pair and starts trading it.
+        :param primary: a string that represents the ticker symbol of the primary asset.
+        :param secondary: a string that represents the ticker symbol of the secondary asset.
+        :param kwargs: parameter values for Bot.quick_start(). Backtesting and graphing aren't supported here.
+        :return: the Bot object.
+        """
+        if kwargs.get("backtest") or kwargs.get("graph"):
+            raise ValueError("Bots hosted by a Runtime can't backtest or graph. Please use Bot directly.")
+        bot = Bot(self.key, swyftx=self.swyftx, balance=self.balance, runtime=self)
+        with self._lock:
+            self.bots.append(bot)
+        bot.quick_start(primary, secondary, **kwargs)
+        return bot
+
+    def add_top_n(self, primary, n=20, **kwargs):
+        """
+        Creates a bot for each of the top n assets (by rank).
+        :param primary: a string that represents the ticker symbol of the primary asset.
+        :param n: an integer that determines the number of assets to trade.
+        :param kwargs: parameter values for Bot.quick_start().
+        :return: a list of Bot objects.
+        """
+        codes = [a["code"] for a in self.swyftx.get_top_n_assets(n) if a["code"] != primary]
+        return [self.add(primary, code, **kwargs) for code in codes]
+
+    def schedule(self, bot, resolution):
+        """
+        Updates bot at every interval of resolution. Called by Bot.run_clock().
+        """
+        with self._lock:
+            self.unschedule(bot)
+            self._scheduled.setdefault(resolution, []).append(bot)
+            if resolution not in self._timers:
+                self._timers[resolution] = NearestTimer(resolution, self._tick, self.delay, resolution,
+                                                        overrun="catch_up",
+                                                        catch_up=lambda missed: self._catch_up(resolution, missed))
+
+    def unschedule(self, bot):
+        """
+        Stops updating bot. The clock of a resolution is stopped once no bot is using it. Called by Bot.stop_clock().
+        """
+        with self._lock:
+            for resolution, bots in list(self._scheduled.items()):
+                if bot in bots:
+                    bots.remove(bot)
+                if not bots:
+                    del self._scheduled[resolution]
+                    self._timers.pop(resolution).stop()
+
+    def _tick(self, resolution):
+        """
+        Fetches the tick of every bot scheduled at resolution (see SwyftX.get_tick()) in one batch, then updates the
+        bots.
+        """
+        with self._lock:
+            bots = list(self._scheduled.get(resolution, []))
+        if not bots:
+            return
+
+        def fetch(bot):
+            try:
+                return self.swyftx.get_tick(bot.primary, bot.secondary, resolution, bid=not bot.aggregating())
+            except BarTimeoutError as e:
+                print(f"Skipping {bot.primary}/{bot.secondary}: {e}")
+            except Exception as e:
+                # Same as below: one pair failing to fetch shouldn't stop every other pair from trading.
+                print(f"Failed to fetch {bot.primary}/{bot.secondary}: {e!r}")
+            return None
+
+        ticks = list(self.executor.map(fetch, bots))
+
+        for bot, tick in zip(bots, ticks):
+            if tick is None:
+                continue
+            try:
+                bot.update_all(bot.fast, bot.slow, bot.signal, bot.long, tick=tick)
+            except Exception as e:
+                # One pair failing shouldn't stop every other pair from trading.
+                print(f"Failed to update {bot.primary}/{bot.secondary}: {e!r}")
+
+    def _catch_up(self, resolution, missed):
+        """
+        Called instead of self._tick() when ticks of resolution were missed because a previous one overran. Each bot
+        backfills every candle it missed with one request (see Bot.catch_up()), and the bots catch up concurrently.
+        """
+        with self._lock:
+            bots = list(self._scheduled.get(resolution, []))
+        if not bots:
+            return
+
+        def catch_up(bot):
+            try:
+                bot.catch_up(missed)
+            except Exception as e:
+                print(f"Failed to catch up {bot.primary}/{bot.secondary}: {e!r}")
+
+        list(self.executor.map(catch_up, bots))
+
+    def stop(self):
+        """
+        Stops every bot, and the threads that update them.
+        """
+        with self._lock:
+            for bot in list(self.bots):
+                if bot.running:
+                    bot.stop_clock()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,182 @@
+import argparse
+import csv
+import os
+
+from datetime import datetime
+from itertools import product
+from multiprocessing import Pool
+from backtest_feed import BacktestFeed, backtest_window
+from nearest import rank_down
+from vector_backtest import VectorBacktest, load_series
+
+# Parameters that can be swept, with the default value used when they're not part of the grid.
+default_parameters = {
+    "fast": 12,
+    "slow": 26,
+    "signal": 9,
+    "long": 100,
+    "buy_rate": 0.2,
+    "tolerance": 2
+}
+
+result_columns = list(default_parameters) + ["final_balance", "return", "trades", "win_rate"]
+
+# Set once in every worker process by _init_worker(), so the dataset isn't pickled for each backtest.
+_job = None
+
+
+def _init_worker(job):
+    global _job
+    _job = job
+
+
+def _run(parameters):
+    """
+    Runs one backtest on the shared dataset.
+    :param parameters: a dictionary of strategy parameters.
+    :return: a dictionary with the parameters and the results of the backtest.
+    """
+    backtest = VectorBacktest(None, _job["primary"], _job["secondary"], balance=_job["balance"],
+                              series=_job["series"], **parameters)
+    history = backtest.run(_job["resolution"], _job["start_time"], _job["end_time"], _job["backtest_end_time"])
+
+    final_balance = backtest.balance[_job["primary"]]
+    if backtest.balance[_job["secondary"]]:
+        # Still holding the secondary asset, so value it at the last close.
+        final_balance += backtest.balance[_job["secondary"]] * _job["series"][_job["resolution"]]["close"][-1]
+
+    buys = [order[12] for order in history if order[1] == "BUY"]
+    sells = [order[12] for order in history if order[1] == "SELL"]
+    wins = sum(1 for buy, sell in zip(buys, sells) if sell > buy)
+    out = dict(parameters)
+    out.update({
+        "final_balance": final_balance,
+        "return": final_balance / _job["balance"] - 1,
+        "trades": len(sells),
+        "win_rate": wins / len(sells) if sells else 0
+    })
+    return out
+
+
+def parameter_grid(grid):
+    """
+    Expands a grid into every combination of parameters. Combinations where the fast EMA isn't faster than the slow
+    one are skipped.
+    :param grid: a dictionary that maps parameter names to lists of values. Parameters that are missing use the
+        values in default_parameters.
+    :return: a list of dictionaries.
+    """
+    for name in grid:
+        if name not in default_parameters:
+            raise KeyError(f"'{name}' can't be swept. Please choose from: {', '.join(default_parameters)}")
+    names = list(default_parameters)
+    values = [grid.get(name, [default_parameters[name]]) for name in names]
+    combinations = [dict(zip(names, combination)) for combination in product(*values)]
+    return [c for c in combinations if c["fast"] < c["slow"]]
+
+
+def sweep(feed, primary, secondary, grid, resolution="5m", start_time=None, end_time=None, backtest_end_time=None,
+          balance=10000, processes=None, sort_by="final_balance"):
+    """
+    Backtests every combination of strategy parameters in grid across a pool of processes.
+
+    The candles are loaded from feed once and sent to each worker process once when the pool starts; every backtest
+    then runs on the same arrays.
+    :param feed: a BacktestFeed (or SwyftX object) that the ask candles are fetched from.
+    :param primary: a string that represents the ticker symbol of the primary asset.
+    :param secondary: a string that represents the ticker symbol of the secondary asset.
+    :param grid: a dictionary that maps parameter names to lists of values, e.g. {"fast": [8, 12], "slow": [21, 26]}.
+    :param resolution: a string that represents the resolution the backtests start at.
+    :param start_time: a datetime object. Same as in Bot.quick_start().
+    :param end_time: a datetime object. Same as in Bot.quick_start().
+    :param backtest_end_time: a datetime object. Same as in Bot.quick_start().
+    :param balance: a number that represents the starting balance of the primary asset.
+    :param processes: an integer that represents the number of worker processes. Defaults to the number of cores.
+    :param sort_by: a string that represents the column that results are ranked by (highest first).
+    :return: a list of dictionaries (see result_columns), ranked by sort_by.
+    """
+    combinations = parameter_grid(grid)
+    if end_time is None:
+        end_time = datetime.now()
+    if backtest_end_time is None:
+        backtest_end_time = datetime.now()
+    if start_time is None:
+        raise ValueError("start_time has to be specified when sweeping.")
+
+    # Zooming in from 'resolution' goes one rank down, and zooming back out returns to 'resolution'.
+    window = backtest_window(resolution, start_time, backtest_end_time, max(c["long"] for c in combinations))
+    series = {r: load_series(feed, primary, secondary, r, window) for r in (resolution, rank_down(resolution))}
+    job = {
+        "primary": primary,
+        "secondary": secondary,
+        "resolution": resolution,
+        "start_time": start_time,
+        "end_time": end_time,
+        "backtest_end_time": backtest_end_time,
+        "balance": balance,
+        "series": series
+    }
+
+    processes = processes or os.cpu_count()
+    if processes <= 1:
+        _init_worker(job)
+        results = [_run(c) for c in combinations]
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=(job,)) as pool:
+            chunksize = max(1, len(combinations) // (processes * 4))
+            results = list(pool.imap_unordered(_run, combinations, chunksize))
+
+    return sorted(results, key=lambda r: r[sort_by], reverse=True)
+
+
+def print_results(results, top=20):
+    """
+    Prints the results of sweep() as a table.
+    :param top: an integer that determines how many rows to print.
+    """
+    print(" ".join(f"{c:>13}" for c in result_columns))
+    for r in results[:top]:
+        print(" ".join(f"{r[c]:>13.4f}" if type(r[c]) is float else f"{r[c]:>13}" for c in result_columns))
+
+
+def results_to_csv(results, path):
+    """
+    Saves the results of sweep() to a CSV file.
+    """
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=result_columns)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _values(text, cast):
+    return [cast(v) for v in text.split(",")]
+
+
+if '__main__' == __name__:
+    parser = argparse.ArgumentParser(description="Backtests every combination of strategy parameters on a saved "
+                                                 "BacktestFeed and ranks the results.")
+    parser.add_argument("feed", help="a file saved with BacktestFeed.save()")
+    parser.add_argument("--resolution", default="5m")
+    parser.add_argument("--start", required=True, help="start time, e.g. 2021-04-24T00:00")
+    parser.add_argument("--end", required=True, help="end time of the initial data, e.g. 2021-04-25T00:00")
+    parser.add_argument("--backtest-end", required=True, help="time at which backtesting stops")
+    for name, default in default_parameters.items():
+        parser.add_argument("--" + name.replace("_", "-"), dest=name, default=None,
+                            help=f"comma-separated values (default: {default})")
+    parser.add_argument("--balance", type=float, default=10000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--sort-by", default="final_balance", choices=result_columns)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--csv", default=None, help="a file to save every result to")
+    args = parser.parse_args()
+
+    feed = BacktestFeed.load(args.feed)
+    grid = {name: _values(getattr(args, name), type(default))
+            for name, default in default_parameters.items() if getattr(args, name) is not None}
+    results = sweep(feed, feed.primary, feed.secondary, grid, args.resolution, datetime.fromisoformat(args.start),
+                    datetime.fromisoformat(args.end), datetime.fromisoformat(args.backtest_end), args.balance,
+                    args.processes, args.sort_by)
+    print_results(results, args.top)
+    if args.csv:
+        results_to_csv(results, args.csv)
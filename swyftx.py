@@ -1,10 +1,20 @@
-import requests
 import json
 import os
+import threading
 
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from threaded_timer import NearestTimer
+from candle_store import CandleStore
+from transport import Transport
+from rate_limiter import RateLimiter
+from instrumentation import Instrumentation
+from asset_cache import AssetCache
+from bar_poller import BarPoller
+from rates_cache import LiveRatesCache
+from balance_ledger import BalanceLedger
+from order_tracker import OrderTracker
+from ring_buffer import OHLCBuffer
 from time import time, sleep
 from nearest import erase_seconds, resolution_to_seconds, calculate_next_interval
 # API documentation: https://swyftx.docs.apiary.io/
@@ -14,6 +24,9 @@ endpoints = {
     "demo": "https://api.demo.swyftx.com.au/"
 }
 
+# Maximum number of candles requested by a single 'charts/getBars' call when downloading in chunked mode.
+bars_per_chunk = 500
+
 
 class OldTokenError(Exception):
     pass
@@ -23,7 +36,8 @@ class EmptyTokenError(Exception):
     pass
 
 class SwyftX:
-    def __init__(self, apiKey, mode="demo", blacklist = ["USDT", "USDC", "BUSD"]):
+    def __init__(self, apiKey, mode="demo", blacklist = ["USDT", "USDC", "BUSD"], candle_store=None, bar_poller=None,
+                 rates_ttl=2, asset_cache=None, pool_size=16, rate_limit=None, instrumentation=None, base_url=None):
         """
         Initialisation for SwyftX agent. Its main purpose is to interact with the SwyftX server such as fetching data
         and executing bull/sell orders.
@@ -34,22 +48,127 @@ class SwyftX:
             'base': if you want to trade for real.
         :param blacklist: a list of ticker symbols that represents all secondary assets that we're not interested in
             trading.
-        """
-        self.endpoint = endpoints[mode]
+        :param candle_store: a CandleStore, or a string that represents the directory of one. If specified,
+            get_asset_data() will serve candles from the store and only request the ranges that are missing from it.
+        :param bar_poller: a BarPoller that get_last_completed_data() waits for bars with. If None, a new one is
+            created.
+        :param rates_ttl: a number that represents the number of seconds a 'live-rates' response is reused for by
+            get_live_asset_rates() and get_live_rates().
+        :param asset_cache: an AssetCache, or a string that represents the file of one. If specified, the asset table
+            is read from it instead of being downloaded every time SwyftX is created.
+        :param pool_size: an integer that represents the maximum number of connections kept open to SwyftX. It should
+            be at least the number of threads sending requests at the same time (e.g. Runtime's max_workers).
+        :param rate_limit: a number that represents the maximum number of requests per second, or a RateLimiter to
+            share with other SwyftX objects. Orders are sent first, then bars, then metadata and backfills. If None,
+            requests aren't paced.
+        :param instrumentation: an Instrumentation that latency, throughput and errors of every request are recorded
+            in. If None, a new one is created. See self.instrumentation.snapshot() and self.instrumentation.add_hook().
+        :param base_url: a string that represents the URL every request is sent to instead of SwyftX (e.g. the URL of a
+            FakeSwyftXServer). The token is then never read from or written to 'token.txt'.
+
+        The token and the asset table are fetched concurrently in the background, so the object can be used straight
+        away. Anything that needs them (e.g. self.token, self.to_id()) waits until they're ready.
+        """
+        self.base_url = base_url if base_url is None else base_url.rstrip("/") + "/"
+        self.endpoint = endpoints[mode] if base_url is None else self.base_url
+        # Market data and tokens always come from the live API, even in demo mode.
+        self.data_endpoint = endpoints["base"] if base_url is None else self.base_url
         self.is_demo = True if mode == "demo" else False
         self.key = apiKey
         self.default_header = {
             "Content-Type": "application/json"
         }
-        self.session = requests.Session()
-        self.token = self._fetch_token()
-        self.authenticate_header = self._authenticate_header()
-        self.asset_info = self._fetch_asset_info()
+        if rate_limit is not None and not isinstance(rate_limit, RateLimiter):
+            rate_limit = RateLimiter(rate_limit)
+        self.instrumentation = Instrumentation() if instrumentation is None else instrumentation
+        self.transport = Transport(pool_size, default_headers=self.default_header, rate_limiter=rate_limit,
+                                   instrumentation=self.instrumentation)
+        # Kept for code that uses the session directly. Headers shouldn't be set on it (see Transport).
+        self.session = self.transport.session
         self._blacklist = blacklist
-        self._to_id, self._to_code = self._create_name_id_dict(self.asset_info)
-        self.asset_info = self._reshape_asset_info()
+        self.asset_cache = AssetCache(asset_cache) if type(asset_cache) is str else asset_cache
+        self._raw_assets, self._asset_tables, self._authenticate = None, None, None
+        startup = ThreadPoolExecutor(max_workers=2)
+        self._token_future = startup.submit(self._fetch_token)
+        self._assets_future = startup.submit(self._load_asset_info)
+        startup.shutdown(wait=False)
         self.collected_data = {}
         self.threaded_timer = None
+        self.candle_store = CandleStore(candle_store) if type(candle_store) is str else candle_store
+        self.bar_poller = BarPoller() if bar_poller is None else bar_poller
+        self.live_rates = LiveRatesCache(self._fetch_live_rates, rates_ttl)
+        # Used to send the requests of a tick concurrently (see self.get_tick()).
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="swyftx")
+        # Shared by every bot using this object, so all of their open orders are refreshed together.
+        self.order_tracker = OrderTracker(self)
+        # Shared by every bot using this object. Fills are applied to it locally, and it's reconciled with SwyftX in the
+        # background while bots are running.
+        self.ledger = BalanceLedger(self)
+
+    @property
+    def token(self):
+        return self._token_future.result()
+
+    @property
+    def authenticate_header(self):
+        if self._authenticate is None:
+            self._authenticate = self._authenticate_header()
+        return self._authenticate
+
+    def _assets(self):
+        """
+        :return: a tuple of self.asset_info, self._to_id and self._to_code, waiting for them if they're still being
+            fetched.
+        """
+        if self._asset_tables is None:
+            tables = self._assets_future.result()
+            if self._asset_tables is None:
+                # Unless a background refresh has already replaced them.
+                self._asset_tables = tables
+        return self._asset_tables
+
+    @property
+    def asset_info(self):
+        return self._assets()[0]
+
+    @property
+    def _to_id(self):
+        return self._assets()[1]
+
+    @property
+    def _to_code(self):
+        return self._assets()[2]
+
+    def _load_asset_info(self):
+        """
+        Reads the asset table from self.asset_cache, or downloads it if there's no usable copy. A copy that is getting
+        old is used straight away and refreshed in the background.
+        :return: a tuple in the same format as self._assets().
+        """
+        if self.asset_cache is not None:
+            assets, stale = self.asset_cache.load()
+            if assets is not None:
+                if stale:
+                    threading.Thread(target=self.refresh_asset_info, daemon=True).start()
+                return self._build_asset_tables(assets)
+        return self._build_asset_tables(self._download_asset_info())
+
+    def _download_asset_info(self):
+        assets = self._fetch_asset_info()
+        if self.asset_cache is not None:
+            self.asset_cache.save(assets)
+        return assets
+
+    def _build_asset_tables(self, assets):
+        self._raw_assets = assets
+        to_id, to_code = self._create_name_id_dict(assets)
+        return self._reshape_asset_info(assets), to_id, to_code
+
+    def refresh_asset_info(self):
+        """
+        Downloads the asset table again (saving it to self.asset_cache if there is one) and starts using it.
+        """
+        self._asset_tables = self._build_asset_tables(self._download_asset_info())
 
     def _authenticate_header(self):
         """
@@ -61,9 +180,10 @@ class SwyftX:
         header["Authorization"] = "Bearer " + self.token
         return header
 
-    def _reshape_asset_info(self):
+    def _reshape_asset_info(self, assets=None):
         """
         Converts the output of self._fetch_asset_info() into a dictionary with asset code as key.
+        :param assets: the output of self._fetch_asset_info(). If None, self.asset_info is used.
         :return: a dictionary of dictionaries with the following structure:
             {
                 *asset code*: {
@@ -81,7 +201,7 @@ class SwyftX:
             }
         """
         out = {}
-        for asset in self.asset_info:
+        for asset in (self.asset_info if assets is None else assets):
             out[asset["code"]] = asset
 
         return out
@@ -95,6 +215,8 @@ class SwyftX:
         placing buy/sell orders.
         :return: a string that represents the token.
         """
+        if self.base_url is not None:
+            return self._request_token()
         try:
             if datetime.now().timestamp() >= os.path.getmtime("token.txt") + 7 * 24 * 60 * 60:
                 raise OldTokenError
@@ -111,18 +233,24 @@ class SwyftX:
             # Gotta generate new key
             print("Invalid token.txt \nCreating a new token...")
             with open("token.txt", "w") as f:
-                self.session.headers.update(self.default_header)
-                t = json.loads(self.session.post(
-                    "https://api.swyftx.com.au/auth/refresh/",
-                    data=json.dumps(
-                        {
-                            "apiKey": self.key
-                        })
-                ).text)['accessToken']
+                t = self._request_token()
                 print("Token created successfully!")
                 f.write(t)
                 return t
 
+    def _request_token(self):
+        """
+        Generates a new token from the API key.
+        :return: a string that represents the token.
+        """
+        return json.loads(self.transport.post(
+            self.data_endpoint + "auth/refresh/",
+            data=json.dumps(
+                {
+                    "apiKey": self.key
+                })
+        ).text)['accessToken']
+
     def _fetch_asset_info(self, assetCode = ''):
         """
         Fetches all assets available on SwyftX.
@@ -140,8 +268,7 @@ class SwyftX:
                 marketCap
             }
         """
-        self.session.headers.update(self.default_header)
-        return json.loads(self.session.get(endpoints["base"] + "markets/info/basic/" + assetCode).text)
+        return json.loads(self.transport.get(self.data_endpoint + "markets/info/basic/" + assetCode).text)
 
     def _create_name_id_dict(self, assets):
         """
@@ -199,15 +326,15 @@ class SwyftX:
                     availableBalance
                 }
         """
-        self.session.headers.update(self.authenticate_header)
-        balance = json.loads(self.session.get(self.endpoint + "user/balance/").text)
+        balance = json.loads(self.transport.get(self.endpoint + "user/balance/", self.authenticate_header,
+                                                   lane="orders").text)
         out = {}
         for c in balance:
             out[self.to_code(str(c["assetId"]))] = float(c["availableBalance"])
 
         return out
 
-    def get_top_n_assets(self, n=20):
+    def get_top_n_assets(self, n=20, refresh=False):
         """
         Description: Grabs the top n assets (by rank) and returns them in the form of:
         [code, name, altName].
@@ -217,6 +344,8 @@ class SwyftX:
         Eg:
         ["BTC", "Bitcoin", "Bitcoin"]
         :param n: an integer that determines the top n coins to grab from SwyftX.
+        :param refresh: a boolean that determines whether to download the asset table again. Otherwise, the ranks in
+            the table loaded when SwyftX was created (see asset_cache) are used.
         """
 
         def less_than_or_equal_to_n(x, n):
@@ -226,8 +355,10 @@ class SwyftX:
 
             return False
 
-        self.session.headers.update(self.default_header)
-        raw_assets = json.loads(self.session.get("https://api.swyftx.com.au/markets/info/basic/").text)
+        if refresh:
+            self.refresh_asset_info()
+        self._assets()
+        raw_assets = self._raw_assets
         cleaned_assets = list(filter(lambda x: x["rank"] is not None, raw_assets))
         blacklist_removed = list(filter(lambda x: x["code"] not in self._blacklist, cleaned_assets))
         sorted_assets = sorted(blacklist_removed, key=lambda x: x["rank"])
@@ -263,8 +394,8 @@ class SwyftX:
             "assetQuantity": assetQuantity,
             "orderType": 1
         }
-        self.session.headers.update(self.authenticate_header)
-        response = self.session.post(self.endpoint + "orders/", data=json.dumps(payload))
+        response = self.transport.post(self.endpoint + "orders/", self.authenticate_header, lane="orders",
+                                       data=json.dumps(payload))
         return response
 
     def market_sell(self, primary, secondary, quantity, assetQuantity=None):
@@ -299,8 +430,8 @@ class SwyftX:
             "assetQuantity": assetQuantity,
             "orderType": 2
         }
-        self.session.headers.update(self.authenticate_header)
-        response = self.session.post(self.endpoint + "orders/", data=json.dumps(payload))
+        response = self.transport.post(self.endpoint + "orders/", self.authenticate_header, lane="orders",
+                                       data=json.dumps(payload))
         return response
 
     def stop_loss(self, primary, secondary, quantity, trigger, assetQuantity=None):
@@ -330,8 +461,8 @@ class SwyftX:
             "orderType": 6,
             "trigger": 1/float(trigger)
         }
-        self.session.headers.update(self.authenticate_header)
-        response = self.session.post(self.endpoint + "orders/", data=json.dumps(payload))
+        response = self.transport.post(self.endpoint + "orders/", self.authenticate_header, lane="orders",
+                                       data=json.dumps(payload))
         return response
 
     def get_order(self, orderUuid):
@@ -361,8 +492,8 @@ class SwyftX:
               "feeUserCountryValue": 40.25
             }
         """
-        self.session.headers.update(self.authenticate_header)
-        response = self.session.get(self.endpoint + "orders/byId/" + orderUuid)
+        response = self.transport.get(self.endpoint + "orders/byId/" + orderUuid, self.authenticate_header,
+                                      lane="orders")
         return response
 
     def delete_order(self, orderUuid):
@@ -384,8 +515,8 @@ class SwyftX:
             }
 
         """
-        self.session.headers.update(self.authenticate_header)
-        response = self.session.delete(self.endpoint + "orders/" + orderUuid + "/")
+        response = self.transport.delete(self.endpoint + "orders/" + orderUuid + "/", self.authenticate_header,
+                                         lane="orders")
         return response
 
     def delete_last_order(self, assetCode=""):
@@ -428,11 +559,12 @@ class SwyftX:
                 "feeUserCountryValue"
               }
         """
-        self.session.headers.update(self.authenticate_header)
-        response = self.session.get(self.endpoint + "orders/" + "?".join([assetCode, limit, page]))
+        response = self.transport.get(self.endpoint + "orders/" + "?".join([assetCode, limit, page]),
+                                      self.authenticate_header, lane="orders")
         return json.loads(response.text)["orders"]
 
-    def get_asset_data(self, primary, secondary, side, resolution, time_start, time_end, readable_time=True):
+    def get_asset_data(self, primary, secondary, side, resolution, time_start, time_end, readable_time=True,
+                       chunked=False, max_workers=4):
         """
 
         ----------------------------------------------------------------------------------------------------------
@@ -455,6 +587,13 @@ class SwyftX:
         :param time_end: 2 possibilities - either a string representing unix epoch, or a datetime object.
             Determines the ending time (time of the last bar).
         :param readable_time: a boolean that will convert time to human-readable time instead of unix time.
+        :param chunked: a boolean that determines whether to split the range into windows of bars_per_chunk candles
+            and download them concurrently. Recommended for long ranges of '1m' or '5m' candles, which would otherwise
+            be downloaded by one slow request (and may get truncated by SwyftX).
+        :param max_workers: an integer that represents the maximum number of concurrent requests in chunked mode.
+
+        If self.candle_store is set, only the parts of the range that haven't been downloaded before are requested
+        from SwyftX. Everything else is read from the store.
         :return: a dictionary with the following structure:
             {
                 assetCode,
@@ -472,16 +611,16 @@ class SwyftX:
                     name
                 }
         """
-        #print("time_start: ", datetime.fromtimestamp(time_start/1000))
-        #print("time_end: ", datetime.fromtimestamp(time_end/1000))
         if type(time_start) is datetime:
             time_start = str(1000*int(time_start.timestamp()))
         if type(time_end) is datetime:
             time_end = str(1000*int(time_end.timestamp()))
-        #print(f"time_start: {time_start}\ntime_end: {time_end}")
-        self.session.headers.update(self.default_header)
-        d = json.loads(self.session.get(endpoints[
-                                 "base"] + "charts/getBars/" + "/".join([primary,secondary,side,"&".join(["?resolution="+resolution, f"timeStart={int(time_start)}",f"timeEnd={int(time_end)}"])])).text)["candles"]
+        time_start, time_end = int(float(time_start)), int(float(time_end))
+
+        if self.candle_store is None:
+            d = self._download_bars(primary, secondary, side, resolution, time_start, time_end, chunked, max_workers)
+        else:
+            d = self._get_stored_bars(primary, secondary, side, resolution, time_start, time_end, chunked, max_workers)
 
         if readable_time:
             for i in range(len(d)):
@@ -491,6 +630,61 @@ class SwyftX:
             "data":d
         }
 
+    def _get_bars(self, primary, secondary, side, resolution, time_start, time_end, lane="bulk"):
+        """
+        Sends a single 'charts/getBars' request.
+        :param time_start: a number that represents the start time in unix milliseconds.
+        :param time_end: a number that represents the end time in unix milliseconds.
+        :param lane: a string that represents the priority of the request (see rate_limiter.lanes). Historical
+            downloads are 'bulk', and bars needed by the current tick are 'bars'.
+        :return: a list of raw candles, with time in unix milliseconds.
+        """
+        r = self.transport.get(self.data_endpoint + "charts/getBars/" + "/".join([primary,secondary,side,"&".join(["?resolution="+resolution, f"timeStart={int(time_start)}",f"timeEnd={int(time_end)}"])]), lane=lane)
+        try:
+            return json.loads(r.text)["candles"]
+        except (ValueError, KeyError):
+            self.instrumentation.error("charts/getBars", "unexpected response")
+            raise
+
+    def _get_bars_chunked(self, primary, secondary, side, resolution, time_start, time_end, max_workers=4):
+        """
+        Same as self._get_bars(), except that the range is split into consecutive windows of at most bars_per_chunk
+        candles, which are requested concurrently through self.transport. The chunks are stitched back together in
+        order and duplicated candles (if SwyftX includes both ends of a window) are removed.
+        :param max_workers: an integer that represents the maximum number of concurrent requests.
+        :return: a list of raw candles ordered by time, with time in unix milliseconds.
+        """
+        step = resolution_to_seconds[resolution] * 1000 * bars_per_chunk
+        windows = [(start, min(start + step - 1, time_end)) for start in range(int(time_start), int(time_end) + 1, step)]
+        if len(windows) <= 1:
+            return self._get_bars(primary, secondary, side, resolution, time_start, time_end)
+
+        candles = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(windows))) as executor:
+            chunks = executor.map(lambda w: self._get_bars(primary, secondary, side, resolution, w[0], w[1]), windows)
+            for chunk in chunks:
+                for c in chunk:
+                    candles[int(c["time"])] = c
+        return [candles[t] for t in sorted(candles)]
+
+    def _download_bars(self, primary, secondary, side, resolution, time_start, time_end, chunked=False, max_workers=4):
+        if chunked:
+            return self._get_bars_chunked(primary, secondary, side, resolution, time_start, time_end, max_workers)
+        return self._get_bars(primary, secondary, side, resolution, time_start, time_end)
+
+    def _get_stored_bars(self, primary, secondary, side, resolution, time_start, time_end, chunked=False,
+                         max_workers=4):
+        """
+        Same as self._get_bars(), except that candles are read from self.candle_store and only the ranges that are
+        missing from it are requested from SwyftX.
+        :return: a list of raw candles ordered by time, with time in unix milliseconds.
+        """
+        still_open = []
+        for gap_start, gap_end in self.candle_store.missing(primary, secondary, side, resolution, time_start, time_end):
+            candles = self._download_bars(primary, secondary, side, resolution, gap_start, gap_end, chunked, max_workers)
+            still_open += self.candle_store.merge(primary, secondary, side, resolution, candles, gap_start, gap_end)
+        return self.candle_store.load(primary, secondary, side, resolution, time_start, time_end) + still_open
+
     def get_asset_timeslot(self, primary, secondary, side, resolution, t):
         """
         Gets a specific timeslot for a specific cryptocurrency.
@@ -518,7 +712,9 @@ class SwyftX:
 
     def get_last_completed_data(self, primary, secondary, side, resolution):
         """
-        Gets the last completed bar (as per resolution) and returns that data.
+        Gets the last completed bar (as per resolution) and returns that data. If SwyftX hasn't published it yet,
+        self.bar_poller keeps requesting it with backoff until it appears, or raises BarTimeoutError after its
+        deadline.
         :return: a dictionary in the form of:
             {
                 "side",
@@ -543,15 +739,50 @@ class SwyftX:
         #                           "base"] + "charts/getBars/" + "/".join([primary,secondary,side,"&".join(["?resolution="+resolution, f"timeStart={int(start)}",f"timeEnd={int(end)}"])])).text)
         #print("Fetch Time: ", datetime.now())
 
-        d = []
-
-        while len(d) < 1: # Band-aid fix for now.
-            d = json.loads(self.session.get(endpoints[
-                                                "base"] + "charts/getBars/" + "/".join([primary,secondary,side,"&".join(["?resolution="+resolution, f"timeStart={int(start)}",f"timeEnd={int(end)}"])])).text)["candles"]
-            #print(d)
-
+        d = self.bar_poller.poll(lambda: self._get_bars(primary, secondary, side, resolution, start, end, "bars"),
+                                 resolution, end / 1000)
         return d[0]
 
+    def get_tick(self, primary, secondary, resolution, bid=True):
+        """
+        Fetches everything a bot needs at the end of an interval at the same time, so a tick waits for one round trip
+        instead of two: the last completed ask bar and the bid bar of the same interval. Open orders (e.g. a pending
+        stop loss) are refreshed by self.order_tracker instead.
+        :param bid: a boolean that determines whether to fetch the bid bar.
+        :return: a dictionary with the following structure:
+            {
+                ask: a dictionary returned by self.get_last_completed_data(),
+                bid: same as ask for the bid side, or None if it wasn't requested or couldn't be fetched
+            }
+        """
+        bid = self.executor.submit(self.get_last_completed_data, primary, secondary, "bid", resolution) if bid else None
+        # The ask bar is fetched in this thread while the bid bar is in flight.
+        ask = self.get_last_completed_data(primary, secondary, "ask", resolution)
+        if bid is not None:
+            try:
+                bid = bid.result()
+            except Exception as e:
+                # The ask bar is kept: bots fetch the bid bar again themselves when it's missing.
+                print(f"Failed to fetch the bid bar of {primary}/{secondary}: {e!r}")
+                bid = None
+        return {
+            "ask": ask,
+            "bid": bid
+        }
+
+    def get_completed_data_since(self, primary, secondary, side, resolution, last_time):
+        """
+        Gets every bar that has completed after last_time in one request. Used to backfill the bars missed when a
+        tick overran.
+        :param last_time: a number that represents the time of the last bar already stored in unix seconds.
+        :return: a list of dictionaries in the same form as self.get_last_completed_data(), ordered by time.
+        """
+        interval = resolution_to_seconds[resolution] * 1000
+        now = time() * 1000
+        end = erase_seconds(now / 1000) * 1000
+        d = self._get_bars(primary, secondary, side, resolution, last_time * 1000 + interval, end, "bars")
+        return sorted([c for c in d if int(c["time"]) > last_time * 1000 and int(c["time"]) + interval <= now],
+                      key=lambda c: int(c["time"]))
 
     def get_latest_asset_data(self, primary, secondary, side, resolution, delay=0.3, stream=False):
         """
@@ -575,11 +806,8 @@ class SwyftX:
         ----------------------------------------------------------------------------------------------------------------
         So far, it only works well when resolution is set to '1m' or '5m'.
 
-        Upon further testing:
-
-        delay = 0.1 works well for '1m'
-        delay = 0.3 works well for '1m' and '5m'
-        delay = 0.5 doesn't work well for '1m'
+        Rather than tuning delay, use self.get_last_completed_data(), which waits for the bar using the publication
+        delay learned by self.bar_poller (see self.bar_poller.stats()).
 
         """
         #now = time()
@@ -587,14 +815,13 @@ class SwyftX:
         #print("Execution time: ", datetime.fromtimestamp(now))
         #print("Anticipated execution time: ", datetime.fromtimestamp(execution_time))
         #sleep(execution_time-now + delay)
-        self.session.headers.update(self.default_header)
         if not stream:
-            r = self.session.get(endpoints["base"] + "charts/getLatestBar/" + "/".join([primary,secondary,side,"?resolution="+resolution]))
+            r = self.transport.get(self.data_endpoint + "charts/getLatestBar/" + "/".join([primary,secondary,side,"?resolution="+resolution]), lane="bars")
             d = json.loads(r.text)
             del d["volume"]
             return d
         else:
-            with self.session.get(endpoints["base"] + "charts/getLatestBar/" + "/".join([primary,secondary,side,"?resolution="+resolution]), stream=True) as resp:
+            with self.transport.get(self.data_endpoint + "charts/getLatestBar/" + "/".join([primary,secondary,side,"?resolution="+resolution]), lane="bars", stream=True) as resp:
                 for line in resp.iter_lines():
                     if line:
                         print(line)
@@ -602,62 +829,75 @@ class SwyftX:
 
     def extract_price_data(self, data, max_length = None):
         """
-        Takes in the raw data fetched by self.fetch_asset_data() and converts them into a neater structure.
-        Deques will be used to store data for space efficiency's sake.
-        :param data: output of self.fetch_asset_data()
-        :param max_length: an integer that represents the maximum number of elements that our deques can simultaneously
-            hold. If None, it will be as long as data.
-        :return: a dictionary with the following structure:
+        Takes in the raw data fetched by self.get_asset_data() and converts them into a neater structure.
+        An OHLCBuffer will be used to store data for space efficiency's sake.
+        :param data: output of self.get_asset_data()
+        :param max_length: an integer that represents the maximum number of candles that the buffer can
+            simultaneously hold. If None, it will be as long as data. Otherwise, only the last max_length candles are
+            kept.
+        :return: an OHLCBuffer whose columns can be accessed like a dictionary with the following structure:
             {
                 assetCode,
                 time,
                 open,
                 close,
                 low,
-                high
+                high,
+                volume
             }
         """
         if max_length is None:
             max_length = len(data["data"])
-        time, open, close, low, high = deque([],max_length), deque([],max_length), deque([],max_length), deque([],max_length), deque([],max_length)
-        assetCode = data["assetCode"]
-        data=data["data"]
-        for i in range(max_length):
-            time.append(data[i]["time"])
-            open.append(data[i]["open"])
-            close.append(data[i]["close"])
-            low.append(data[i]["low"])
-            high.append(data[i]["high"])
+        out = OHLCBuffer(max(1, max_length), data["assetCode"])
+        out.extend([
+            [c["time"].timestamp() if type(c["time"]) is datetime else int(c["time"]) / 1000 for c in data["data"]],
+            [float(c["open"]) for c in data["data"]],
+            [float(c["high"]) for c in data["data"]],
+            [float(c["low"]) for c in data["data"]],
+            [float(c["close"]) for c in data["data"]],
+            [float(c.get("volume", 0)) for c in data["data"]]
+        ])
 
-        return {
-            "assetCode":assetCode,
-            "time":time,
-            "open":open,
-            "close":close,
-            "low":low,
-            "high":high
-        }
+        return out
 
-    def get_live_asset_rates(self, primary, secondary, reset_header = True, print_results=False):
+    def _fetch_live_rates(self, primary):
         """
+        Downloads the rates of every secondary asset in terms of primary.
+        :param primary: a string that represents the id of the primary asset.
+        :return: a dictionary that maps the id of each secondary asset to its rates.
+        """
+        return json.loads(self.transport.get(self.data_endpoint + "live-rates/" + primary + "/", lane="bars").text)
 
+    def get_live_asset_rates(self, primary, secondary, reset_header = True, print_results=False):
+        """
+        Gets the live rates of secondary in terms of primary. The response for primary is shared by every secondary
+        asset and reused for self.live_rates.ttl seconds.
         :param primary:
         :param secondary:
-        :param reset_header:
+        :param reset_header: kept for compatibility. Headers are always set when the rates are downloaded.
         :param print_results:
         :return:
         """
-        primary = self.to_id(primary)
+        r = self.live_rates.get(self.to_id(primary))
         secondary = self.to_id(secondary)
-        if reset_header:
-            self.session.headers.update(self.default_header)
-        r = json.loads(self.session.get(endpoints["base"] + "live-rates/" + primary + "/").text)
         if print_results:
             print(r[secondary])
         else:
             return r[secondary]
 
-    def livestream(self, delay = 1, *args, **kwargs):
+    def get_live_rates(self, primary, secondaries=None):
+        """
+        Gets the live rates of many secondary assets in terms of primary from one (cached) response.
+        :param primary: a string that represents the ticker symbol of the primary asset.
+        :param secondaries: a list of ticker symbols. If None, every secondary asset in the response is returned.
+        :return: a dictionary that maps the ticker symbol of each secondary asset to its rates.
+        """
+        r = self.live_rates.get(self.to_id(primary))
+        if secondaries is None:
+            return {self._to_code[i]: rates for i, rates in r.items() if i in self._to_code}
+        return {s: r[self.to_id(s)] for s in secondaries}
+
+    def livestream(self, delay = 0, *args, **kwargs):
         """
         Livestreams live data directly from SwyftX.
         While this is running, it's possible to execute other functions.
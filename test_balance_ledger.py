@@ -0,0 +1,106 @@
+import threading
+import unittest
+
+from fake_swyftx import FakeSwyftXServer
+from swyftx import SwyftX
+
+
+class BalanceLedgerTest(unittest.TestCase):
+    """
+    Runs against a local FakeSwyftXServer. A fill must be counted exactly once, whether it's applied before, during or
+    after the balance is fetched by a reconciliation.
+    """
+
+    def setUp(self):
+        self.server = FakeSwyftXServer(seed=1).start()
+        self.swyftx = SwyftX("key", base_url=self.server.url)
+        self.ledger = self.swyftx.ledger.sync()
+
+    def tearDown(self):
+        self.swyftx.order_tracker.stop()
+        self.ledger.stop()
+        self.server.stop()
+
+    def assertMatchesServer(self):
+        fetched = self.swyftx.fetch_balance()
+        for code in set(self.ledger) | set(fetched):
+            self.assertAlmostEqual(self.ledger.get(code, 0.0), fetched.get(code, 0.0), places=8, msg=code)
+
+    def buy(self, amount=1000):
+        with self.ledger.placing():
+            r = self.swyftx.market_buy("USD", "BTC", amount).json()
+        self.assertTrue(self.ledger.apply(r))
+        return r
+
+    def stop_loss(self):
+        """
+        Places a stop loss that SwyftX fills the next time it looks at it, without the ledger knowing.
+        """
+        bid = float(self.swyftx.get_live_rates("USD", ["BTC"])["BTC"]["bidPrice"])
+        order_uuid = self.swyftx.stop_loss("USD", "BTC", 0.001, bid * 0.5, "BTC").json()["orderUuid"]
+        self.swyftx.order_tracker.track(order_uuid)
+        return order_uuid
+
+    def test_fills_are_applied_once(self):
+        r = self.buy()
+        self.assertFalse(self.ledger.apply(r))
+        self.assertFalse(self.ledger.apply(dict(r["order"], orderUuid=r["orderUuid"])))
+        self.assertEqual(self.ledger.reconcile(), {})
+        self.assertMatchesServer()
+
+    def test_stop_filled_before_the_fetch(self):
+        self.buy()
+        order_uuid = self.stop_loss()
+        self.server.orders[order_uuid]["trigger"] = 10 ** 9
+        # The exchange's clock doesn't matter.
+        self.server.orders[order_uuid]["updated_time"] = 0
+        self.assertEqual(self.ledger.reconcile(), {})
+        self.assertEqual(self.swyftx.order_tracker.get(order_uuid)["status"], 4)
+        self.assertFalse(self.ledger.apply(self.swyftx.order_tracker.get(order_uuid)))
+        self.assertMatchesServer()
+        self.assertEqual(self.ledger.reconcile(), {})
+
+    def test_stop_filled_during_the_fetch(self):
+        self.buy()
+        order_uuid = self.stop_loss()
+        fetch_balance = self.swyftx.fetch_balance
+
+        def fill_then_fetch():
+            self.server.orders[order_uuid]["trigger"] = 10 ** 9
+            self.server.orders[order_uuid]["updated_time"] = 10 ** 15
+            return fetch_balance()
+
+        self.swyftx.fetch_balance = fill_then_fetch
+        self.assertEqual(self.ledger.reconcile(), {})
+        self.swyftx.fetch_balance = fetch_balance
+        self.assertEqual(self.ledger.stats()["dropped"], 1)
+        self.assertMatchesServer()
+        self.assertEqual(self.ledger.reconcile(), {})
+
+    def test_orders_placed_while_reconciling(self):
+        done, drifts = threading.Event(), []
+
+        def reconcile():
+            while not done.is_set():
+                drifts.append(self.ledger.reconcile())
+
+        thread = threading.Thread(target=reconcile)
+        thread.start()
+        try:
+            for _ in range(5):
+                self.buy(100)
+        finally:
+            done.set()
+            thread.join()
+        self.assertEqual([d for d in drifts if d], [])
+        self.assertEqual(self.ledger.reconcile(), {})
+
+    def test_applied_orders_are_bounded(self):
+        self.ledger.applied_history = 3
+        for _ in range(5):
+            self.buy(10)
+        self.assertEqual(len(self.ledger._applied), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
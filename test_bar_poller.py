@@ -0,0 +1,49 @@
+import unittest
+
+from time import sleep, time
+
+from bar_poller import BarPoller
+
+
+class BarPollerTest(unittest.TestCase):
+    """
+    Drives BarPoller.poll() with a fake fetch that only returns the bar once a known delay has passed since it closed,
+    and checks that the expected delay settles near that delay, whether it starts above or below it.
+    """
+
+    def setUp(self):
+        self.poller = BarPoller(history=10)
+
+    def poll_bars(self, lag, bars=20, round_trip=0.01):
+        for _ in range(bars):
+            close_time = time()
+
+            def fetch():
+                published = time() >= close_time + lag
+                sleep(round_trip)
+                return [{"time": close_time}] if published else []
+
+            self.assertEqual(len(self.poller.poll(fetch, "1m", close_time)), 1)
+
+    def assertSettlesNear(self, lag, round_trip=0.01):
+        # A request that fails is followed by one sent a backoff step (and the round trip of the failed one) later.
+        self.assertGreaterEqual(self.poller.expected_lag("1m"), lag * self.poller.shrink)
+        self.assertLessEqual(self.poller.expected_lag("1m"), lag + self.poller.backoff[0] + round_trip)
+
+    def test_learns_the_delay(self):
+        self.poll_bars(0.2)
+        self.assertSettlesNear(0.2)
+
+    def test_estimate_comes_down(self):
+        self.poll_bars(0.3, bars=10)
+        self.assertGreaterEqual(self.poller.expected_lag("1m"), 0.25)
+        self.poll_bars(0.05, bars=40)
+        self.assertSettlesNear(0.05)
+
+    def test_round_trip_is_not_counted(self):
+        self.poll_bars(0.1, round_trip=0.1)
+        self.assertSettlesNear(0.1, round_trip=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
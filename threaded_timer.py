@@ -1,67 +1,307 @@
+import heapq
+import itertools
 import threading
 
-from time import time
+from time import time, monotonic
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from nearest import *
 
+# What a job does when it's due while its previous call is still running:
+#   skip      - the tick is dropped.
+#   coalesce  - every tick missed in the meantime is merged into one call, made as soon as the running one returns.
+#   catch_up  - same as coalesce, except the job's catch_up function is called with the number of missed ticks
+#               instead, so it can backfill everything it missed at once.
+# Either way, calls of the same job never overlap.
+overrun_policies = ("skip", "coalesce", "catch_up")
+
+
+class Job:
+    def __init__(self, function, interval, due, args=(), kwargs=None, name=None, overrun="coalesce", catch_up=None,
+                 budget=None):
+        """
+        A function that is called by a Scheduler every interval seconds. Created by Scheduler.every() and
+        Scheduler.at_interval().
+        :param due: a number that represents the monotonic time of the first call.
+        :param overrun: a string, one of overrun_policies.
+        :param catch_up: a function that takes the number of missed ticks, called instead of function under the
+            'catch_up' policy. If None, function is called once instead.
+        :param budget: a number that represents how many seconds a call may take before it counts as an overrun.
+            Defaults to interval.
+        """
+        if overrun not in overrun_policies:
+            raise ValueError(f"overrun has to be one of {overrun_policies}, not {overrun!r}.")
+        self.function = function
+        self.interval = interval
+        self.due = due
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.name = name or getattr(function, "__qualname__", repr(function))
+        self.cancelled = False
+        self.overrun = overrun
+        self.catch_up = catch_up
+        self.budget = budget if budget is not None else interval
+        self.running = False
+        # Number of ticks that were due while a call was running, and still have to be coalesced or caught up.
+        self.pending = 0
+        # Lateness is how long after its due time a call started. Running sums are kept so the jitter (standard
+        # deviation of lateness) can be computed without storing every call.
+        self._stats = {"runs": 0, "late_total": 0.0, "late_squares": 0.0, "late_max": 0.0, "duration_total": 0.0,
+                       "duration_max": 0.0, "errors": 0, "overruns": 0, "overrun_max": 0.0, "skipped": 0,
+                       "coalesced": 0, "caught_up": 0}
+        self._lock = threading.Lock()
+
+    def _due_while_running(self):
+        """
+        Called by the scheduler when the job is due. Marks it as running and returns True if it should be called now,
+        otherwise applies self.overrun and returns False.
+        """
+        with self._lock:
+            if not self.running:
+                self.running = True
+                return True
+            if self.overrun == "skip":
+                self._stats["skipped"] += 1
+            else:
+                self.pending += 1
+            return False
+
+    def _run(self, due):
+        """
+        Calls the job, then any ticks that were coalesced while it was running, until none are left.
+        """
+        self._call(self.function, due, self.args, self.kwargs)
+        while True:
+            with self._lock:
+                missed, self.pending = self.pending, 0
+                if not missed or self.cancelled:
+                    self.running = False
+                    return
+                self._stats["caught_up" if self.overrun == "catch_up" else "coalesced"] += missed
+            print(f"Scheduled job {self.name} overran: running {missed} missed tick(s) now.")
+            if self.overrun == "catch_up" and self.catch_up is not None:
+                self._call(self.catch_up, None, (missed,), {})
+            else:
+                self._call(self.function, None, self.args, self.kwargs)
+
+    def _call(self, function, due, args, kwargs):
+        """
+        :param due: a number that represents the monotonic time the call was due at, or None for calls that make up
+            for missed ticks (they're late on purpose, so lateness isn't recorded).
+        """
+        start = monotonic()
+        try:
+            function(*args, **kwargs)
+        except Exception as e:
+            # The job keeps running at its next interval, like the timer threads it replaces.
+            with self._lock:
+                self._stats["errors"] += 1
+            print(f"Scheduled job {self.name} failed: {e!r}")
+        finally:
+            duration = monotonic() - start
+            with self._lock:
+                s = self._stats
+                s["duration_total"] += duration
+                s["duration_max"] = max(s["duration_max"], duration)
+                if duration > self.budget:
+                    s["overruns"] += 1
+                    s["overrun_max"] = max(s["overrun_max"], duration - self.budget)
+                if due is not None:
+                    late = start - due
+                    s["runs"] += 1
+                    s["late_total"] += late
+                    s["late_squares"] += late * late
+                    s["late_max"] = max(s["late_max"], late)
+
+    def stats(self):
+        """
+        :return: a dictionary with the following structure (times in seconds):
+            {
+                runs: number of calls made on schedule,
+                errors,
+                late_mean, late_max: time between when each call was due and when it started,
+                jitter: standard deviation of lateness,
+                duration_mean, duration_max: time each call took,
+                overruns: number of calls that took longer than the budget,
+                overrun_max: most time a call took over the budget,
+                skipped, coalesced, caught_up: number of ticks missed because of overruns, by what happened to them
+            }
+        """
+        with self._lock:
+            s = dict(self._stats)
+        n = s["runs"]
+        late_mean = s["late_total"] / n if n else 0
+        return {
+            "runs": n,
+            "errors": s["errors"],
+            "late_mean": late_mean,
+            "late_max": s["late_max"],
+            "jitter": max(0, s["late_squares"] / n - late_mean ** 2) ** 0.5 if n else 0,
+            "duration_mean": s["duration_total"] / n if n else 0,
+            "duration_max": s["duration_max"],
+            "overruns": s["overruns"],
+            "overrun_max": s["overrun_max"],
+            "skipped": s["skipped"],
+            "coalesced": s["coalesced"],
+            "caught_up": s["caught_up"]
+        }
+
+
+class Scheduler:
+    def __init__(self, max_workers=8):
+        """
+        Runs every scheduled job from one thread, instead of starting a new timer thread for every call.
+
+        Jobs are kept in a heap ordered by when they're next due, on the monotonic clock, so the schedule doesn't
+        drift or fire twice when the system clock is changed (NTP, daylight saving). The wall clock is only read
+        once per job, to line its first call up with the start of an interval. Due jobs are handed over to a pool of
+        worker threads, so a slow job doesn't delay the others.
+
+        The scheduler thread stops once there are no jobs left, and starts again when one is added.
+        :param max_workers: an integer that represents the maximum number of jobs running at the same time.
+        """
+        self.max_workers = max_workers
+        self._heap = []
+        self._jobs = set()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._executor = None
+
+    def every(self, interval, function, *args, overrun="coalesce", catch_up=None, budget=None, **kwargs):
+        """
+        Calls function every interval seconds, starting interval seconds from now.
+        :param overrun, catch_up, budget: what to do when a call takes longer than the interval. See Job.
+        :return: a Job object.
+        """
+        return self._add(Job(function, interval, monotonic() + interval, args, kwargs, overrun=overrun,
+                             catch_up=catch_up, budget=budget))
+
+    def at_interval(self, resolution, function, delay=0, *args, overrun="coalesce", catch_up=None, budget=None,
+                    **kwargs):
+        """
+        Calls function at the start of every interval of resolution (e.g. on the minute for '1m'), plus delay.
+        :param resolution: a string that represents the resolution, e.g. '1m'.
+        :param delay: a number that represents the number of seconds to wait after the start of each interval.
+        :param overrun, catch_up, budget: what to do when a call takes longer than the interval. See Job.
+        :return: a Job object.
+        """
+        wall = next_interval[resolution](time(), delay=delay)
+        job = Job(function, resolution_to_seconds[resolution], monotonic() + wall - time(), args, kwargs,
+                  overrun=overrun, catch_up=catch_up, budget=budget)
+        job.resolution = resolution
+        return self._add(job)
+
+    def cancel(self, job):
+        """
+        Stops calling job. A call that has already started is left to finish.
+        """
+        with self._condition:
+            job.cancelled = True
+            self._jobs.discard(job)
+            self._condition.notify()
+
+    def jobs(self):
+        with self._condition:
+            return list(self._jobs)
+
+    def stats(self):
+        """
+        :return: a list with the Job.stats() of each scheduled job, along with its name and interval.
+        """
+        return [dict(job.stats(), name=job.name, interval=job.interval) for job in self.jobs()]
+
+    def _add(self, job):
+        with self._condition:
+            self._jobs.add(job)
+            heapq.heappush(self._heap, (job.due, next(self._counter), job))
+            if self._thread is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="scheduled")
+                self._thread = threading.Thread(target=self._loop, name="scheduler")
+                self._thread.start()
+            self._condition.notify()
+        return job
+
+    def _loop(self):
+        with self._condition:
+            while True:
+                # Cancelled jobs are only removed from the heap once they reach the top.
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._thread = None
+                    return
+                due, _, job = self._heap[0]
+                wait = due - monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                job.due = due + job.interval
+                heapq.heappush(self._heap, (job.due, next(self._counter), job))
+                if job._due_while_running():
+                    self._executor.submit(job._run, due)
+
+
+# Shared by every timer, so a process only ever has one scheduler thread.
+scheduler = Scheduler()
+
 
 class RepeatedTimer(object):
     """
-    Copied from: https://stackoverflow.com/questions/474528/what-is-the-best-way-to-repeatedly-execute-a-function-every-x-seconds
+    Calls function every interval seconds. Kept for compatibility: it's a job of the shared scheduler instead of a
+    chain of timer threads. overrun and catch_up decide what happens when a call takes longer than interval (see Job).
     """
-    def __init__(self, interval, function, *args, **kwargs):
-        self._timer = None
+    def __init__(self, interval, function, *args, overrun="coalesce", catch_up=None, **kwargs):
+        self._job = None
+        self.overrun = overrun
+        self.catch_up = catch_up
         self.interval = interval
         self.function = function
         self.args = args
         self.kwargs = kwargs
-        self.is_running = False
-        self.next_call = time()
-        self.start()
-
-    def _run(self):
         self.is_running = False
         self.start()
-        self.function(*self.args, **self.kwargs)
 
     def start(self):
         if not self.is_running:
-            self.next_call += self.interval
-            self._timer = threading.Timer(self.next_call - time(), self._run)
-            self._timer.start()
+            self._job = scheduler.every(self.interval, self.function, *self.args, overrun=self.overrun,
+                                        catch_up=self.catch_up, **self.kwargs)
             self.is_running = True
 
     def stop(self):
-        self._timer.cancel()
+        if self._job is not None:
+            scheduler.cancel(self._job)
         self.is_running = False
 
+    def stats(self):
+        """
+        :return: the Job.stats() of the timer.
+        """
+        return self._job.stats()
+
 
 class NearestTimer(RepeatedTimer):
-    def __init__(self, resolution, function, delay = 0, *args, **kwargs):
+    """
+    Calls function at the start of every interval of resolution, plus delay.
+    """
+    def __init__(self, resolution, function, delay = 0, *args, overrun="coalesce", catch_up=None, **kwargs):
         self.resolution = resolution
-        self._timer = None
-        self.interval = resolution_to_seconds[resolution]
-        self.function = function
-        self.args = args
-        self.kwargs = kwargs
-        self.is_running = False
-        #print("Start time: ")
-        #print(datetime.now())
         self.delay = delay
-        self.start()
+        super().__init__(resolution_to_seconds[resolution], function, *args, overrun=overrun, catch_up=catch_up,
+                         **kwargs)
 
     def start(self):
         if not self.is_running:
-            now = datetime.now().timestamp()
-            start_time = next_interval[self.resolution](now, delay=self.delay) #+ delay
+            self._job = scheduler.at_interval(self.resolution, self.function, self.delay, *self.args,
+                                              overrun=self.overrun, catch_up=self.catch_up, **self.kwargs)
             print("The next execution will start at: ")
-            print(datetime.fromtimestamp(start_time))
-            self._timer = threading.Timer(start_time - time(), self._run)
-            self._timer.start()
+            print(datetime.fromtimestamp(time() + self._job.due - monotonic()))
             self.is_running = True
 
 if '__main__' == __name__:
     def print_now():
         now = datetime.now()
 
-    timer = NearestTimer("5m", print_now, delay=0)
\ No newline at end of file
+    timer = NearestTimer("5m", print_now, delay=0)
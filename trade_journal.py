@@ -0,0 +1,177 @@
+import csv
+import io
+import os
+import threading
+
+from zlib import crc32
+
+from threaded_timer import scheduler
+
+# The columns of a journal, in the order of Bot.order_to_list().
+columns = ["orderUuid", "order_type", "primary_asset", "secondary_asset", "quantity_asset", "quantity", "trigger",
+           "status", "created_time", "updated_time", "amount", "total", "rate", "userCountryValue"]
+# Every line ends with the CRC-32 of the rest of the line, so a line that was cut off can't pass for a complete one.
+header = columns + ["checksum"]
+
+
+class TradeJournal:
+    def __init__(self, path, sync_interval=5):
+        """
+        Append-only CSV file of the orders made by a bot. Each order is written as one line through a buffered file, so
+        recording an order costs the same however long the session has been running, and the file is flushed and
+        fsynced every sync_interval seconds in the background (only while orders are being written).
+
+        A crash loses at most the orders of the last sync_interval seconds. Each order is kept on a single line that
+        ends with a checksum of the line, so a line that was only partly written (even one cut inside a value) is
+        skipped by self.read(), and the next line starts after it.
+        :param path: a string that represents the path of the CSV file. It's created if it doesn't exist, and appended
+            to otherwise.
+        :param sync_interval: a number that represents the number of seconds between fsyncs.
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._job = None
+        self._dirty = False
+        self._stats = {"orders": 0, "syncs": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", newline="")
+        if self._file.tell() == 0:
+            csv.writer(self._file, lineterminator="\n").writerow(header)
+        elif not self._ends_with_newline():
+            # The last line was cut off by a crash.
+            self._file.write("\n")
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def append(self, order):
+        """
+        Records an order.
+        :param order: a list returned by Bot.order_to_list().
+        """
+        line = self._encode(order)
+        with self._lock:
+            self._file.write(line)
+            self._dirty = True
+            self._stats["orders"] += 1
+            if self._job is None:
+                self._job = scheduler.every(self.sync_interval, self._sync, overrun="skip")
+
+    @staticmethod
+    def _encode(order):
+        """
+        :return: a string that holds an order as one CSV line, followed by its checksum.
+        """
+        out = io.StringIO()
+        # Line breaks would split the order over several lines, which self.read() treats as cut off.
+        csv.writer(out, lineterminator="").writerow(["" if value is None else str(value).replace("\n", " ")
+                                                     for value in order])
+        body = out.getvalue()
+        return f"{body},{crc32(body.encode()):08x}\n"
+
+    @staticmethod
+    def _decode(line):
+        """
+        :return: a list of the values of an order, or None if the line is incomplete or corrupted.
+        """
+        body, _, checksum = line.rstrip("\r\n").rpartition(",")
+        if not body or checksum != f"{crc32(body.encode()):08x}":
+            return None
+        row = next(csv.reader([body]), [])
+        return row if len(row) == len(columns) else None
+
+    def flush(self):
+        """
+        Writes the buffered orders to the file, without waiting for them to reach the disk.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def sync(self):
+        """
+        Writes the buffered orders to the file and waits for them to reach the disk.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._dirty = False
+                self._stats["syncs"] += 1
+
+    def _sync(self):
+        """
+        Called by the scheduler every self.sync_interval seconds. Stops once nothing has been written since the last
+        call, so an idle journal doesn't keep the process alive.
+        """
+        with self._lock:
+            if not self._dirty and self._job is not None:
+                scheduler.cancel(self._job)
+                self._job = None
+                return
+        self.sync()
+
+    def close(self):
+        """
+        Syncs the journal and closes the file.
+        """
+        self.sync()
+        with self._lock:
+            if self._job is not None:
+                scheduler.cancel(self._job)
+                self._job = None
+            self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def read(self):
+        """
+        Reads every complete order in the journal, including the ones that haven't been synced yet.
+        :return: a list of lists in the same form as Bot.order_to_list(). Numbers are converted to floats, and empty
+            values to None.
+        """
+        self.flush()
+        with open(self.path, "r", newline="") as f:
+            lines = f.read().split("\n")[1:]
+        rows = [self._decode(line) for line in lines if line]
+        return [[self._parse(value) for value in row] for row in rows if row is not None]
+
+    @staticmethod
+    def _parse(value):
+        if value == "":
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    def export(self, path):
+        """
+        Saves the journal in a compact columnar form: a compressed numpy archive with one array per column. Numeric
+        columns are saved as floats (with NaN for missing values) and the others as strings.
+        :param path: a string that represents the path of the archive. '.npz' is appended if it's missing.
+        :return: a dictionary that maps each column to its array.
+        """
+        import numpy as np
+        rows = self.read()
+        out = {}
+        for i, name in enumerate(columns):
+            values = [row[i] for row in rows]
+            if all(v is None or type(v) is float for v in values):
+                out[name] = np.array([np.nan if v is None else v for v in values], dtype=float)
+            else:
+                out[name] = np.array(["" if v is None else str(v) for v in values])
+        np.savez_compressed(path, **out)
+        return out
+
+    def stats(self):
+        """
+        :return: a dictionary with the number of orders written and the number of fsyncs.
+        """
+        with self._lock:
+            return dict(self._stats)
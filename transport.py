@@ -0,0 +1,87 @@
+import requests
+
+from time import perf_counter
+from instrumentation import endpoint_name
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class Transport:
+    def __init__(self, pool_size=16, retries=3, backoff_factor=0.2, timeout=10, default_headers=None,
+                 rate_limiter=None, instrumentation=None):
+        """
+        Sends every request made by SwyftX through one pooled requests.Session.
+
+        Headers are passed with each request instead of being set on the session, so many threads can send requests
+        at the same time without changing each other's headers. Connections are kept alive and reused, and GET
+        requests (which are safe to repeat) are retried with backoff on connection errors and 429/5xx responses.
+        :param pool_size: an integer that represents the maximum number of connections kept open per host. It should
+            be at least the number of threads sending requests at the same time.
+        :param retries: an integer that represents the maximum number of times a GET request is retried.
+        :param backoff_factor: a number used to space out retries: backoff_factor * 2 ** (retry - 1) seconds.
+        :param timeout: a number that represents the number of seconds to wait for the server before giving up.
+        :param default_headers: a dictionary of headers sent with every request.
+        :param rate_limiter: a RateLimiter that every request waits for before being sent. If None, requests aren't
+            paced.
+        :param instrumentation: an Instrumentation that every request is recorded in. If None, nothing is recorded.
+        """
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.instrumentation = instrumentation
+        self.default_headers = dict(default_headers or {})
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=backoff_factor,
+                      status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["GET"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, headers=None, lane="bulk", **kwargs):
+        """
+        Sends a request.
+        :param method: a string that represents the HTTP method, e.g. 'GET'.
+        :param headers: a dictionary of headers sent with this request only, on top of self.default_headers.
+        :param lane: a string that represents the priority of the request in self.rate_limiter (see
+            rate_limiter.lanes).
+        :param kwargs: parameter values for requests.Session.request().
+        :return: a requests.Response object.
+        """
+        merged = dict(self.default_headers)
+        if headers:
+            merged.update(headers)
+        kwargs.setdefault("timeout", self.timeout)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(lane)
+        if self.instrumentation is None:
+            return self.session.request(method, url, headers=merged, **kwargs)
+
+        data = kwargs.get("data")
+        sent = len(data) if isinstance(data, (str, bytes)) else 0
+        start = perf_counter()
+        try:
+            r = self.session.request(method, url, headers=merged, **kwargs)
+        except requests.RequestException as e:
+            self.instrumentation.record(endpoint_name(url), method, None, perf_counter() - start, sent, 0,
+                                        type(e).__name__)
+            raise
+        if kwargs.get("stream"):
+            # Reading the body here would defeat streaming, so rely on the header.
+            received = int(r.headers.get("Content-Length", 0))
+        else:
+            received = len(r.content)
+        self.instrumentation.record(endpoint_name(url), method, r.status_code, perf_counter() - start, sent, received,
+                                    f"HTTP {r.status_code}" if r.status_code >= 400 else None)
+        return r
+
+    def get(self, url, headers=None, **kwargs):
+        return self.request("GET", url, headers, **kwargs)
+
+    def post(self, url, headers=None, **kwargs):
+        return self.request("POST", url, headers, **kwargs)
+
+    def delete(self, url, headers=None, **kwargs):
+        return self.request("DELETE", url, headers, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,258 @@
+import numpy as np
+
+from datetime import datetime, timedelta
+from backtest_feed import BacktestFeed, backtest_window, to_unix_ms
+from errors import EndOfDataError
+from indicators import ema
+from nearest import erase_seconds, resolution_to_seconds, rank_up, rank_down, calculate_next_interval
+from tools import Id_Generator
+
+
+def load_series(feed, primary, secondary, resolution, window):
+    """
+    Converts the ask candles of a resolution into the NumPy arrays used by VectorBacktest.
+    :param feed: a BacktestFeed (or SwyftX object) that the ask candles are fetched from.
+    :param window: a tuple of 2 datetime objects (see backtest_feed.backtest_window()).
+    :return: a dictionary of NumPy arrays with the keys 'time', 'close' and 'low'.
+    """
+    d = feed.get_asset_data(primary, secondary, "ask", resolution, window[0], window[1], readable_time=False)["data"]
+    return {
+        "time": np.array([int(c["time"]) for c in d], dtype=np.int64),
+        "close": np.array([float(c["close"]) for c in d]),
+        "low": np.array([float(c["low"]) for c in d])
+    }
+
+
+class _Segment:
+    def __init__(self, series, lo, hi, fast, slow, signal, long, chunk):
+        """
+        Indicator arrays for one stretch of bars at one resolution: the 'long' periods collected when the strategy
+        enters the resolution (series[lo:hi]), followed by every bar after it. The bars after the seed are computed
+        lazily, chunk by chunk, because the strategy usually zooms in/out long before the end of the series.
+        :param series: a dictionary of NumPy arrays with the keys 'time', 'close' and 'low'.
+        :param lo: an integer that represents the index of the first bar of the seed.
+        :param hi: an integer that represents the index right after the last bar of the seed.
+        :param chunk: an integer that represents the number of bars computed when the arrays need to be extended.
+        """
+        self.times, self.close, self.low = series["time"], series["close"], series["low"]
+        self.lo = lo
+        self.fast, self.slow, self.signal, self.long = fast, slow, signal, long
+        self.chunk = chunk
+
+        self._compute(hi)
+
+    def _compute(self, stop):
+        """
+        Calculates every indicator from scratch for the series up to 'stop' (exclusive).
+        """
+        close = self.close[self.lo:stop]
+        self.ema_fast = ema(close, self.fast)
+        self.ema_slow = ema(close, self.slow)
+        self.ema_long = ema(close, self.long)
+        self.macd = self.ema_fast - self.ema_slow
+        self.macdsignal = ema(self.macd, self.signal)
+        self.stop = stop
+
+    def _extend(self, stop):
+        """
+        Continues every indicator from its last value until the arrays cover the series up to 'stop' (exclusive).
+        """
+        while self.stop < min(stop, len(self.times)):
+            new_stop = min(len(self.times), max(stop, self.stop + self.chunk))
+            self.chunk *= 2
+            if np.isnan([self.ema_fast[-1], self.ema_slow[-1], self.ema_long[-1], self.macdsignal[-1]]).any():
+                # An indicator is still warming up because the seed was too short, so it can't be continued from its
+                # last value.
+                self._compute(new_stop)
+                continue
+            close = self.close[self.stop:new_stop]
+            ema_fast = ema(close, self.fast, self.ema_fast[-1])
+            ema_slow = ema(close, self.slow, self.ema_slow[-1])
+            macd = ema_fast - ema_slow
+            self.macdsignal = np.concatenate([self.macdsignal, ema(macd, self.signal, self.macdsignal[-1])])
+            self.ema_long = np.concatenate([self.ema_long, ema(close, self.long, self.ema_long[-1])])
+            self.ema_fast = np.concatenate([self.ema_fast, ema_fast])
+            self.ema_slow = np.concatenate([self.ema_slow, ema_slow])
+            self.macd = np.concatenate([self.macd, macd])
+            self.stop = new_stop
+
+    def buy_signals(self, start, stop):
+        """
+        Same as Bot.check_macro_buy_signal() for every bar in [start, stop).
+        """
+        a, b = start - self.lo, stop - self.lo
+        return (self.ema_long[a:b] <= self.low[start:stop]) & \
+               (self.macd[a - 1:b - 1] < self.macdsignal[a - 1:b - 1]) & (self.macd[a:b] > self.macdsignal[a:b])
+
+    def falls(self, start, stop):
+        """
+        Checks whether the MACD gradient is non-positive (see Bot.macd_gradient_strategy()) for every bar in
+        [start, stop).
+        """
+        a, b = start - self.lo, stop - self.lo
+        return self.macd[a:b] - self.macd[a - 1:b - 1] <= 0
+
+    def search(self, mask, start, last, count=1):
+        """
+        Finds the count-th bar in [start, last] for which mask is True.
+        :param mask: self.buy_signals or self.falls.
+        :return: a tuple of the index of the bar (None if there aren't enough) and the number of bars found.
+        """
+        found = 0
+        while start <= last:
+            if self.stop <= start:
+                self._extend(start + 1)
+            end = min(last, self.stop - 1)
+            idx = np.flatnonzero(mask(start, end + 1)) + start
+            if found + len(idx) >= count:
+                return int(idx[count - found - 1]), count
+            found += len(idx)
+            start = end + 1
+        return None, found
+
+
+class VectorBacktest:
+    def __init__(self, feed, primary, secondary, fast=12, slow=26, signal=9, long=100, buy_rate=0.2, tolerance=2,
+                 balance=10000, chunk=256, series=None):
+        """
+        Array-based backtesting engine for Bot.macd_gradient_strategy(). It produces the same trade history as running
+        Bot.quick_start(backtest=True) on the same data, but instead of updating every figure one bar at a time, the
+        EMA/MACD/signal/gradient/cross/long EMA arrays are computed with NumPy and the strategy jumps straight from one
+        buy/sell/zoom event to the next.
+        :param feed: a BacktestFeed (or SwyftX object) that the ask candles are fetched from.
+        :param primary: a string that represents the ticker symbol of the primary asset.
+        :param secondary: a string that represents the ticker symbol of the secondary asset.
+        :param fast: an integer that represents the number of periods considered when calculating the fast EMA.
+        :param slow: an integer that represents the number of periods considered when calculating the slow EMA.
+        :param signal: an integer that represents the number of periods considered when calculating the EMA for MACD.
+        :param long: an integer that represents the number of periods considered when calculating the long EMA.
+        :param buy_rate: a float that represents the fraction of the primary balance spent on each buy.
+        :param tolerance: an integer that is used to determine how many times the MACD gradient can go negative before
+            the bot executes a sell order.
+        :param balance: a number that represents the starting balance of the primary asset.
+        :param chunk: an integer that represents the number of bars computed right after zooming in/out. It doubles
+            every time more bars are needed.
+        :param series: a dictionary of arrays returned by load_series(), keyed by resolution. Resolutions in it are
+            never fetched from feed, which allows many backtests to share the same data.
+        """
+        self.feed = feed
+        self.primary, self.secondary = primary, secondary
+        self.fast, self.slow, self.signal, self.long = fast, slow, signal, long
+        self.buy_rate = buy_rate
+        self.tolerance = tolerance
+        self.initial_balance = balance
+        self.chunk = chunk
+        self.window = None
+        self.series = {} if series is None else series
+        self.history, self.balance = [], {}
+
+    def _get_series(self, resolution):
+        """
+        Returns the arrays of a resolution, loading them from self.feed the first time they're needed.
+        """
+        if resolution not in self.series:
+            self.series[resolution] = load_series(self.feed, self.primary, self.secondary, resolution, self.window)
+        return self.series[resolution]
+
+    def _segment(self, resolution, start_time, end_time):
+        """
+        Same as Bot.collect_and_process_live_data(whole_resolution=True), except it returns a _Segment.
+        :param start_time: a number that represents unix time in seconds, or None.
+        :param end_time: a number that represents unix time in seconds.
+        :return: a tuple of the _Segment and the index of the first bar processed after collecting.
+        """
+        now = erase_seconds(end_time) - 60
+        if start_time is None:
+            start_time = now - resolution_to_seconds[resolution] * self.long
+
+        series = self._get_series(resolution)
+        lo = int(np.searchsorted(series["time"], to_unix_ms(start_time * 1000), "left"))
+        hi = int(np.searchsorted(series["time"], to_unix_ms(now * 1000), "right"))
+        if hi <= lo:
+            raise EndOfDataError(f"No '{resolution}' data before {datetime.fromtimestamp(now)}.")
+
+        segment = _Segment(series, lo, hi, self.fast, self.slow, self.signal, self.long, self.chunk)
+        first = int(calculate_next_interval(series["time"][hi - 1] / 1000, resolution)) * 1000
+        return segment, int(np.searchsorted(series["time"], first, "left"))
+
+    def _order(self, order_type, quantity, amount, rate, t):
+        return ["ord_" + self.id_gen.increment(), order_type, self.primary, self.secondary, self.primary, quantity,
+                None, 4, t, t, amount, quantity, rate, quantity]
+
+    def run(self, resolution="5m", start_time=None, end_time=None, backtest_end_time=None):
+        """
+        Runs the backtest. The parameters are the same as the ones in Bot.quick_start().
+        :return: a list of orders in the same format as Bot.history.
+        """
+        if end_time is None:
+            end_time = datetime.now()
+        if start_time is None:
+            start_time = end_time - timedelta(seconds=resolution_to_seconds[resolution] * self.long)
+        if backtest_end_time is None:
+            backtest_end_time = datetime.now()
+        if self.window is None:
+            self.window = backtest_window(resolution, start_time, backtest_end_time, self.long)
+
+        self.id_gen = Id_Generator()
+        self.history = []
+        self.balance = {self.primary: float(self.initial_balance), self.secondary: 0}
+        end_ms = to_unix_ms(backtest_end_time)
+        bought, zoomed = False, False
+        temp_tolerance = self.tolerance
+
+        segment, i = self._segment(resolution, start_time.timestamp(), end_time.timestamp())
+        while True:
+            times = segment.times
+            # Bot keeps going as long as the last bar it processed opened before backtest_end_time.
+            last = min(int(np.searchsorted(times, end_ms, "left")), len(times) - 1)
+            if i > last:
+                break
+
+            if not bought:
+                j, _ = segment.search(segment.buy_signals, i, last)
+                if j is None:
+                    break
+                t = datetime.fromtimestamp(times[j] / 1000)
+                if zoomed:
+                    amount = self.balance[self.primary] * self.buy_rate
+                    rate = float(segment.close[j])
+                    self.history.append(self._order("BUY", amount, amount / rate, rate, t))
+                    self.id_gen.increment()  # Stop loss order
+                    self.balance[self.primary] -= amount
+                    self.balance[self.secondary] += amount / rate
+                    bought = True
+                    i = j + 1
+                else:
+                    zoomed = True
+                    resolution = rank_down(resolution)
+                    temp_tolerance = self.tolerance
+                    segment, i = self._segment(resolution, None, times[j] / 1000)
+            else:
+                j, found = segment.search(segment.falls, i, last, temp_tolerance + 1)
+                if j is None:
+                    break
+                t = datetime.fromtimestamp(times[j] / 1000)
+                quantity = self.balance[self.secondary]
+                rate = float(segment.close[j])
+                self.history.append(self._order("SELL", quantity, quantity, rate, t))
+                self.balance[self.primary] += quantity * rate
+                self.balance[self.secondary] -= quantity
+                bought, zoomed = False, False
+                resolution = rank_up(resolution)
+                temp_tolerance = self.tolerance
+                segment, i = self._segment(resolution, None, times[j] / 1000)
+
+        return self.history
+
+    @classmethod
+    def from_swyftx(cls, swyftx, primary, secondary, resolution, start_time, backtest_end_time, **kwargs):
+        """
+        Creates a VectorBacktest together with a BacktestFeed covering the whole backtesting window.
+        :param swyftx: a SwyftX object.
+        :param kwargs: parameter values for VectorBacktest.
+        :return: a VectorBacktest object.
+        """
+        window = backtest_window(resolution, start_time, backtest_end_time, kwargs.get("long", 100))
+        backtest = cls(BacktestFeed(swyftx, primary, secondary, *window), primary, secondary, **kwargs)
+        backtest.window = window
+        return backtest
@@ -0,0 +1,105 @@
+import dash
+import plotly.graph_objects as go
+import dash_core_components as dcc
+import dash_html_components as html
+import webbrowser
+
+from plotly.subplots import make_subplots
+from dash.dependencies import Output, Input
+from threading import Timer
+from nearest import check_rank, resolution_to_seconds
+
+# Only imported by Bot when something is plotted or graphed, so headless bots never load dash/plotly.
+
+port = 5000
+
+
+def figure(bot, resolution=None, last=None, vertical_spacing=None):
+    """
+    Creates a candlestick chart (with the long EMA) above a MACD/signal chart from the data stored inside bot.
+    :param bot: a Bot object.
+    :param resolution: a string that represents the resolution to plot. Defaults to the current one.
+    :param last: an integer that represents the number of candles to plot. If None, every candle is plotted.
+    :param vertical_spacing: a float that represents the space between the 2 charts.
+    :return: a plotly Figure.
+    """
+    idx = check_rank(bot.resolution if resolution is None else resolution)
+    last = last or 0
+    data, indicators = bot.data[idx], bot.indicators[idx]
+    time = data.times(last or None)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=vertical_spacing)
+
+    candle = go.Candlestick(x=time, open=data.last("open", last or None), high=data.last("high", last or None),
+                            low=data.last("low", last or None), close=data.last("close", last or None), name="Candle")
+    ema_g = go.Scatter(x=time, y=indicators["ema_hundred"][last * -1:], marker={'color': "orange"}, name="Long EMA")
+    fig.add_trace(candle, row=1, col=1)
+    fig.add_trace(ema_g, row=1, col=1)
+
+    macdeez = go.Scatter(x=time, y=indicators["macd"][last * -1:], marker={'color': 'blue'}, name="MACD")
+    macdeezsignal = go.Scatter(x=time, y=indicators["macdsignal"][last * -1:], marker={"color": "red"},
+                               name="Signal")
+    fig.add_trace(macdeez, row=2, col=1)
+    fig.add_trace(macdeezsignal, row=2, col=1)
+
+    fig.update_layout(title={
+        "text": data["assetCode"],
+        "x": 0.5,
+        "xanchor": "center",
+        "yanchor": "top"
+    })
+    return fig
+
+
+def plot(bot, resolution=None, last=None):
+    """
+    Plots the data that is currently stored inside bot.
+    """
+    figure(bot, resolution, last).show()
+
+
+def create_app(bot, resolution):
+    """
+    Creates a Dash app that shows the data stored inside bot, updating it every interval of resolution.
+    :param bot: a Bot object.
+    :param resolution: a string that represents how often the graph is updated.
+    :return: a dash.Dash object.
+    """
+    app = dash.Dash(__name__)
+    app.layout = html.Div(
+        [
+            dcc.Graph(id="live-graph", animate=False, style={'height': '100vh'}),
+            dcc.Interval(id='graph-update',
+                         interval=1000 * resolution_to_seconds[resolution])
+        ]
+    )
+
+    @app.callback(Output("live-graph", "figure"), [Input("graph-update", "n_intervals")])
+    def update_graph(n):
+        """
+        Called each step to update the graph based on data and financial figures stored inside Bot.
+        :param n: an integer that represents the number of steps since the beginning.
+        """
+        # Live data resources:
+        # https://dash.plotly.com/live-updates
+        # https://realpython.com/python-dash/
+        # https://pythonprogramming.net/live-graphs-data-visualization-application-dash-python-tutorial/
+        bot.safe_update_all()
+        return figure(bot, last=60, vertical_spacing=0.2)
+
+    return app
+
+
+def run_app(bot, resolution):
+    """
+    Opens the browser and serves the app created by create_app() until it's stopped.
+    """
+    app = create_app(bot, resolution)
+    Timer(0.1, open_browser).start()
+    app.run_server(debug=False, port=port)
+
+
+def open_browser():
+    """
+    Opens the browser for data visualisation.
+    """
+    webbrowser.open_new("http://localhost:{}".format(port))